@@ -0,0 +1,137 @@
+# generate.py is part of the benchmarks
+# Writes synthetic datalogs and grrConfig files, in the layout of targetdir/
+
+# global libraries
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+GOLDEN_OPERATOR = "A1_golden"
+DESCRIPTIVE_COLUMNS = [
+    "SerialNumber",
+    "Test Pass/Fail Status",
+    "errCode",
+    "TesterID",
+    "timeStamp",
+    "SOCKET",
+]
+
+
+def make_foms(n: int) -> list[str]:
+    return [f"FOM{i:04d}_V" for i in range(n)]
+
+
+def generate_datalog(
+    filepath: Path | str,
+    parts: int = 200,
+    operators: int = 8,
+    reps: int = 3,
+    foms: int = 12,
+    seed: int = 0,
+) -> Path:
+    """IO: Writes a datalog of parts x operators x reps rows, the first
+    operator is the golden operator
+
+    Each FOM has a nominal value, a spread of the parts, a small bias per
+    operator and a repeatability noise per row.
+
+    :return: filepath
+    :rtype: Path
+    """
+    filepath = Path(filepath)
+    rng = np.random.default_rng(seed)
+    fom_names = make_foms(foms)
+    operator_names = [GOLDEN_OPERATOR] + [f"OP{i:02d}" for i in range(1, operators)]
+    serials = np.array([f"SN{seed:02d}{i:08d}" for i in range(parts)])
+
+    nominal = rng.uniform(0.5, 1.5, size=foms)
+    sigma = nominal * 0.01
+    part_values = nominal + rng.normal(0, 1, size=(parts, foms)) * sigma * 3
+    bias = rng.normal(0, 1, size=(operators, foms)) * sigma * 0.5
+    bias[0] = 0  # golden
+
+    # rows are grouped per operator, then per part, like a GR&R run
+    op_idx = np.repeat(np.arange(operators), parts * reps)
+    part_idx = np.tile(np.repeat(np.arange(parts), reps), operators)
+    nrows = len(op_idx)
+    values = (
+        part_values[part_idx]
+        + bias[op_idx]
+        + rng.normal(0, 1, size=(nrows, foms)) * sigma * 0.3
+    )
+
+    dfdata = pd.DataFrame(np.round(values, 6), columns=fom_names)
+    dfdata.insert(0, "SerialNumber", serials[part_idx])
+    dfdata.insert(1, "Test Pass/Fail Status", "PASS")
+    dfdata.insert(2, "errCode", 0)
+    dfdata.insert(3, "TesterID", np.array(operator_names)[op_idx])
+    dfdata.insert(4, "timeStamp", 660842194.2 + np.arange(nrows) * 60.0)
+    dfdata.insert(5, "SOCKET", "A1")
+
+    pad = [""] * len(DESCRIPTIVE_COLUMNS)
+    header_block = [
+        ["SyntheticGeneratedData"] + [""] * (len(dfdata.columns) - 1),
+        list(dfdata.columns),
+        ["Upper Limit ----->"] + pad[1:] + [f"{v:.4g}" for v in nominal * 1.2],
+        ["Lower Limit ----->"] + pad[1:] + [f"{v:.4g}" for v in nominal * 0.8],
+        ["Measurement Unit ----->"] + pad[1:] + ["V"] * foms,
+    ]
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    with open(filepath, mode="w", encoding="utf-8", newline="") as f:
+        f.writelines(",".join(row) + "\n" for row in header_block)
+        dfdata.to_csv(f, header=False, index=False)
+    return filepath
+
+
+def generate_grrconfig(
+    filepath: Path | str, foms: int = 12, seed: int = 0, grr_limit: float = 0.05
+) -> Path:
+    """IO: Writes a grrConfig of the FOMs of generate_datalog()"""
+    filepath = Path(filepath)
+    rng = np.random.default_rng(seed)
+    nominal = rng.uniform(0.5, 1.5, size=foms)  # same draw as the datalog
+    rows = [
+        "SHGRR_Gaiastat_Tool,,,,,",
+        "GrrConfig,GRR Stdev----->,GRR Limit----->,Upper ERS----->,Lower ERS----->,Unit----->",
+        "----- [Sherlock],NA,NA,NA,NA,NA",
+    ]
+    rows += [
+        f"{fom},,{nom * grr_limit:.4g},{nom * 1.2:.4g},{nom * 0.8:.4g},V"
+        for fom, nom in zip(make_foms(foms), nominal)
+    ]
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    filepath.write_text("\n".join(rows) + "\n", encoding="utf-8")
+    return filepath
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--parts", type=int, default=200)
+    parser.add_argument("--operators", type=int, default=8)
+    parser.add_argument("--reps", type=int, default=3)
+    parser.add_argument("--foms", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Writes a synthetic GR&R dataset")
+    add_arguments(parser)
+    parser.add_argument("outdir", type=Path)
+    args = parser.parse_args()
+    datalog = generate_datalog(
+        args.outdir / "datalog.csv",
+        parts=args.parts,
+        operators=args.operators,
+        reps=args.reps,
+        foms=args.foms,
+        seed=args.seed,
+    )
+    grrconfig = generate_grrconfig(
+        args.outdir / "grrConfig.csv", foms=args.foms, seed=args.seed
+    )
+    print(f"written {datalog} and {grrconfig}")
+
+
+if __name__ == "__main__":
+    main()
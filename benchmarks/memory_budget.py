@@ -0,0 +1,95 @@
+# memory_budget.py is part of the benchmarks
+# Peak traced memory of the ingest-to-results path on a synthetic datalog,
+# as a multiple of the datalog file size. Exits with 1 over the budget, e.g.
+#   python benchmarks/memory_budget.py --parts 2000 --foms 50 --max-ratio 10
+
+# global libraries
+import sys
+import argparse
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "grrd"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+# local libraries
+import generate  # noqa: E402
+import models  # noqa: E402
+from run import make_cfg, make_parser  # noqa: E402
+
+# peak of read_datalog -> parse_data -> GaiaDataMaker -> Dataset / file size,
+# per grr_engine, the per_pair engine keeps every GaiaData frame alive
+MAX_RATIO = {"batched": 11.0, "per_pair": 24.0}
+
+
+def measure_peak(
+    datalog: Path, grrconfig: Path, datastore: str, grr_engine: str
+) -> int:
+    """Peak traced bytes from reading the datalog to the dashboard Dataset,
+    the config and the limits are parsed before tracing starts"""
+    cfg = make_cfg(grrconfig, datastore=datastore, grr_engine=grr_engine)
+    parser = make_parser(cfg)
+    tracemalloc.start()
+    try:
+        if datastore == "streaming":
+            parser.stream_files([datalog])
+            datastore_ = parser.parse_data(parser.dfdata, parser.dfheaders)
+        else:
+            dfdata, dfheaders = models.read_datalog(datalog, cfg["input_settings"])
+            datastore_ = parser.parse_data(dfdata, dfheaders)
+            del dfdata
+        maker = models.GaiaDataMaker(
+            cfg=cfg, dataparam_list=datastore_, dflimits=parser.cfg_grrlimits
+        )
+        models.Dataset(maker.dfs, maker.df_summary)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Fails when the peak memory of parsing a synthetic datalog "
+        "goes over a multiple of its file size"
+    )
+    generate.add_arguments(parser)
+    parser.add_argument("--datastore", default="long", choices=sorted(models.PARSERS))
+    parser.add_argument("--grr-engine", default="batched")
+    parser.add_argument(
+        "--max-ratio",
+        type=float,
+        help="peak memory / file size, defaults to MAX_RATIO of the grr engine",
+    )
+    args = parser.parse_args()
+    max_ratio = args.max_ratio or MAX_RATIO[args.grr_engine]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        datalog = generate.generate_datalog(
+            Path(tmpdir) / "datalog.csv",
+            parts=args.parts,
+            operators=args.operators,
+            reps=args.reps,
+            foms=args.foms,
+            seed=args.seed,
+        )
+        grrconfig = generate.generate_grrconfig(
+            Path(tmpdir) / "grrConfig.csv", foms=args.foms, seed=args.seed
+        )
+        file_size = datalog.stat().st_size
+        peak = measure_peak(datalog, grrconfig, args.datastore, args.grr_engine)
+
+    ratio = peak / file_size
+    status = "OK" if ratio <= max_ratio else "OVER BUDGET"
+    print(
+        f"{args.datastore}/{args.grr_engine}: peak {peak / 1024**2:.1f} MB,"
+        f" file {file_size / 1024**2:.1f} MB, x{ratio:.2f} (budget x{max_ratio:.2f})"
+        f" {status}"
+    )
+    return 0 if ratio <= max_ratio else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
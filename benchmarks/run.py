@@ -0,0 +1,317 @@
+# run.py is part of the benchmarks
+# Times each stage of the pipeline on a synthetic dataset, with peak memory,
+# and stores the results as JSON, e.g.
+#   python benchmarks/run.py --parts 2000 --foms 50
+#   python benchmarks/run.py --compare benchmarks/results/bench-<time>.json
+
+# global libraries
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import tempfile
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "grrd"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+# local libraries
+import generate  # noqa: E402
+import engine  # noqa: E402
+import models  # noqa: E402
+import utils  # noqa: E402
+from config import Config  # noqa: E402
+
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+# entry points (main, batch) and the modules they import, see main.build_app
+IMPORTED_MODULES = ["models", "views", "batch", "main"]
+
+
+class StageTimer:
+    """Wall time and tracemalloc peak of each stage"""
+
+    def __init__(self) -> None:
+        self.stages: dict[str, dict[str, float]] = {}
+
+    def measure(self, name: str, func: Callable[[], Any], rows: int = 0) -> Any:
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        try:
+            result = func()
+        finally:
+            elapsed = time.perf_counter() - t0
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        self.stages[name] = {
+            "seconds": round(elapsed, 4),
+            "peak_mb": round(peak / 1024**2, 2),
+            "rows": rows,
+        }
+        print(f"{name:<24} {elapsed:8.3f}s {peak / 1024**2:9.1f} MB")
+        return result
+
+    def record_inner(self, name: str, within: str) -> None:
+        """A stage timed by utils.stage() during the stage within, its peak
+        memory is the one of within"""
+        m = utils.METRICS.stages.get(name)
+        if m is None:
+            return
+        self.stages[name] = {
+            "seconds": round(m["last_s"], 4),
+            "peak_mb": self.stages[within]["peak_mb"],
+            "rows": int(m["rows"] / m["count"]),
+            "within": within,
+        }
+        print(f"{name:<24} {m['last_s']:8.3f}s {'(' + within + ')':>12}")
+
+
+def make_cfg(grrconfig: Path, datastore: str, grr_engine: str) -> dict:
+    cfg = Config().cfg
+    cfg["general"]["grr_config_csv_filepath"] = str(grrconfig)
+    cfg["input_settings"]["datastore"] = datastore
+    cfg["input_settings"]["max_workers"] = 1
+    cfg["input_settings"]["cache"]["enabled"] = False
+    cfg["grr_settings"]["grr_engine"] = grr_engine
+    cfg["grr_settings"]["baseline"]["mode"] = "off"
+    return cfg
+
+
+def make_parser(cfg: dict) -> models.DataParser:
+    """Parser of cfg without any file read, stages are timed separately"""
+    cls = models.PARSERS[cfg["input_settings"]["datastore"]]
+    if issubclass(cls, models.StreamingParser):
+        # reads nothing without filepaths
+        return cls(cfg, [])
+    parser = cls.__new__(cls)
+    models.DataParser.__init__(parser, cfg, [])
+    return parser
+
+
+def run_benchmarks(datalog: Path, grrconfig: Path, args) -> dict:
+    # dash and plotly, only for the render stages
+    import views
+
+    cfg = make_cfg(grrconfig, datastore=args.datastore, grr_engine=args.grr_engine)
+    VARS = cfg["input_settings"]["variable_names"]
+    timer = StageTimer()
+    parser = make_parser(cfg)
+
+    dfdata, dfheaders = timer.measure(
+        "read_data", lambda: models.read_datalog(datalog, cfg["input_settings"])
+    )
+    rows = len(dfdata)
+    timer.stages["read_data"]["rows"] = rows
+    if not args.skip_legacy:
+        timer.measure(
+            "dataframe_count_reps",
+            lambda: models.dataframe_count_reps(
+                dfdata, PART=VARS["PART"], OPERATOR=VARS["OPERATOR"], REP=VARS["REP"]
+            ),
+            rows=rows,
+        )
+    timer.measure(
+        "dataframe_assign_reps",
+        lambda: models.dataframe_assign_reps(
+            dfdata, PART=VARS["PART"], OPERATOR=VARS["OPERATOR"], REP=VARS["REP"]
+        ),
+        rows=rows,
+    )
+    datastore = timer.measure(
+        "parse_data", lambda: parser.parse_data(dfdata, dfheaders), rows=rows
+    )
+    if isinstance(datastore, models.LongDataStore):
+        timer.measure(
+            "compute_anova",
+            lambda: engine.compute_anova(
+                datastore.df,
+                PART=VARS["PART"],
+                OPERATOR=VARS["OPERATOR"],
+                VALUE=datastore.VALUE,
+                dflimits=datastore.dflimits,
+            ),
+            rows=rows,
+        )
+    utils.METRICS.reset()
+    maker = timer.measure(
+        "GaiaDataMaker",
+        lambda: models.GaiaDataMaker(
+            cfg=cfg, dataparam_list=datastore, dflimits=parser.cfg_grrlimits
+        ),
+        rows=rows,
+    )
+    # per_pair engine only, the batched engine has no GaiaData to compile
+    timer.record_inner("compile_dfs", within="GaiaDataMaker")
+
+    dfs_compact = timer.measure(
+        "compact_results",
+        lambda: engine.compact_results(maker.dfs, PART=VARS["PART"]),
+        rows=len(maker.dfs),
+    )
+    # memory of the results held by the dashboard, grr_settings.compact_dtypes
+    timer.stages["compact_results"]["bytes_per_row_before"] = round(
+        engine.bytes_per_row(maker.dfs), 1
+    )
+    timer.stages["compact_results"]["bytes_per_row_after"] = round(
+        engine.bytes_per_row(dfs_compact), 1
+    )
+    print(
+        f"{'results bytes/row':<24} {engine.bytes_per_row(maker.dfs):8.1f} ->"
+        f" {engine.bytes_per_row(dfs_compact):.1f} compacted"
+    )
+
+    dataset = timer.measure(
+        "Dataset",
+        lambda: models.Dataset(maker.dfs, maker.df_summary),
+        rows=len(maker.dfs),
+    )
+    index = dataset.snapshot.index
+    fom, operator = index.foms[0], index.operators[-1]
+    dfmasked = index.get(fom, operator)
+    timer.measure("render_results", lambda: views.render_results(dfmasked))
+    timer.measure(
+        "render_scatterplot",
+        lambda: views.render_scatterplot(dfmasked, webgl_min_parts=0),
+        rows=len(dfmasked),
+    )
+    timer.measure(
+        "render_scatterplot_gl",
+        lambda: views.render_scatterplot(dfmasked, webgl_min_parts=1),
+        rows=len(dfmasked),
+    )
+    timer.measure(
+        "render_table_page",
+        lambda: views.render_table_page(dfmasked, 0, 50),
+        rows=len(dfmasked),
+    )
+    return timer.stages
+
+
+def measure_imports(modules: list[str], repeat: int = 3) -> dict[str, float]:
+    """Cold import time of each module, best of repeat fresh interpreters"""
+    code = "import time; t = time.perf_counter(); import {}; print(time.perf_counter() - t)"
+    imports = {}
+    for module in modules:
+        seconds = [
+            float(
+                subprocess.run(
+                    [sys.executable, "-c", code.format(module)],
+                    cwd=ROOT / "grrd",
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                ).stdout.split()[-1]
+            )
+            for _ in range(repeat)
+        ]
+        imports[module] = round(min(seconds), 4)
+        print(f"{'import ' + module:<24} {imports[module]:8.3f}s")
+    return imports
+
+
+def get_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return ""
+
+
+def compare(current: dict, filepath: Path) -> None:
+    """Prints the ratios of the stages to a previous result file"""
+    previous = json.loads(filepath.read_text(encoding="utf-8"))
+    print(f"\ncompared to {filepath.name} ({previous.get('commit', '')})")
+    for name, stage in current["stages"].items():
+        if name not in previous["stages"]:
+            continue
+        before = previous["stages"][name]
+        ratio = stage["seconds"] / before["seconds"] if before["seconds"] else 0
+        print(
+            f"{name:<24} {before['seconds']:8.3f}s -> {stage['seconds']:8.3f}s"
+            f" (x{ratio:.2f}), {before['peak_mb']:.1f} -> {stage['peak_mb']:.1f} MB"
+        )
+    for module, seconds in current.get("imports", {}).items():
+        before = previous.get("imports", {}).get(module)
+        if before:
+            print(f"{'import ' + module:<24} {before:8.3f}s -> {seconds:8.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the grrd pipeline")
+    generate.add_arguments(parser)
+    parser.add_argument("--datastore", default="long", choices=sorted(models.PARSERS))
+    parser.add_argument("--grr-engine", default="batched")
+    parser.add_argument("--output", type=Path, default=RESULTS_DIR)
+    parser.add_argument("--compare", type=Path, help="previous result JSON")
+    parser.add_argument(
+        "--import-repeat",
+        type=int,
+        default=3,
+        help="fresh interpreters per import timing, 0 to skip",
+    )
+    parser.add_argument(
+        "--skip-legacy",
+        action="store_true",
+        help="skips dataframe_count_reps, quadratic in the number of groups",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        datalog = generate.generate_datalog(
+            Path(tmpdir) / "datalog.csv",
+            parts=args.parts,
+            operators=args.operators,
+            reps=args.reps,
+            foms=args.foms,
+            seed=args.seed,
+        )
+        grrconfig = generate.generate_grrconfig(
+            Path(tmpdir) / "grrConfig.csv", foms=args.foms, seed=args.seed
+        )
+        file_mb = datalog.stat().st_size / 1024**2
+        print(f"synthetic datalog {file_mb:.1f} MB")
+        stages = run_benchmarks(datalog, grrconfig, args)
+    imports = {}
+    if args.import_repeat > 0:
+        imports = measure_imports(IMPORTED_MODULES, repeat=args.import_repeat)
+
+    result = {
+        "time": utils.get_time(),
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "params": {
+            "parts": args.parts,
+            "operators": args.operators,
+            "reps": args.reps,
+            "foms": args.foms,
+            "seed": args.seed,
+            "datastore": args.datastore,
+            "grr_engine": args.grr_engine,
+            "skip_legacy": args.skip_legacy,
+        },
+        "file_mb": round(file_mb, 2),
+        "stages": stages,
+        "imports": imports,
+    }
+    args.output.mkdir(parents=True, exist_ok=True)
+    filepath = args.output / f"bench-{result['time']}.json"
+    filepath.write_text(json.dumps(result, indent=2), encoding="utf-8")
+    print(f"results written to {filepath}")
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# baseline.py is part of MODEL in the design framework
+# Persistent store of golden per-part statistics, keyed by recipe and version
+
+# global libraries
+import os
+import re
+from pathlib import Path
+from typing import Mapping
+
+import pandas as pd
+
+# local libraries
+import utils
+from engine import GOLDEN_COLUMNS
+
+APP_NAME = "grrd"
+BASELINE_MODES = ("off", "save", "use")
+
+
+class GoldenBaseline:
+    """Golden reference baseline, saved as a CSV file per recipe and version
+
+    The file holds the golden per-part statistics of every FOM
+    (see engine.golden_stats), so new datalogs can be evaluated against it
+    without the golden operator being re-measured, re-parsed or re-aggregated.
+    """
+
+    def __init__(self, cfg: Mapping) -> None:
+        self.log = utils.setup_logger(APP_NAME)
+        cfg_baseline = cfg["grr_settings"].get("baseline", {})
+        self.mode = cfg_baseline.get("mode", "off")
+        if self.mode not in BASELINE_MODES:
+            raise utils.ConfigError(f"unknown baseline {self.mode=}")
+        self.directory = Path(
+            os.path.expanduser(cfg_baseline.get("directory", "~/tmp/grrd/baselines"))
+        )
+        self.recipe_name = str(cfg["general"]["recipe_name"])
+        self.version = str(cfg["grr_settings"]["version"])
+        self.PART = cfg["input_settings"]["variable_names"]["PART"]
+
+    def __str__(self) -> str:
+        return f"{self.__class__.__name__}(mode={self.mode}, filepath={self.filepath})"
+
+    @property
+    def filepath(self) -> Path:
+        name = f"{self.recipe_name}-{self.version}"
+        name = re.sub(r"[^\w.-]", "_", name)
+        return self.directory / f"golden-{name}.csv"
+
+    def exists(self) -> bool:
+        return self.filepath.is_file()
+
+    def save(self, dfgolden: pd.DataFrame) -> Path:
+        """IO: Saves the output of engine.golden_stats() as the baseline"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        df = dfgolden[["fom", self.PART] + GOLDEN_COLUMNS]
+        df.to_csv(self.filepath, index=False)
+        self.log.info(f"golden baseline saved {self.filepath.name} ({len(df)} rows)")
+        return self.filepath
+
+    def load(self) -> pd.DataFrame:
+        """IO: Loads the baseline, same columns as engine.golden_stats()"""
+        if not self.exists():
+            raise RuntimeError(f"missing golden baseline {self.filepath=}")
+        df = pd.read_csv(
+            self.filepath,
+            dtype={"fom": str, self.PART: str, "golden_count_value": "int64"},
+        )
+        self.log.info(f"golden baseline loaded {self.filepath.name} ({len(df)} rows)")
+        return df
@@ -0,0 +1,156 @@
+# batch.py is part of CONTROLLER in the design framework
+# Headless GR&R of many lots, exported without starting the dashboard, e.g.
+#   python grrd/batch.py lots/lot1 lots/lot2 datalog.csv --outdir out --format parquet
+# Exit code: 0 all GR&R passed, 1 a GR&R failed, 2 a lot could not be processed
+# Does not import plotly/dash (views.py)
+
+# global libraries
+import sys
+import argparse
+import importlib.util
+from pathlib import Path
+from typing import Mapping, Optional
+
+import pandas as pd
+
+# local libraries
+import utils
+import models
+from config import Config
+
+APP_NAME = "grrd"
+EXIT_PASSED = 0
+EXIT_FAILED = 1
+EXIT_ERROR = 2
+
+
+def find_grrconfig(directory: Path) -> Path:
+    specs_files = sorted(directory.glob("*grr[cC]onfig.csv"))
+    if not specs_files:
+        raise RuntimeError(f"no grrConfig, check {directory}")
+    return specs_files[0]
+
+
+def get_lot(
+    path: Path, grrconfig: Optional[Path] = None
+) -> tuple[str, Path, list[Path]]:
+    """A lot is a datalog, or every datalog of a directory
+
+    :return: (name, grrconfig, datalogs)
+    :rtype: tuple[str, Path, list[Path]]
+    """
+    if path.is_dir():
+        datalogs = models.list_datalogs(path)
+        directory = path
+    elif path.is_file():
+        datalogs = [path]
+        directory = path.parent
+    else:
+        raise RuntimeError(f"not found {path=}")
+    if not datalogs:
+        raise RuntimeError(f"no *.csv files, check {path}")
+    return path.stem, grrconfig or find_grrconfig(directory), datalogs
+
+
+def compute_lot(
+    cfg: Mapping, grrconfig: Path, datalogs: list[Path]
+) -> tuple[pd.DataFrame, pd.DataFrame, Optional[pd.DataFrame]]:
+    """Parses the datalogs of a lot and computes its GR&R
+
+    :return: (dfs, df_summary, df_anova) of GaiaDataMaker
+    :rtype: tuple[pd.DataFrame, pd.DataFrame, Optional[pd.DataFrame]]
+    """
+    cfg["general"]["grr_config_csv_filepath"] = str(grrconfig.resolve())
+    data = models.make_parser(cfg=cfg, filepaths=datalogs)  # type: ignore
+    maker = models.GaiaDataMaker(
+        cfg=cfg,
+        dataparam_list=data.datastore,
+        dflimits=data.cfg_grrlimits,
+    )
+    return maker.dfs, maker.df_summary, maker.df_anova
+
+
+def export_results(
+    dfs: pd.DataFrame,
+    df_summary: pd.DataFrame,
+    outdir: Path,
+    name: str,
+    filetype: str = "csv",
+    df_anova: Optional[pd.DataFrame] = None,
+) -> list[Path]:
+    """IO: Writes {name}.summary and {name}.results, and {name}.anova if
+    grr_settings.anova is enabled, as csv or parquet"""
+    outdir.mkdir(parents=True, exist_ok=True)
+    outpaths = []
+    tables = [(df_summary, "summary"), (dfs, "results")]
+    if df_anova is not None:
+        tables.append((df_anova, "anova"))
+    for df, table in tables:
+        outpath = outdir / f"{name}.{table}.{filetype}"
+        match filetype:
+            case "csv":
+                df.to_csv(outpath, index=False)
+            case "parquet":
+                df.to_parquet(outpath, index=False)
+            case _:
+                raise RuntimeError(f"unaccepted {filetype=}")
+        outpaths.append(outpath)
+    return outpaths
+
+
+def run(
+    paths: list[Path],
+    outdir: Path,
+    filetype: str = "csv",
+    grrconfig: Optional[Path] = None,
+) -> int:
+    """Computes and exports the GR&R of every lot
+
+    :return: exit code, EXIT_PASSED, EXIT_FAILED or EXIT_ERROR
+    :rtype: int
+    """
+    log = utils.setup_logger(APP_NAME)
+    if filetype == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        raise utils.ConfigError("parquet export requires pyarrow")
+    cfg = Config().cfg
+    exit_code = EXIT_PASSED
+    n = len(paths)
+    for i, path in enumerate(paths, 1):
+        try:
+            name, specs_file, datalogs = get_lot(path, grrconfig)
+            dfs, df_summary, df_anova = compute_lot(cfg, specs_file, datalogs)
+            export_results(dfs, df_summary, outdir, name, filetype, df_anova)
+        except Exception as e:
+            log.error(f"[{i}/{n}] {path}: {e!r}")
+            print(f"{path}: ERROR {e!r}")
+            exit_code = EXIT_ERROR
+            continue
+        failed = int((~df_summary["grr_passed"].fillna(False).astype(bool)).sum())
+        status = "FAIL" if failed else "PASS"
+        log.info(f"[{i}/{n}] {name}: {status}, {failed}/{len(df_summary)} failed")
+        print(f"{name}: {status} ({failed}/{len(df_summary)} fom x operator failed)")
+        if failed and exit_code == EXIT_PASSED:
+            exit_code = EXIT_FAILED
+    return exit_code
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Computes and exports GR&R results without the dashboard"
+    )
+    parser.add_argument(
+        "paths", nargs="+", type=Path, help="datalogs, or directories of datalogs"
+    )
+    parser.add_argument("--outdir", type=Path, default=Path("grrd-results"))
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument(
+        "--grrconfig",
+        type=Path,
+        help="grrConfig of every lot, defaults to the one next to the datalogs",
+    )
+    args = parser.parse_args()
+    return run(args.paths, args.outdir, args.format, args.grrconfig)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+# cache.py is part of MODEL in the design framework
+# Content-addressed Parquet cache of parsed datalogs, and in-memory LRU
+# cache of rendered dashboard payloads
+
+# global libraries
+import os
+import json
+import hashlib
+import threading
+import importlib.util
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Hashable, Mapping, Optional
+
+import pandas as pd
+
+# local libraries
+import utils
+
+APP_NAME = "grrd"
+TABLES = ("data", "headers")
+
+
+class ParseCache:
+    """Caches the (dfdata, dfheaders) of read_datalog() as Parquet files
+
+    Entries are keyed by the datalog (size+mtime, or a hash of its content)
+    and by the input_settings that change how it is parsed. The directory is
+    bounded to max_size_mb, evicting the least recently used entries first.
+    """
+
+    def __init__(self, input_settings: Mapping) -> None:
+        self.log = utils.setup_logger(APP_NAME)
+        cfg = input_settings.get("cache", {})
+        self.enabled = bool(cfg.get("enabled", False))
+        self.directory = Path(
+            os.path.expanduser(cfg.get("directory", "~/tmp/grrd/cache"))
+        )
+        self.max_size = int(cfg.get("max_size_mb", 2048)) * 1024 * 1024
+        self.hash = cfg.get("hash", "stat")
+        if self.hash not in ("stat", "content"):
+            raise utils.ConfigError(f"unknown cache {self.hash=}")
+        # only the settings that change the output of read_datalog()
+        self.settings = json.dumps(
+            {
+                "reading_format": input_settings["reading_format"],
+                "variable_names": input_settings["variable_names"],
+                "csv_engine": utils.get_csv_engine(input_settings),
+            },
+            sort_keys=True,
+            default=str,
+        )
+        if self.enabled and importlib.util.find_spec("pyarrow") is None:
+            self.log.warning("cache requires pyarrow, caching disabled")
+            self.enabled = False
+
+    def __str__(self) -> str:
+        return f"{self.__class__.__name__}(enabled={self.enabled}, directory={self.directory})"
+
+    def make_key(self, filepath: Path | str) -> str:
+        fp = Path(filepath).resolve()
+        h = hashlib.sha1(self.settings.encode("utf-8"))
+        if self.hash == "content":
+            with open(fp, mode="rb") as f:
+                h.update(hashlib.file_digest(f, "sha1").digest())
+        else:
+            stat = fp.stat()
+            h.update(f"{fp}|{stat.st_size}|{stat.st_mtime_ns}".encode("utf-8"))
+        return h.hexdigest()
+
+    def get_paths(self, key: str) -> dict[str, Path]:
+        return {t: self.directory / f"{key}.{t}.parquet" for t in TABLES}
+
+    def load(self, key: str) -> Optional[tuple[pd.DataFrame, pd.DataFrame]]:
+        """IO: Returns (dfdata, dfheaders), or None on a cache miss"""
+        paths = self.get_paths(key)
+        if not all(fp.is_file() for fp in paths.values()):
+            return None
+        try:
+            dfdata = pd.read_parquet(paths["data"])
+            dfheaders = pd.read_parquet(paths["headers"])
+        except Exception as e:
+            self.log.warning(f"cache entry {key} unreadable, {e=}")
+            return None
+        for fp in paths.values():
+            try:
+                os.utime(fp)  # mtime is the LRU clock, touch() would recreate it
+            except FileNotFoundError:
+                pass  # evicted by another process since it was read
+        return (dfdata, dfheaders)
+
+    def save(self, key: str, dfdata: pd.DataFrame, dfheaders: pd.DataFrame) -> None:
+        """IO: Writes an entry, then evicts old entries if over max_size_mb"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        paths = self.get_paths(key)
+        try:
+            for df, t in [(dfdata, "data"), (dfheaders, "headers")]:
+                tmp = paths[t].with_suffix(".tmp")
+                df.to_parquet(tmp)
+                os.replace(tmp, paths[t])
+        except Exception as e:
+            # e.g. object columns with mixed types, not supported by Parquet
+            self.log.warning(f"unable to cache {key}, {e=}")
+            for fp in self.directory.glob(f"{key}.*"):
+                fp.unlink(missing_ok=True)
+            return
+        self.evict()
+
+    def evict(self) -> None:
+        """IO: Deletes the least recently used entries over max_size_mb,
+        other processes (e.g. the pool of DataParser.read_files()) may save
+        and evict at the same time"""
+        entries: dict[str, list[os.stat_result]] = {}
+        files: dict[str, list[Path]] = {}
+        for fp in self.directory.glob("*.parquet"):
+            try:
+                stat = fp.stat()
+            except FileNotFoundError:
+                continue  # evicted by another process
+            key = fp.name.split(".")[0]
+            entries.setdefault(key, []).append(stat)
+            files.setdefault(key, []).append(fp)
+        total = sum(s.st_size for stats in entries.values() for s in stats)
+        lru = sorted(entries, key=lambda k: max(s.st_mtime for s in entries[k]))
+        for key in lru:
+            if total <= self.max_size:
+                break
+            total -= sum(s.st_size for s in entries[key])
+            for fp in files[key]:
+                fp.unlink(missing_ok=True)
+            self.log.debug(f"cache entry {key} evicted")
+
+
+class RenderCache:
+    """Thread-safe LRU cache of rendered payloads (figures, tables)
+
+    Keys are tuples starting with the dataset version, e.g.
+    (version, dataset_id, "scatterplot", fom, operator). Bounded by both max_entries and
+    max_size_mb, where the size of an entry is given by the caller
+    (e.g. the length of its serialized JSON).
+    """
+
+    def __init__(self, max_entries: int = 256, max_size_mb: float = 64) -> None:
+        self.log = utils.setup_logger(APP_NAME)
+        self.max_entries = int(max_entries)
+        self.max_size = int(float(max_size_mb) * 1024 * 1024)
+        self.enabled = self.max_entries > 0 and self.max_size > 0
+        self.entries: OrderedDict[Hashable, tuple[Any, int]] = OrderedDict()
+        self.lock = threading.Lock()
+        self.versions: dict[Hashable, int] = {}  # last version per scope
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __str__(self) -> str:
+        return f"{self.__class__.__name__}(entries={len(self.entries)}, hits={self.hits}, misses={self.misses})"
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+            "size_bytes": self.size,
+            "max_size_bytes": self.max_size,
+        }
+
+    def get(self, key: tuple) -> Optional[Any]:
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key][0]
+
+    def put(self, key: tuple, value: Any, nbytes: int) -> None:
+        if not self.enabled or nbytes > self.max_size:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key)[1]
+            self.entries[key] = (value, nbytes)
+            self.size += nbytes
+            while len(self.entries) > self.max_entries or self.size > self.max_size:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.size -= evicted
+                self.evictions += 1
+
+    def invalidate(self, version: int, scope: Hashable = None) -> None:
+        """Drops the entries of any other dataset version
+
+        :param scope: only the entries keyed (version, scope, ...), e.g. of
+            one of several datasets, else all entries
+        """
+        if self.versions.get(scope) == version:
+            return
+        with self.lock:
+            stale = [
+                k
+                for k in self.entries
+                if k[0] != version and (scope is None or k[1] == scope)
+            ]
+            for key in stale:
+                self.size -= self.entries.pop(key)[1]
+            self.versions[scope] = version
+        if stale:
+            self.log.debug(f"render cache: {len(stale)} entries invalidated")
@@ -0,0 +1,423 @@
+# engine.py is part of MODEL in the design framework
+# Batched GR&R computations over long-format data, all FOMs x operators at once
+
+# global libraries
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+APP_NAME = "grrd"
+GOLDEN_TAG = "_gold"
+AGG_COLUMNS = ["count_value", "sum_value", "min_value", "max_value"]
+GOLDEN_COLUMNS = [
+    "golden_mean_value",
+    "golden_count_value",
+    "golden_min_value",
+    "golden_max_value",
+]
+# derived columns of compute_grr(), float32 keeps ~7 significant digits
+FLOAT32_COLUMNS = [
+    "grr_mean_offset",
+    "grr_pos_offset",
+    "grr_neg_offset",
+    "grr_high_pct",
+    "grr_low_pct",
+]
+FLAG_COLUMNS = ["grr_part_passed", "grr_passed"]
+
+
+def find_golden_operator(operators: Iterable[str]) -> str:
+    """Returns the golden operator, or "" for pseudo-golden mode
+
+    :raises RuntimeError: more than 1 golden operator
+    """
+    golden = [op for op in operators if GOLDEN_TAG in str(op).lower()]
+    match golden_operator_count := len(golden):
+        case 0:
+            return ""
+        case 1:
+            return golden[0]
+        case _:
+            raise RuntimeError(
+                f"more than 1 golden operator, found ({golden_operator_count=})"
+            )
+
+
+def aggregate_parts(
+    df: pd.DataFrame, PART: str, OPERATOR: str, VALUE: str = "value"
+) -> pd.DataFrame:
+    """Single grouped aggregation of a long table per (fom, OPERATOR, PART)
+
+    Sums are kept instead of means, so that aggregates can be merged
+    (see merge_aggregates) before the means are derived.
+
+    :param df: long table
+    :type df: pd.DataFrame(columns=[fom, PART, OPERATOR, VALUE])
+    :return: aggregates
+    :rtype: pd.DataFrame(columns=[fom, OPERATOR, PART, *AGG_COLUMNS])
+    """
+    dfagg = df.groupby(by=["fom", OPERATOR, PART], observed=True, sort=False)[
+        VALUE
+    ].agg(["count", "sum", "min", "max"])
+    dfagg.columns = AGG_COLUMNS
+    return dfagg.reset_index()
+
+
+def aggregate_wide(
+    df: pd.DataFrame, foms: list[str], PART: str, OPERATOR: str
+) -> pd.DataFrame:
+    """aggregate_parts() of a wide table, all FOM columns in one groupby
+
+    :param df: wide table, one column per FOM
+    :type df: pd.DataFrame(columns=[PART, OPERATOR, *foms])
+    :return: aggregates, fom is categorical
+    :rtype: pd.DataFrame(columns=[fom, OPERATOR, PART, *AGG_COLUMNS])
+    """
+    missing = [fom for fom in foms if fom not in df.columns]
+    if missing:
+        df = df.assign(**{fom: np.nan for fom in missing})
+    g = df.groupby(by=[OPERATOR, PART], sort=False)[foms]
+    stats = [g.count(), g.sum(), g.min(), g.max()]
+    keys = stats[0].index
+    nkeys, nfoms = len(keys), len(foms)
+    # (keys x foms) tables are stacked fom by fom, like the long table
+    dfagg = pd.DataFrame(
+        {
+            "fom": pd.Categorical.from_codes(
+                np.repeat(np.arange(nfoms, dtype="int32"), nkeys), categories=foms
+            ),
+            OPERATOR: np.tile(keys.get_level_values(0).to_numpy(), nfoms),
+            PART: np.tile(keys.get_level_values(1).to_numpy(), nfoms),
+        }
+    )
+    for col, dfstat in zip(AGG_COLUMNS, stats):
+        dfagg[col] = dfstat.to_numpy().ravel(order="F")
+    return dfagg
+
+
+def merge_aggregates(dfagg: pd.DataFrame, keys: list[str]) -> pd.DataFrame:
+    """Combines partial aggregates (e.g. of several chunks) sharing the same keys"""
+    dfagg = dfagg.groupby(by=keys, observed=True, sort=False).agg(
+        count_value=("count_value", "sum"),
+        sum_value=("sum_value", "sum"),
+        min_value=("min_value", "min"),
+        max_value=("max_value", "max"),
+    )
+    return dfagg.reset_index()
+
+
+class PartAggregator:
+    """Running aggregates per (fom, OPERATOR, PART) of a stream of wide chunks
+
+    Each chunk is reduced with aggregate_wide() and added into the running
+    table, keyed by (fom, OPERATOR, PART): the groups already seen are
+    updated in place, only the new groups are appended. Memory is bounded by
+    the number of groups, not the rows. Also counts the reps per
+    (PART, OPERATOR).
+    """
+
+    def __init__(self, foms: list[str], PART: str, OPERATOR: str) -> None:
+        self.foms = foms
+        self.PART = PART
+        self.OPERATOR = OPERATOR
+        self.rows = 0
+        self.keys: Optional[pd.MultiIndex] = None
+        self.values: dict[str, np.ndarray] = {}
+        self.reps = pd.Series(dtype="int64")
+
+    def __str__(self) -> str:
+        groups = 0 if self.keys is None else len(self.keys)
+        return f"{self.__class__.__name__}(rows={self.rows}, {groups=})"
+
+    def update(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Merges a wide chunk into the running aggregates
+
+        :return: aggregates of the chunk alone, i.e. the groups it touched
+        :rtype: pd.DataFrame
+        """
+        df = df[df[self.PART].notna() & df[self.OPERATOR].notna()]
+        dfchunk = aggregate_wide(df, self.foms, PART=self.PART, OPERATOR=self.OPERATOR)
+        reps = df.groupby(by=[self.PART, self.OPERATOR], sort=False).size()
+        if self.reps.empty:
+            self.reps = reps
+        else:
+            self.reps = self.reps.add(reps, fill_value=0).astype("int64")
+        self.add(dfchunk)
+        self.rows += len(df)
+        return dfchunk
+
+    def add(self, dfchunk: pd.DataFrame) -> None:
+        """Adds the aggregates of a chunk into the keyed running table, the
+        chunk alone is grouped (see merge_aggregates for whole tables)"""
+        keys = pd.MultiIndex.from_frame(dfchunk[["fom", self.OPERATOR, self.PART]])
+        # copies, the state is updated in place and dfchunk is returned
+        values = {
+            col: np.array(
+                dfchunk[col], dtype="int64" if col == "count_value" else "float64"
+            )
+            for col in AGG_COLUMNS
+        }
+        if self.keys is None:
+            self.keys, self.values = keys, values
+            return
+        pos = self.keys.get_indexer(keys)
+        seen = pos >= 0
+        rows = pos[seen]
+        for col, combine in zip(AGG_COLUMNS, [np.add, np.add, np.fmin, np.fmax]):
+            state = self.values[col]
+            state[rows] = combine(state[rows], values[col][seen])
+        if not seen.all():
+            self.keys = self.keys.append(keys[~seen])
+            for col in AGG_COLUMNS:
+                self.values[col] = np.concatenate(
+                    [self.values[col], values[col][~seen]]
+                )
+
+    def result(self) -> pd.DataFrame:
+        """Returns the aggregates, with categorical keys like aggregate_parts()"""
+        dfagg = self.keys.to_frame(index=False).assign(**self.values)
+        return dfagg.astype({self.OPERATOR: "category", self.PART: "category"})
+
+
+def golden_stats(
+    dfagg: pd.DataFrame, golden_operator: str, PART: str, OPERATOR: str
+) -> pd.DataFrame:
+    """Golden per-part statistics, from the golden operator's aggregates
+    or pooled over all operators in pseudo-golden mode
+
+    :return: golden table
+    :rtype: pd.DataFrame(columns=[fom, PART, *GOLDEN_COLUMNS])
+    """
+    if golden_operator:
+        df = dfagg[dfagg[OPERATOR] == golden_operator].drop(columns=OPERATOR)
+    else:
+        df = merge_aggregates(dfagg, keys=["fom", PART])
+    df = df.assign(mean_value=df["sum_value"] / df["count_value"].replace(0, np.nan))
+    df = df.rename(columns=lambda x: f"golden_{x}" if x.endswith("_value") else x)
+    return df[["fom", PART] + GOLDEN_COLUMNS]
+
+
+def lookup_fom(dslimits: pd.Series, foms: pd.Series) -> np.ndarray:
+    """Broadcasts a per-FOM series onto every row, using the categorical codes"""
+    if isinstance(foms.dtype, pd.CategoricalDtype):
+        values = dslimits.reindex(foms.cat.categories).to_numpy()
+        return values[foms.cat.codes.to_numpy()]
+    return dslimits.reindex(foms).to_numpy()
+
+
+def compute_grr(
+    dfagg: pd.DataFrame,
+    dfgolden: pd.DataFrame,
+    dflimits: pd.DataFrame,
+    PART: str,
+    OPERATOR: str,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Vectorized equivalent of GaiaDataMaker.breakdown_to_sockets(),
+    compute_grr_pct() and compute_grr_status() for all FOM x operator pairs
+
+    Every operator of a FOM is outer joined with the golden parts of the FOM,
+    like the per-pair pd.merge(how="outer") does.
+
+    :param dfagg: output of aggregate_parts()
+    :param dfgolden: output of golden_stats()
+    :param dflimits: limits table indexed by fom, with a grr_limit column
+    :return: (dfs, df_summary), same columns as GaiaDataMaker.dfs/df_summary
+    :rtype: tuple[pd.DataFrame, pd.DataFrame]
+    """
+    pairs = dfagg[["fom", OPERATOR]].drop_duplicates()
+    # only the golden mean is in the results, the rest is not broadcast
+    dfgolden = dfgolden[["fom", PART, "golden_mean_value"]]
+    dfgolden = pd.merge(left=pairs, right=dfgolden, on="fom", how="inner")
+    df = pd.merge(left=dfgolden, right=dfagg, on=["fom", OPERATOR, PART], how="outer")
+
+    # results are computed in their sorted order, column by column, into a
+    # new frame: the merged frame is neither extended nor consolidated
+    keys = ["fom", OPERATOR, PART]
+    order = df[keys].sort_values(by=keys, kind="stable").index.to_numpy()
+
+    def take(col: str) -> np.ndarray:
+        return df[col].to_numpy()[order]
+
+    count = take("count_value")
+    mean_value = take("sum_value") / np.where(count == 0, np.nan, count)
+    golden_mean_value = take("golden_mean_value")
+    foms = df["fom"].array.take(order)
+    grr_limits = lookup_fom(dflimits["grr_limit"], pd.Series(foms)).astype("float64")
+    grr_pos_offset = np.abs(take("max_value") - golden_mean_value)
+    grr_neg_offset = np.abs(take("min_value") - golden_mean_value)
+    grr_high_pct = grr_pos_offset / grr_limits * 100
+    grr_low_pct = grr_neg_offset / grr_limits * 100
+    df = pd.DataFrame(
+        {
+            PART: df[PART].array.take(order),
+            "mean_value": mean_value,
+            "golden_mean_value": golden_mean_value,
+            "grr_mean_offset": mean_value - golden_mean_value,
+            "grr_limits": grr_limits,
+            "grr_pos_offset": grr_pos_offset,
+            "grr_neg_offset": grr_neg_offset,
+            "grr_high_pct": grr_high_pct,
+            "grr_low_pct": grr_low_pct,
+            "grr_part_passed": (grr_high_pct < 100) & (grr_low_pct < 100),
+            "fom": foms,
+            "operator": df[OPERATOR].array.take(order),
+        },
+        copy=False,
+    )
+
+    df_summary = df.groupby(by=["fom", "operator"], observed=True, sort=False).agg(
+        grr_passed=("grr_part_passed", "all"),
+        grr_limits=("grr_limits", "first"),
+    )
+    return df, df_summary.reset_index()
+
+
+def replace_pairs(df: pd.DataFrame, dfnew: pd.DataFrame) -> pd.DataFrame:
+    """Replaces the rows of the (fom, operator) pairs found in dfnew,
+    for results in the layout of compute_grr()"""
+    keys = ["fom", "operator"]
+    new_pairs = pd.MultiIndex.from_frame(dfnew[keys].astype(str))
+    mask = pd.MultiIndex.from_frame(df[keys].astype(str)).isin(new_pairs)
+    # empty frames are left out of the concat, they would not count towards
+    # the result dtypes in pandas 2 but do in pandas 3
+    frames = [x for x in (df[~mask], dfnew) if not x.empty]
+    if len(frames) == 2:
+        df = pd.concat(frames, ignore_index=True)
+    elif frames:
+        df = frames[0]
+    return df.sort_values(by=keys, kind="stable", ignore_index=True)
+
+
+def compact_results(df: pd.DataFrame, PART: str = "") -> pd.DataFrame:
+    """Returns results in the layout of compute_grr() with compact dtypes:
+    categorical keys, float32 derived grr_* columns and boolean flags
+
+    Measured values (mean_value, golden_mean_value) and grr_limits stay
+    float64. Pass flags with missing values become the nullable "boolean".
+    """
+    dtypes = {}
+    for col in df.columns:
+        dtype = df[col].dtype
+        if col in ("fom", "operator", PART) and dtype == object:
+            dtypes[col] = "category"
+        elif col in FLOAT32_COLUMNS and dtype == "float64":
+            dtypes[col] = "float32"
+        elif col in FLAG_COLUMNS and dtype == object:
+            dtypes[col] = "boolean" if df[col].isna().any() else "bool"
+    return df.astype(dtypes) if dtypes else df
+
+
+def bytes_per_row(df: pd.DataFrame) -> float:
+    """Memory of df per row, including the strings of object columns"""
+    return float(df.memory_usage(deep=True).sum()) / max(len(df), 1)
+
+
+def compute_anova(
+    df: pd.DataFrame,
+    PART: str,
+    OPERATOR: str,
+    VALUE: str = "value",
+    dflimits: Optional[pd.DataFrame] = None,
+) -> pd.DataFrame:
+    """ANOVA Gage R&R (AIAG MSA, crossed parts x operators with interaction)
+    of every FOM at once
+
+    Counts and sums per FOM, (FOM, PART), (FOM, OPERATOR) and cell are taken
+    by np.bincount over the long table, values centered on their FOM mean.
+    The sums of squares then follow as arrays of one value per FOM. Each
+    FOM should be balanced: for an unbalanced FOM, the reps are taken as the
+    mean count per cell.
+
+    :param df: long table
+    :type df: pd.DataFrame(columns=[fom, PART, OPERATOR, VALUE])
+    :param dflimits: limits table indexed by fom, usl and lsl give grr_tol_pct
+    :return: one row per FOM, sums of squares, variance components,
+        %EV/%AV/%GRR/%PV of the total variation and ndc
+    :rtype: pd.DataFrame
+    """
+    fom, foms = pd.factorize(df["fom"])
+    part = pd.factorize(df[PART])[0].astype("int64")
+    operator, operators = pd.factorize(df[OPERATOR])
+    x = df[VALUE].to_numpy(dtype="float64", na_value=np.nan)
+    valid = ~np.isnan(x) & (fom >= 0) & (part >= 0) & (operator >= 0)
+    fom, part, operator, x = fom[valid], part[valid], operator[valid], x[valid]
+    nfoms, nparts, noperators = len(foms), int(part.max(initial=-1)) + 1, len(operators)
+
+    def per_fom(codes: np.ndarray, weights: Optional[np.ndarray] = None):
+        return np.bincount(codes, weights=weights, minlength=nfoms)
+
+    n = per_fom(fom)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # centered on the FOM mean, sums of squares of large values stay exact
+        x = x - (per_fom(fom, x) / n)[fom]
+
+        def ss_between(key: np.ndarray, stride: int) -> tuple[np.ndarray, np.ndarray]:
+            """Sum over the groups of key of sum^2 / count, and group count,
+            per FOM, key // stride is the FOM of a group"""
+            codes, uniques = pd.factorize(key)
+            count = np.bincount(codes)
+            total = np.bincount(codes, weights=x)
+            group_fom = uniques // stride
+            return per_fom(group_fom, total**2 / count), per_fom(group_fom)
+
+        fom64 = fom.astype("int64")
+        ss_parts_, p = ss_between(fom64 * nparts + part, nparts)
+        ss_operators_, o = ss_between(fom64 * noperators + operator, noperators)
+        ss_cells, cells = ss_between(
+            (fom64 * noperators + operator) * nparts + part, noperators * nparts
+        )
+        sum_x = per_fom(fom, x)
+        cf = sum_x**2 / n  # ~0, x is centered
+        ss_total = per_fom(fom, x * x) - cf
+        ss_part = ss_parts_ - cf
+        ss_operator = ss_operators_ - cf
+        ss_interaction = ss_cells - cf - ss_part - ss_operator
+        ss_repeatability = ss_total - (ss_cells - cf)
+
+        dof_part, dof_operator = p - 1, o - 1
+        dof_interaction = dof_part * dof_operator
+        dof_repeatability = n - cells
+        ms_part = ss_part / dof_part
+        ms_operator = ss_operator / dof_operator
+        ms_interaction = ss_interaction / dof_interaction
+        ms_repeatability = ss_repeatability / dof_repeatability
+        reps = n / cells  # mean count per cell, n / (p * o) when balanced
+
+        var_repeatability = ms_repeatability
+        var_interaction = np.maximum((ms_interaction - ms_repeatability) / reps, 0)
+        var_operator = np.maximum((ms_operator - ms_interaction) / (p * reps), 0)
+        var_part = np.maximum((ms_part - ms_interaction) / (o * reps), 0)
+        var_reproducibility = var_operator + var_interaction
+        var_grr = var_repeatability + var_reproducibility
+        var_total = var_grr + var_part
+
+        sigma_total = np.sqrt(var_total)
+        dfanova = pd.DataFrame(
+            {
+                "fom": foms,
+                "n_parts": p,
+                "n_operators": o,
+                "reps": reps,
+                "ss_part": ss_part,
+                "ss_operator": ss_operator,
+                "ss_interaction": ss_interaction,
+                "ss_repeatability": ss_repeatability,
+                "ss_total": ss_total,
+                "var_repeatability": var_repeatability,
+                "var_reproducibility": var_reproducibility,
+                "var_part": var_part,
+                "var_total": var_total,
+                "ev_pct": np.sqrt(var_repeatability) / sigma_total * 100,
+                "av_pct": np.sqrt(var_reproducibility) / sigma_total * 100,
+                "grr_pct": np.sqrt(var_grr) / sigma_total * 100,
+                "pv_pct": np.sqrt(var_part) / sigma_total * 100,
+                # number of distinct categories, AIAG: 1.41 * PV / GRR
+                "ndc": np.floor(1.41 * np.sqrt(var_part / var_grr)),
+            }
+        )
+        if dflimits is not None:
+            tolerance = dflimits["usl"] - dflimits["lsl"]
+            tolerance = tolerance.reindex(np.asarray(foms, dtype=object)).to_numpy()
+            dfanova["grr_tol_pct"] = 6 * np.sqrt(var_grr) / tolerance * 100
+    return dfanova
@@ -1,12 +1,22 @@
-from typing import Mapping
+import os
+import threading
+import importlib
+from typing import TYPE_CHECKING, Callable, Mapping, Optional
 from pathlib import Path
 
 import config
-import views
+import utils
 import models
+import watcher
+import sessions
+import resultstore
 import platform
 
+if TYPE_CHECKING:
+    from dash import Dash
+
 APP_NAME = "grrd"
+TARGETDIR_ID = "targetdir"  # dataset ID of targetdir, see sessions.py
 
 
 def start_flask_error_dev(
@@ -53,9 +63,13 @@ def start_flask_error_server(
     app.run(host="0.0.0.0", port=port)
 
 
-def load_filepaths() -> tuple[Mapping, str, str]:
-    """initialises the cfg and filepath variables by based on machines"""
-    cfg = config.Config().cfg
+def load_filepaths() -> tuple[Mapping, list[str]]:
+    """initialises the cfg and filepath variables by based on machines
+
+    The specs files are set in cfg, see specs.SpecRegistry
+    """
+    with utils.stage("config_load"):
+        cfg = config.Config().cfg
 
     cwd = Path(__file__).parent.parent
     user_dir = cwd / "targetdir"
@@ -63,29 +77,195 @@ def load_filepaths() -> tuple[Mapping, str, str]:
     if not user_dir.is_dir():
         raise RuntimeError(f"unable to load {user_dir=}")
 
-    specs_files = [fp for fp in user_dir.glob("*grr[cC]onfig.csv")]
+    # several recipe spec files are loaded side by side, see specs.SpecRegistry
+    specs_files = sorted(user_dir.glob("*grr[cC]onfig.csv"))
     if not specs_files:
         raise Exception(f"no specs. check {user_dir}")
-    specs_file = specs_files[0]
-    cfg["general"]["grr_config_csv_filepath"] = str(specs_file.resolve())
-
-    target_files = [
-        fp for fp in user_dir.glob("*.csv") if "grrconfig" not in fp.name.lower()
+    cfg["general"]["grr_config_csv_filepath"] = [
+        str(fp.resolve()) for fp in specs_files
     ]
-    target_file = None
-    match len(target_files):
-        case 0:
-            raise Exception(f"no *.csv files. check {user_dir}")
-        case 1:
-            target_file = target_files[0]
-        case _:
-            raise Exception(f"only 1 *.csv file is support for now. check {user_dir}")
 
-    return (
-        cfg,
-        cfg["general"]["grr_config_csv_filepath"],
-        str(target_file.resolve()),
+    target_files = models.list_datalogs(user_dir)
+    if not target_files:
+        raise Exception(f"no *.csv files. check {user_dir}")
+
+    return (cfg, [str(fp.resolve()) for fp in target_files])
+
+
+def import_in_background(name: str) -> threading.Thread:
+    """Imports a module in a thread, join() it before using the module"""
+
+    def target():
+        with utils.stage(f"import_{name}"):
+            importlib.import_module(name)
+
+    thread = threading.Thread(target=target, name=f"import-{name}", daemon=True)
+    thread.start()
+    return thread
+
+
+def load_dataset(
+    cfg: Mapping, target_files: list[str]
+) -> tuple[models.Dataset, float, list[Callable[[], None]]]:
+    """Parses the datalogs and computes the GR&R results
+
+    Background work of every serving process (the lazy precompute) is
+    returned instead of started, so that it can be started after the server
+    forks its workers. The watcher is started here, in this process only,
+    forked workers follow its results (see watcher.ResultFollower).
+
+    :return: (dataset, refresh_interval_s, background callables)
+    :rtype: tuple[models.Dataset, float, list[Callable[[], None]]]
+    """
+    if cfg.get("watcher", {}).get("enabled", False):
+        tail = watcher.TargetDirWatcher(
+            cfg,
+            directory=Path(target_files[0]).parent,
+            store=watcher.make_store(cfg),
+        )
+        tail.start()
+        return tail.dataset, tail.interval_s, []  # type: ignore
+
+    cfg_lazy = cfg.get("dashboard", {}).get("lazy", {})
+    lazy = bool(cfg_lazy.get("enabled", False))
+    # the parser loads the grrConfig files of cfg, see specs.SpecRegistry
+    data = models.make_parser(cfg=cfg, filepaths=target_files)
+    plot_data = models.GaiaDataMaker(
+        cfg=cfg,
+        dataparam_list=data.datastore,
+        dflimits=data.cfg_grrlimits,
+        lazy=lazy,
+    )
+    if lazy and plot_data.dfs.empty:
+        datastore = plot_data.datastore
+        index = models.LazyResultIndex(
+            plot_data.compute_fom,
+            foms=datastore.foms,
+            operators=datastore.operators,
+            max_foms=cfg_lazy.get("max_foms", 64),
+        )
+        dataset = models.Dataset(
+            plot_data.dfs,
+            plot_data.df_summary,
+            index=index,
+            df_anova=plot_data.df_anova,
+        )
+        return dataset, 0, [index.precompute] if cfg_lazy.get("precompute") else []
+    dataset = models.Dataset(
+        plot_data.dfs, plot_data.df_summary, df_anova=plot_data.df_anova
+    )
+    return dataset, 0, []
+
+
+def build_app() -> tuple[Mapping, "Dash", list[Callable[[], None]]]:
+    """Loads the results and builds the dashboard, before any worker forks
+
+    :return: (cfg, app, background callables to start in every worker)
+    """
+    cfg, target_files = load_filepaths()
+    if len(target_files) > 1 and cfg["input_settings"].get("max_workers", 0) != 1:
+        # datalogs are read in a forked process pool, not safe while importing
+        import views  # noqa: F401
+    # views imports plotly and dash, while the datalogs are parsed
+    importer = import_in_background("views")
+    dataset, refresh_interval_s, background = load_dataset(cfg, target_files)
+    store = resultstore.ResultStore(cfg)
+    lazy = isinstance(dataset.snapshot.index, models.LazyResultIndex)
+    if store.enabled and lazy:
+        utils.setup_logger(APP_NAME).warning("result_store is ignored in lazy mode")
+    elif store.enabled and not refresh_interval_s:
+        # the heap copy is released, workers share the memory-mapped file
+        store.write(dataset.snapshot.dfs, dataset.snapshot.df_summary)
+        dataset = models.Dataset(*store.read(), df_anova=dataset.snapshot.df_anova)
+    registry = sessions.SessionRegistry(cfg)
+    if registry.enabled:
+        # the targetdir dataset is always served, next to the uploads
+        registry.add_dataset(TARGETDIR_ID, "targetdir", dataset, pinned=True)
+    importer.join()
+    import views
+
+    app = views.create_app(
+        dataset,
+        refresh_interval_s=refresh_interval_s,
+        cfg=cfg,
+        sessions=registry if registry.enabled else None,
+        dataset_id=TARGETDIR_ID if registry.enabled else "",
     )
+    return cfg, app, background
+
+
+def serve_gunicorn(
+    app: "Dash",
+    host: str,
+    port: int,
+    workers: int,
+    threads: int,
+    post_fork: Optional[Callable[[], None]] = None,
+) -> None:
+    """Serves app with gunicorn workers forked from this process, the loaded
+    results are shared copy-on-write (POSIX only)"""
+    from gunicorn.app.base import BaseApplication
+
+    class GrrdApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{host}:{port}")
+            self.cfg.set("workers", workers)
+            self.cfg.set("threads", threads)
+            self.cfg.set("preload_app", True)
+            if post_fork is not None:
+                self.cfg.set("post_fork", lambda server, worker: post_fork())
+
+        def load(self):
+            return app.server
+
+    GrrdApplication().run()
+
+
+def start_background(background: list[Callable[[], None]]) -> None:
+    for start in background:
+        start()
+
+
+def serve(app: "Dash", cfg: Mapping, background: list[Callable[[], None]] = []) -> None:
+    """Serves app with the server of cfg["server"]["mode"], after starting
+    the background work in every serving process
+
+    :raises utils.ConfigError: unknown mode
+    """
+    log = utils.setup_logger(APP_NAME)
+    cfg_server = cfg.get("server", {})
+    mode = cfg_server.get("mode", "waitress")
+    host = cfg_server.get("host", "0.0.0.0")
+    port = int(cfg_server.get("port", 8501))
+    threads = int(cfg_server.get("threads", 4))
+    workers = int(cfg_server.get("workers", 0)) or 2 * (os.cpu_count() or 1) + 1
+
+    if mode == "gunicorn" and platform.system() == "Windows":
+        log.warning("gunicorn is not supported on Windows, using waitress")
+        mode = "waitress"
+    log.info(f"serving {APP_NAME} with {mode=} on {host}:{port}")
+    match mode:
+        case "dev":
+            start_background(background)
+            app.run(debug=bool(cfg_server.get("debug", False)), host=host, port=port)
+        case "gunicorn":
+            # threads do not survive fork, every worker starts its own, the
+            # watcher is the exception (see load_dataset)
+            serve_gunicorn(
+                app,
+                host=host,
+                port=port,
+                workers=workers,
+                threads=threads,
+                post_fork=lambda: start_background(background),
+            )
+        case "waitress":
+            from waitress import serve as serve_waitress
+
+            start_background(background)
+            serve_waitress(app.server, host=host, port=port, threads=threads)
+        case _:
+            raise utils.ConfigError(f"unknown server {mode=}")
 
 
 def main():
@@ -93,18 +273,9 @@ def main():
     PORT = 8501
 
     try:
-        cfg, specs_file, target_file = load_filepaths()
-        specs = models.SpecsParser(
-            cfg=cfg,
-            filepath=specs_file,
-        )
-        data = models.StandardParser(cfg=cfg, filepaths=[target_file])
-        plot_data = views.GaiaDataMaker(
-            cfg=cfg,
-            dataparam_list=data.datastore,
-            dflimits=specs.df,
-        )
-        views.run_plotly(plot_data.dfs, port=str(PORT))
+        cfg, app, background = build_app()
+        PORT = int(cfg.get("server", {}).get("port", PORT))
+        serve(app, cfg, background=background)
 
     except Exception as e:
 
@@ -1,9 +1,17 @@
 # models.py is part of MODEL in the design framework
 
 # global libraries
+import io
+import os
+import time
+import threading
+from dataclasses import dataclass, field
+from collections import OrderedDict
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from abc import ABC, abstractmethod
-from typing import Optional, Mapping
+from typing import BinaryIO, Callable, Iterable, Iterator, Optional, Mapping
 
 import numpy as np
 import pandas as pd
@@ -11,11 +19,14 @@ import pandas as pd
 
 # local libraries
 from config import Config
+from cache import ParseCache
+from baseline import GoldenBaseline
+from specs import SpecRegistry
+import engine
 import utils
-from utils import get_time
+from utils import get_csv_engine, get_time
 
 APP_NAME = "grrd"
-pd.options.mode.chained_assignment = None  # type: ignore
 
 
 def dataframe_count_reps(
@@ -36,6 +47,254 @@ def dataframe_count_reps(
     return df.reset_index(drop=True)
 
 
+def dataframe_assign_reps(
+    df: pd.DataFrame, PART: str, OPERATOR: str, REP: str = "rep"
+) -> pd.DataFrame:
+    """Vectorized REP numbering, a single grouped pass over the whole table
+
+    Numbers repeated measurements of the same (PART, OPERATOR) from 1..n in
+    order of appearance. Unlike dataframe_count_reps(), the original row order
+    is kept, and the table can be wide (all FOMs at once).
+    Rows with a missing PART or OPERATOR are dropped, as groupby() would.
+
+    :param df: input table, must contain PART and OPERATOR columns
+    :type df: pd.DataFrame
+    :return: table with REP column (int) added, index reset. Shares the
+        columns of df, without a copy, if no row is dropped
+    :rtype: pd.DataFrame
+    """
+    valid = (df[PART].notna() & df[OPERATOR].notna()).to_numpy()
+    if valid.all():
+        # a new frame of the same columns, df itself is left untouched
+        df = df.copy(deep=False)
+    else:
+        df = df.take(np.flatnonzero(valid))
+    reps = df.groupby(by=[PART, OPERATOR], sort=False).cumcount().to_numpy() + 1
+    df[REP] = reps
+    df.index = pd.RangeIndex(len(df))
+    return df
+
+
+def get_data_row(reading_format: Mapping) -> int:
+    """Row number of the first row of the data block, the rows up to it
+    being the headers block or skip_rows
+
+    :raises utils.ConfigError: a row after the headers block is neither
+        skipped nor data, i.e. skip_rows is not contiguous
+    """
+    header_row = reading_format["headers"]["header_row"]
+    nrows = reading_format["headers"]["nrows"]
+    skip_rows = list(reading_format["data"]["skip_rows"])
+    # data block starts after the last skipped row (the limits block)
+    data_row = max(skip_rows + [header_row + nrows]) + 1
+    gaps = set(range(header_row + nrows + 1, data_row)).difference(skip_rows)
+    if gaps:
+        raise utils.ConfigError(
+            f"{skip_rows=} is not contiguous, data rows {sorted(gaps)} would be dropped"
+        )
+    return data_row
+
+
+def read_headers(
+    handle: BinaryIO, input_settings: Mapping
+) -> tuple[pd.DataFrame, dict]:
+    """IO: Parses the headers block (column names and the USL/LSL/units rows)
+    of a datalog opened in binary mode, leaving handle at the data block
+
+    :return: (dfheaders, dtypes), dtypes to read the data block with
+    :rtype: tuple[pd.DataFrame, dict]
+    """
+    cfg_headers = input_settings["reading_format"]["headers"]
+    VARS = input_settings["variable_names"]
+    header_row = cfg_headers["header_row"]
+    nrows = cfg_headers["nrows"]
+    data_row = get_data_row(input_settings["reading_format"])
+
+    for _ in range(header_row):
+        handle.readline()
+    block = b"".join(handle.readline() for _ in range(data_row - header_row))
+
+    dfheaders = pd.read_csv(io.BytesIO(block), nrows=nrows)
+    columns = list(dfheaders.columns)
+    replacement_dict = {
+        VARS["LSL"]: "lsl",
+        VARS["USL"]: "usl",
+        VARS["UNITS"]: "units",
+    }
+    dfheaders.index = dfheaders[columns[0]].replace(replacement_dict).rename("index")
+
+    # explicit dtypes saves the parser from inferring them on every chunk
+    dtypes = {VARS["PART"]: str, VARS["OPERATOR"]: str}
+    if "usl" in dfheaders.index and "lsl" in dfheaders.index:
+        limits = dfheaders.loc[["usl", "lsl"]].apply(pd.to_numeric, errors="coerce")
+        for col in limits.columns[limits.notna().any()]:
+            dtypes.setdefault(col, "float64")
+    return (dfheaders, dtypes)
+
+
+def read_datalog(
+    filepath: Path | str, input_settings: Mapping
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """IO: Single pass reader for datalog CSV files
+
+    The file is read from disk once. The headers block (column names and the
+    USL/LSL/units rows) and the data block are then parsed from the same
+    in-memory buffer.
+
+    :param filepath: input filepath
+    :type filepath: Path | str
+    :param input_settings: [input_settings] section of the config
+    :type input_settings: Mapping
+    :return: (dfdata, dfheaders)
+    :rtype: tuple[pd.DataFrame, pd.DataFrame]
+    """
+    VARS = input_settings["variable_names"]
+    # BytesIO shares the bytes object, nothing is copied until written to
+    buffer = io.BytesIO(Path(filepath).read_bytes())
+    dfheaders, dtypes = read_headers(buffer, input_settings)
+    columns = list(dfheaders.columns)
+    data_start = buffer.tell()
+
+    csv_engine = get_csv_engine(input_settings)
+    try:
+        dfdata = pd.read_csv(
+            buffer, header=None, names=columns, dtype=dtypes, engine=csv_engine
+        )
+    except (ValueError, TypeError):
+        # a FOM with limits has non-numeric data, let the parser infer dtypes
+        buffer.seek(data_start)
+        dtypes = {VARS["PART"]: str, VARS["OPERATOR"]: str}
+        dfdata = pd.read_csv(
+            buffer, header=None, names=columns, dtype=dtypes, engine=csv_engine
+        )
+    return (dfdata, dfheaders)
+
+
+def read_datalog_chunks(
+    filepath: Path | str, input_settings: Mapping, chunksize: int
+) -> tuple[pd.DataFrame, Iterator[pd.DataFrame]]:
+    """IO: Streaming reader for datalog CSV files, the data block is
+    returned as an iterator of chunks of (at most) chunksize rows
+
+    :return: (dfheaders, chunks)
+    :rtype: tuple[pd.DataFrame, Iterator[pd.DataFrame]]
+    """
+    VARS = input_settings["variable_names"]
+    handle = open(filepath, mode="rb")
+    dfheaders, _ = read_headers(handle, input_settings)
+    # FOM dtypes are not forced, a bad value can show up in any chunk
+    dtypes = {VARS["PART"]: str, VARS["OPERATOR"]: str}
+
+    def iter_chunks() -> Iterator[pd.DataFrame]:
+        with handle:
+            yield from pd.read_csv(
+                handle,
+                header=None,
+                names=list(dfheaders.columns),
+                dtype=dtypes,
+                chunksize=chunksize,
+            )
+
+    return (dfheaders, iter_chunks())
+
+
+def read_datalog_tail(
+    filepath: Path | str,
+    input_settings: Mapping,
+    offset: int = 0,
+    columns: Optional[list[str]] = None,
+    final: bool = False,
+) -> tuple[Optional[pd.DataFrame], Optional[pd.DataFrame], int]:
+    """IO: Reads the complete rows appended to a datalog after byte offset
+
+    With offset=0, the headers block is parsed first. A trailing row that is
+    still being written (no newline yet) is left for the next call,
+    unless final=True.
+
+    :param columns: column names of the data block, required if offset > 0
+    :param final: the file is not written anymore, read the trailing row too
+    :return: (dfdata or None, dfheaders or None, new offset)
+    :rtype: tuple[Optional[pd.DataFrame], Optional[pd.DataFrame], int]
+    """
+    VARS = input_settings["variable_names"]
+    dfheaders = None
+    with open(filepath, mode="rb") as f:
+        if offset == 0:
+            dfheaders, _ = read_headers(f, input_settings)
+            columns = list(dfheaders.columns)
+            offset = f.tell()
+        f.seek(offset)
+        block = f.read()
+    end = len(block) if final else block.rfind(b"\n") + 1
+    if end == 0:
+        return (None, dfheaders, offset)
+    dfdata = pd.read_csv(
+        io.BytesIO(block[:end]),
+        header=None,
+        names=columns,
+        dtype={VARS["PART"]: str, VARS["OPERATOR"]: str},
+    )
+    return (dfdata, dfheaders, offset + end)
+
+
+def read_datalog_cached(
+    filepath: Path | str, input_settings: Mapping
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """read_datalog() through the Parquet ParseCache, if enabled"""
+    cache = ParseCache(input_settings)
+    if not cache.enabled:
+        return read_datalog(filepath, input_settings)
+    key = cache.make_key(filepath)
+    if (cached := cache.load(key)) is not None:
+        cache.log.debug(f"cache hit {Path(filepath).name} -> {key}")
+        return cached
+    dfdata, dfheaders = read_datalog(filepath, input_settings)
+    cache.save(key, dfdata, dfheaders)
+    return (dfdata, dfheaders)
+
+
+def read_datalog_timed(
+    filepath: Path | str, input_settings: Mapping
+) -> tuple[pd.DataFrame, pd.DataFrame, float]:
+    """read_datalog_cached() returning the elapsed seconds,
+    module level so that it can run in a process pool"""
+    t0 = time.perf_counter()
+    dfdata, dfheaders = read_datalog_cached(filepath, input_settings)
+    return (dfdata, dfheaders, time.perf_counter() - t0)
+
+
+def merge_headers(dflist: list[pd.DataFrame]) -> pd.DataFrame:
+    """Folds the headers tables of several datalogs into one,
+    the first file wins where the limits of a FOM differ"""
+    dfheaders = dflist[0]
+    log = utils.setup_logger(APP_NAME)
+    for df in dflist[1:]:
+        common = df.columns.intersection(dfheaders.columns)
+        diff = ~(df[common].eq(dfheaders[common]) | df[common].isna()).all()
+        if diff.any():
+            log.warning(f"limits differ between files, {list(common[diff])}")
+        new_cols = df.columns.difference(dfheaders.columns, sort=False)
+        if len(new_cols):
+            dfheaders = pd.concat([dfheaders, df[new_cols]], axis=1)
+    return dfheaders
+
+
+def get_header_foms(dfheaders: pd.DataFrame) -> list[str]:
+    """Columns with test limits or units in the headers block, i.e. FOMs
+    whatever their values read so far"""
+    rows = dfheaders.index.intersection(["usl", "lsl", "units"])
+    # the first column holds the row labels
+    dflimits = dfheaders.loc[rows, dfheaders.columns[1:]]
+    return list(dflimits.columns[dflimits.notna().any()])
+
+
+def list_datalogs(directory: Path | str) -> list[Path]:
+    """Returns the datalogs (*.csv, but not grrConfig files) in directory"""
+    return sorted(
+        fp for fp in Path(directory).glob("*.csv") if "grrconfig" not in fp.name.lower()
+    )
+
+
 class ParamData:
     limits: pd.Series
     dfdata: pd.DataFrame
@@ -45,7 +304,7 @@ class ParamData:
         name: str,
         dfdata: pd.DataFrame,
         dslimits: pd.Series,
-        grrlimits: pd.DataFrame,
+        grrlimits: Optional[pd.DataFrame] = None,
     ):
         """Dataclass container for FOM data
         :param name: name of the parameter
@@ -54,13 +313,18 @@ class ParamData:
         :type dfdata: pd.DataFrame(columns=[OPERATOR, PART, VALUE])
         :param dslimit: _description_
         :type dslimit: pd.Series(index=[grr_limit, usl, lsl])
-        :param grrlimits: grrlimits specified in user config file
+        :param grrlimits: grrlimits specified in user config file, None if
+            dslimits is already a row of make_limits_table()
         :type grrlimits: pd.DataFrame, optional
         """
         self.grrlimits = grrlimits
         self.name = name
         self.dfdata = dfdata
-        self.limits = dslimits
+        if grrlimits is None:
+            self.limits = dslimits
+            return
+        # updated below, not in the headers table it is taken from
+        self.limits = dslimits.copy()
         self.update_grr_limits()
         self.update_no_specs()
 
@@ -87,33 +351,406 @@ class ParamData:
 
 
 class SpecsParser:
+    """grr_limit of every FOM of a grrConfig file, see specs.SpecRegistry"""
+
     df: pd.DataFrame = pd.DataFrame()
 
     def __init__(self, cfg: Mapping, filepath: Path | str) -> None:
-        if not isinstance(filepath, Path):
-            filepath = Path(filepath)
-        if not filepath.is_file():
-            raise RuntimeError(f"missing grr_config {filepath=}")
         self.log = utils.setup_logger(APP_NAME)
-        self.cfg = cfg["input_settings"]["reading_format"]["grr_config_csv"]
-        self.FOM = self.cfg["FOM"]
-        self.GRR_LIMIT = self.cfg["GRR_LIMIT"]
-        self.df = self.read_and_parse_data(filepath)
-        self.log.debug(f"grrspecs loaded from {filepath.name}")
+        self.registry = SpecRegistry(cfg, [filepath])
+        self.df = self.registry.df[["grr_limit"]]
         print(f"{self.__class__.__name__}() done")
 
-    def read_and_parse_data(self, fp: Path) -> pd.DataFrame:
-        df = pd.read_csv(fp, skiprows=self.cfg["skip_rows"])
-        df.rename(
-            mapper={
-                self.FOM: "fom",
-                self.GRR_LIMIT: "grr_limit",
-            },
-            axis=1,
-            inplace=True,
+
+def make_limits_table(
+    dfheaders: pd.DataFrame, foms: list[str], grrlimits: pd.DataFrame
+) -> pd.DataFrame:
+    """Vectorized equivalent of ParamData.limits for all FOMs at once
+
+    usl/lsl/units are taken from the datalog headers, and filled from the
+    specs where the datalog has none.
+
+    :param grrlimits: specs table, see specs.SpecRegistry.df
+    :type grrlimits: pd.DataFrame(index=fom, columns=[grr_limit, ...])
+    :return: limits table
+    :rtype: pd.DataFrame(index=fom, columns=[usl, lsl, units, grr_limit,
+        is_no_testspecs, is_no_grrspecs])
+    """
+    df = dfheaders.loc[["usl", "lsl", "units"], foms].T
+    df.index.name = "fom"
+    for x in ["usl", "lsl"]:
+        df[x] = pd.to_numeric(df[x], errors="coerce")
+    grrlimits = grrlimits[~grrlimits.index.duplicated()]
+    # a single join of the specs of every FOM
+    dfspecs = grrlimits.reindex(df.index)
+    df["grr_limit"] = pd.to_numeric(dfspecs["grr_limit"], errors="coerce")
+    for x in ["usl", "lsl", "units"]:
+        if x in dfspecs.columns:
+            df[x] = df[x].fillna(dfspecs[x])
+    df["is_no_testspecs"] = df["usl"].isna() & df["lsl"].isna()
+    df["is_no_grrspecs"] = df["grr_limit"].isna()
+    return df
+
+
+class LongDataStore:
+    df: pd.DataFrame
+    dflimits: pd.DataFrame
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        dflimits: pd.DataFrame,
+        PART: str,
+        OPERATOR: str,
+        REP: str = "rep",
+        VALUE: str = "value",
+    ) -> None:
+        """Columnar container for the data of all FOMs
+
+        Rows are contiguous per FOM, in the order of dflimits.index
+        :param df: long table, fom/PART/OPERATOR are categorical
+        :type df: pd.DataFrame(columns=[fom, PART, OPERATOR, REP, VALUE])
+        :param dflimits: limits of every FOM, see make_limits_table()
+        :type dflimits: pd.DataFrame(index=fom)
+        """
+        self.df = df
+        self.dflimits = dflimits
+        self.PART = PART
+        self.OPERATOR = OPERATOR
+        self.REP = REP
+        self.VALUE = VALUE
+        self.fom_index = {fom: i for i, fom in enumerate(self.foms)}
+        codes = df["fom"].cat.codes.to_numpy()
+        self.bounds = np.searchsorted(codes, np.arange(len(self.foms) + 1))
+
+    @classmethod
+    def from_wide(
+        cls,
+        dfwide: pd.DataFrame,
+        foms: list[str],
+        dflimits: pd.DataFrame,
+        PART: str,
+        OPERATOR: str,
+        REP: str = "rep",
+        VALUE: str = "value",
+    ) -> "LongDataStore":
+        # Keys are stored once as categorical codes, and each FOM column is
+        # copied exactly once into the value array
+        nrows, nfoms = len(dfwide), len(foms)
+        parts = pd.Categorical(dfwide[PART])
+        operators = pd.Categorical(dfwide[OPERATOR])
+        values = np.empty(nrows * nfoms, dtype="float64")
+        for i, fom in enumerate(foms):
+            values[i * nrows : (i + 1) * nrows] = dfwide[fom].to_numpy(
+                dtype="float64", na_value=np.nan
+            )
+        df = pd.DataFrame(
+            {
+                "fom": pd.Categorical.from_codes(
+                    np.repeat(np.arange(nfoms, dtype="int32"), nrows), categories=foms
+                ),
+                PART: pd.Categorical.from_codes(
+                    np.tile(parts.codes, nfoms), categories=parts.categories
+                ),
+                OPERATOR: pd.Categorical.from_codes(
+                    np.tile(operators.codes, nfoms), categories=operators.categories
+                ),
+                REP: np.tile(dfwide[REP].to_numpy(dtype="int32"), nfoms),
+                VALUE: values,
+            }
         )
-        df = df[["fom", "grr_limit"]].set_index("fom")
-        return df
+        return cls(df, dflimits.loc[foms], PART, OPERATOR, REP, VALUE)
+
+    def __str__(self) -> str:
+        return f"{self.__class__.__name__}(foms={len(self.foms)}, operators={len(self.operators)}, shape={self.df.shape})"
+
+    def __len__(self) -> int:
+        return len(self.foms)
+
+    @property
+    def foms(self) -> list[str]:
+        return list(self.df["fom"].cat.categories)
+
+    @property
+    def operators(self) -> list[str]:
+        return list(self.df[self.OPERATOR].cat.categories)
+
+    def get_fom(self, fom: str) -> pd.DataFrame:
+        """Returns the rows of one FOM, a slice without the fom column"""
+        i = self.fom_index[fom]
+        df = self.df.iloc[self.bounds[i] : self.bounds[i + 1]]
+        return df[[self.PART, self.OPERATOR, self.REP, self.VALUE]]
+
+    def iter_foms(self):
+        """Yields (fom, dfdata, limits) for each FOM, the same fields as ParamData"""
+        for fom in self.foms:
+            yield fom, self.get_fom(fom), self.dflimits.loc[fom]
+
+    def aggregate(self) -> "AggregateStore":
+        dfagg = engine.aggregate_parts(
+            self.df, PART=self.PART, OPERATOR=self.OPERATOR, VALUE=self.VALUE
+        )
+        return AggregateStore(dfagg, self.dflimits, self.PART, self.OPERATOR)
+
+
+class AggregateStore:
+    dfagg: pd.DataFrame
+    dflimits: pd.DataFrame
+
+    def __init__(
+        self,
+        dfagg: pd.DataFrame,
+        dflimits: pd.DataFrame,
+        PART: str,
+        OPERATOR: str,
+        reps: Optional[pd.Series] = None,
+    ) -> None:
+        """Container for the per (fom, OPERATOR, PART) aggregates of all FOMs,
+        the input of the batched GR&R engine
+
+        :param dfagg: aggregates, see engine.aggregate_parts()
+        :type dfagg: pd.DataFrame(columns=[fom, OPERATOR, PART, *AGG_COLUMNS])
+        :param dflimits: limits of every FOM, see make_limits_table()
+        :type dflimits: pd.DataFrame(index=fom)
+        :param reps: number of reps, optional
+        :type reps: pd.Series(index=[PART, OPERATOR])
+        """
+        self.dfagg = dfagg
+        self.dflimits = dflimits
+        self.PART = PART
+        self.OPERATOR = OPERATOR
+        self.reps = reps
+
+    def __str__(self) -> str:
+        return f"{self.__class__.__name__}(foms={len(self.foms)}, operators={len(self.operators)}, shape={self.dfagg.shape})"
+
+    def __len__(self) -> int:
+        return len(self.foms)
+
+    @property
+    def foms(self) -> list[str]:
+        return list(self.dflimits.index)
+
+    @property
+    def operators(self) -> list[str]:
+        return list(self.dfagg[self.OPERATOR].unique())
+
+
+def is_contiguous(indices: Iterable[np.ndarray]) -> bool:
+    """True if every group of row positions is a contiguous block"""
+    return all(len(idx) == 0 or idx[-1] - idx[0] + 1 == len(idx) for idx in indices)
+
+
+class ResultIndex:
+    """Index of the compiled results by (fom, operator), built once
+
+    dfs is sorted by (fom, operator) so that every pair is a contiguous block
+    of rows, get() is then a dict lookup and a positional slice.
+    Also holds a failing-parts-first order of every block, the rows that
+    failed first, then by descending GR&R %.
+    """
+
+    def __init__(self, dfs: pd.DataFrame) -> None:
+        keys = ["fom", "operator"]
+        grouped = dfs.groupby(by=keys, observed=True, sort=False)
+        if is_contiguous(grouped.indices.values()) and dfs.index.equals(
+            pd.RangeIndex(len(dfs))
+        ):
+            # e.g. read from a ResultStore, kept as is (no copy)
+            self.df = dfs
+        else:
+            self.df = dfs.sort_values(by=keys, kind="stable", ignore_index=True)
+            grouped = self.df.groupby(by=keys, observed=True, sort=False)
+        self.bounds: dict[tuple[str, str], tuple[int, int]] = {
+            key: (int(idx[0]), int(idx[-1]) + 1) for key, idx in grouped.indices.items()
+        }
+        self.failing_first = self.make_failing_first(grouped.ngroup().to_numpy())
+        self.foms = list(dict.fromkeys(fom for fom, _ in self.bounds))
+        self.operators = list(dict.fromkeys(op for _, op in self.bounds))
+
+    def __str__(self) -> str:
+        return f"{self.__class__.__name__}(pairs={len(self.bounds)}, shape={self.df.shape})"
+
+    def __contains__(self, key: tuple[str, str]) -> bool:
+        return key in self.bounds
+
+    def make_failing_first(self, blocks: np.ndarray) -> np.ndarray:
+        if self.df.empty:
+            return np.arange(0)
+        score = np.fmax(
+            self.df["grr_high_pct"].to_numpy(dtype="float64"),
+            self.df["grr_low_pct"].to_numpy(dtype="float64"),
+        )
+        score = -np.nan_to_num(score, nan=-np.inf)  # descending, nan last
+        passed = self.df["grr_part_passed"].fillna(False).to_numpy(dtype=bool)
+        return np.lexsort((score, passed, blocks))
+
+    def get(self, fom: str, operator: str, failing_first: bool = False) -> pd.DataFrame:
+        """Returns the rows of (fom, operator), empty if not found
+
+        :param failing_first: failed parts first, by descending GR&R %
+        :type failing_first: bool
+        """
+        start, stop = self.bounds.get((fom, operator), (0, 0))
+        if failing_first:
+            return self.df.iloc[self.failing_first[start:stop]]
+        return self.df.iloc[start:stop]
+
+
+class LazyResultIndex:
+    """ResultIndex of results computed per FOM on first use
+
+    Each FOM is computed by compute(fom) the first time one of its pairs is
+    requested, then memoized as a ResultIndex. At most max_foms FOMs are
+    kept, the least recently used are evicted. precompute() computes the
+    FOMs in a background thread, from the first one.
+    """
+
+    def __init__(
+        self,
+        compute: Callable[[str], tuple[pd.DataFrame, pd.DataFrame]],
+        foms: list[str],
+        operators: list[str],
+        max_foms: int = 64,
+    ) -> None:
+        self.log = utils.setup_logger(APP_NAME)
+        self.compute = compute
+        self.foms = foms
+        self.fom_set = set(foms)
+        self.operators = operators
+        self.max_foms = max(int(max_foms), 1)
+        self.results: OrderedDict[str, ResultIndex] = OrderedDict()
+        self.lock = threading.Lock()
+        self.compute_lock = threading.Lock()
+        self.computed = 0
+        self.evicted = 0
+        self.thread: Optional[threading.Thread] = None
+
+    def __str__(self) -> str:
+        return f"{self.__class__.__name__}(foms={len(self.foms)}, cached={len(self.results)}, computed={self.computed})"
+
+    def __contains__(self, key: tuple[str, str]) -> bool:
+        return key in self.get_fom(key[0])
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return {
+            "foms": len(self.foms),
+            "cached": len(self.results),
+            "computed": self.computed,
+            "evicted": self.evicted,
+        }
+
+    def get_fom(self, fom: str) -> ResultIndex:
+        with self.lock:
+            if fom in self.results:
+                self.results.move_to_end(fom)
+                return self.results[fom]
+        with self.compute_lock:
+            # computed by another thread meanwhile
+            with self.lock:
+                if fom in self.results:
+                    return self.results[fom]
+            with utils.stage("grr_compute_fom", log=self.log):
+                dfs, _ = self.compute(fom)
+            index = ResultIndex(dfs)
+            with self.lock:
+                self.results[fom] = index
+                self.computed += 1
+                while len(self.results) > self.max_foms:
+                    self.results.popitem(last=False)
+                    self.evicted += 1
+        return index
+
+    def get(self, fom: str, operator: str, failing_first: bool = False) -> pd.DataFrame:
+        """Returns the rows of (fom, operator), computing the FOM if needed"""
+        if fom not in self.fom_set:
+            # empty, with the columns of the results
+            return self.get_fom(self.foms[0]).df.iloc[0:0]
+        return self.get_fom(fom).get(fom, operator, failing_first=failing_first)
+
+    def precompute(self) -> None:
+        """Computes the first max_foms FOMs in a daemon thread"""
+
+        def target():
+            for fom in self.foms[: self.max_foms]:
+                try:
+                    self.get_fom(fom)
+                except Exception as e:
+                    self.log.error(f"precompute of {fom} failed, {e=}")
+
+        self.thread = threading.Thread(
+            target=target, name="grrd-precompute", daemon=True
+        )
+        self.thread.start()
+
+
+@dataclass(frozen=True)
+class DatasetSnapshot:
+    dfs: pd.DataFrame
+    df_summary: pd.DataFrame
+    version: int = 0
+    index: Optional[ResultIndex | LazyResultIndex] = None
+    # one row per FOM, see engine.compute_anova()
+    df_anova: Optional[pd.DataFrame] = None
+
+    @classmethod
+    def build(
+        cls,
+        dfs: pd.DataFrame,
+        df_summary: pd.DataFrame,
+        version: int = 0,
+        df_anova: Optional[pd.DataFrame] = None,
+    ) -> "DatasetSnapshot":
+        # dfs is replaced by the sorted frame of the index, not kept twice
+        index = ResultIndex(dfs)
+        return cls(index.df, df_summary, version, index, df_anova)
+
+
+class Dataset:
+    """Holds the compiled GR&R results served by the dashboard
+
+    Results are replaced as a whole by swap(). Readers take one snapshot
+    and use it for the whole request, so they never see a half update.
+    Each snapshot carries a ResultIndex, built before it is published.
+    """
+
+    def __init__(
+        self,
+        dfs: pd.DataFrame,
+        df_summary: pd.DataFrame,
+        index: Optional[LazyResultIndex] = None,
+        df_anova: Optional[pd.DataFrame] = None,
+    ) -> None:
+        self.lock = threading.Lock()
+        if index is not None:
+            # lazy mode, results are computed by the index on demand
+            self.snapshot = DatasetSnapshot(dfs, df_summary, 0, index, df_anova)
+        else:
+            self.snapshot = DatasetSnapshot.build(dfs, df_summary, 0, df_anova)
+
+    def __str__(self) -> str:
+        return f"{self.__class__.__name__}(version={self.version}, shape={self.snapshot.dfs.shape})"
+
+    @property
+    def version(self) -> int:
+        return self.snapshot.version
+
+    def swap(
+        self,
+        dfs: pd.DataFrame,
+        df_summary: pd.DataFrame,
+        df_anova: Optional[pd.DataFrame] = None,
+        version: Optional[int] = None,
+    ) -> int:
+        """Publishes new results, as version or the next version"""
+        with self.lock:
+            if version is None:
+                version = self.snapshot.version + 1
+            snapshot = DatasetSnapshot.build(dfs, df_summary, version, df_anova)
+            # a single reference assignment, atomic for the readers
+            self.snapshot = snapshot
+        return version
 
 
 class DataParser(ABC):
@@ -137,25 +774,17 @@ class DataParser(ABC):
         self.dfheaders = pd.DataFrame()
 
         try:
-            # grr_config_csv_filepath
-            specs = SpecsParser(
-                cfg=cfg,
-                filepath=cfg["general"]["grr_config_csv_filepath"],
-            )
-            self.cfg_grrlimits = specs.df
+            # grr_config_csv_filepath, parsed once per process
+            self.specs = SpecRegistry(cfg)
+            self.cfg_grrlimits = self.specs.df
         except Exception as e:
             raise utils.ConfigError(f"error parsing grr_limits; {e}")
 
+        self.file_timings: dict[str, float] = {}
         if filepaths:
             self.log.debug(f"parsing {len(filepaths)} files ...")
-            counter = 0
-            dflist_data, dflist_headers = [], []
-
-            for fp in filepaths:
-                dfdata, dfheaders = self.read_data(fp)
-                dflist_data.append(dfdata)
-                dflist_headers.append(dfheaders)
-                counter += 1
+            dflist_data, dflist_headers = self.read_files(filepaths)
+            counter = len(dflist_data)
 
             if counter == 1:
                 self.file_info = Path(filepaths[0]).name
@@ -164,18 +793,51 @@ class DataParser(ABC):
             else:
                 self.file_info = "file_info_err"
 
-            dfdata = pd.concat(dflist_data)
-            dfheaders = pd.DataFrame()
-            for i, df in enumerate(dflist_headers):
-                if i == 0:
-                    dfheaders = df.copy()
-                    continue
-                dfheaders = dfheaders.compare(df, keep_shape=True, keep_equal=True)
+            if counter == 1:
+                dfdata = dflist_data[0]
+            else:
+                dfdata = pd.concat(dflist_data, ignore_index=True, copy=False)
+            dfheaders = merge_headers(dflist_headers)
 
             self.dfdata = dfdata
             self.dfheaders = dfheaders
             self.log.debug(f"{counter} file(s) parsed successfully")
 
+    def read_files(
+        self, filepaths: list[Path | str]
+    ) -> tuple[list[pd.DataFrame], list[pd.DataFrame]]:
+        """IO: Reads the datalogs concurrently in a process pool,
+        with input_settings.max_workers processes (0 -> os.cpu_count())
+
+        :return: (dflist_data, dflist_headers), in the order of filepaths
+        :rtype: tuple[list[pd.DataFrame], list[pd.DataFrame]]
+        """
+        input_settings = self.cfg["input_settings"]
+        max_workers = input_settings.get("max_workers", 0) or os.cpu_count() or 1
+        max_workers = min(max_workers, len(filepaths))
+        if max_workers > 1:
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                results = list(
+                    pool.map(read_datalog_timed, filepaths, repeat(input_settings))
+                )
+        else:
+            results = [read_datalog_timed(fp, input_settings) for fp in filepaths]
+
+        dflist_data, dflist_headers = [], []
+        n = len(filepaths)
+        for i, (fp, (dfdata, dfheaders, elapsed)) in enumerate(
+            zip(filepaths, results), 1
+        ):
+            name = Path(fp).name
+            self.file_timings[name] = elapsed
+            utils.METRICS.record("datalog_read", elapsed, rows=len(dfdata))
+            self.log.info(
+                f"  [{i}/{n}] {name} read in {elapsed:.2f}s, {len(dfdata)} rows"
+            )
+            dflist_data.append(dfdata)
+            dflist_headers.append(dfheaders)
+        return dflist_data, dflist_headers
+
     def get_fixed_columns(self) -> list[str]:
         cols = [self.OPERATOR, self.PART]
         if self.TIMESTAMP:
@@ -195,26 +857,65 @@ class DataParser(ABC):
         :return: (dfdata, dfheaders)
         :rtype: tuple[pd.DataFrame, pd.DataFrame]
         """
-        cfg_data = self.cfg["input_settings"]["reading_format"]["data"]
-        df = pd.read_csv(filepath, skiprows=cfg_data["skip_rows"])
-        dfdata = df.copy()
-
-        cfg_headers = self.cfg["input_settings"]["reading_format"]["headers"]
-        df = pd.read_csv(
-            filepath,
-            header=cfg_headers["header_row"],
-            nrows=cfg_headers["nrows"],
+        return read_datalog_cached(filepath, self.cfg["input_settings"])
+
+    def prepare_data(self, dfdata: pd.DataFrame) -> tuple[pd.DataFrame, list[str]]:
+        """Validates the key columns, sorts by TIMESTAMP and numbers REP
+
+        :return: (df, foms), foms are in column order of dfdata
+        :rtype: tuple[pd.DataFrame, list[str]]
+        """
+        foms = self.select_foms(dfdata)
+        df = dfdata
+        if (
+            self.TIMESTAMP in df.columns
+            and not df[self.TIMESTAMP].is_monotonic_increasing
+        ):
+            # datalogs are usually written in time order, then nothing is copied
+            df = df.sort_values(by=self.TIMESTAMP, ascending=True, kind="stable")
+
+        # REP is shared by every FOM, number it once on the wide table
+        df = dataframe_assign_reps(
+            df, PART=self.PART, OPERATOR=self.OPERATOR, REP=self.REP
         )
-        df["index"] = df[df.columns[0]].copy()
-        replacement_dict = {
-            self.cfg["input_settings"]["variable_names"]["LSL"]: "lsl",
-            self.cfg["input_settings"]["variable_names"]["USL"]: "usl",
-            self.cfg["input_settings"]["variable_names"]["UNITS"]: "units",
-        }
-        df["index"].replace(replacement_dict, inplace=True)
-        df.set_index("index", inplace=True)
-        dfheaders = df.copy()
-        return (dfdata, dfheaders)
+        return df, foms
+
+    def select_foms(
+        self, dfdata: pd.DataFrame, dfheaders: Optional[pd.DataFrame] = None
+    ) -> list[str]:
+        """Validates the key columns and returns the FOM columns to process,
+        in column order of dfdata
+
+        :param dfheaders: the FOMs of its headers block are selected even if
+            not numeric in dfdata, e.g. the first chunk of a stream
+        """
+        PART = self.PART
+        OPERATOR = self.OPERATOR
+        cfg = self.cfg["grr_settings"]
+        numeric_cols = set(dfdata.select_dtypes(include="number").columns)
+        descriptive_cols = set([c for c in dfdata.columns if c not in numeric_cols])
+        if OPERATOR not in descriptive_cols:
+            raise RuntimeError(f"column {OPERATOR=} not in dataframe")
+        if PART not in descriptive_cols:
+            raise RuntimeError(f"column {PART=} not in dataframe")
+        if dfheaders is not None:
+            numeric_cols.update(
+                set(get_header_foms(dfheaders)).intersection(dfdata.columns)
+                - {PART, OPERATOR}
+            )
+
+        if cfg["list_of_foms"]:
+            numeric_cols_ = numeric_cols.intersection(set(cfg["list_of_foms"]))
+            if not numeric_cols_:
+                self.log.error("list_of_foms is specified, but nothing found!")
+                [self.log.error(f"  NOT found -> {x}") for x in cfg["list_of_foms"]]
+            else:
+                numeric_cols = numeric_cols_
+
+        if cfg["list_of_excluded_foms"]:
+            numeric_cols = numeric_cols.difference(set(cfg["list_of_excluded_foms"]))
+
+        return [c for c in dfdata.columns if c in numeric_cols]
 
     @abstractmethod
     def parse_data(self, dfin: pd.DataFrame, dfheaders: pd.DataFrame) -> None:
@@ -225,15 +926,15 @@ class DataParser(ABC):
     ) -> None:
         if not outdir:
             outdir = self.cfg["general"]["system_working_dir"]
-        outname, filetype = outname.split(".")
-        outpath = outdir / f"{outname}-{get_time()}.{filetype}"  # type: ignore
+        outname, filetype = outname.rsplit(".", 1)
+        outpath = Path(outdir) / f"{outname}-{get_time()}.{filetype}"
 
         match filetype:
             case "csv":
-                self.df.to_csv(outpath)
+                self.dfdata.to_csv(outpath)
             case "parquet":
-                self.df.to_parquet(outpath)
-            case "_":
+                self.dfdata.to_parquet(outpath)
+            case _:
                 raise RuntimeError(f"unaccepted {(outname, filetype)=}")
 
         self.log.info(f"file saved {outpath.name}")
@@ -242,70 +943,528 @@ class DataParser(ABC):
 class StandardParser(DataParser):
     def __init__(self, cfg: Mapping, filepaths: list[Path | str] = []) -> None:
         super().__init__(cfg, filepaths)
-        self.datastore = self.parse_data(self.dfdata, self.dfheaders)
+        with utils.stage("parse_data", rows=len(self.dfdata), log=self.log):
+            self.datastore = self.parse_data(self.dfdata, self.dfheaders)
         print(f"{self.__class__.__name__}() done")
 
     def parse_data(
         self, dfdata: pd.DataFrame, dfheaders: pd.DataFrame
     ) -> list[ParamData]:
-        PART = self.PART
-        OPERATOR = self.OPERATOR
-        VALUE = self.VALUE
-        REP = self.REP
-        cfg = self.cfg["grr_settings"]
-        df = dfdata.copy()
-        numeric_cols = set(dfdata.select_dtypes(include="number").columns)
-        descriptive_cols = set([c for c in dfdata.columns if c not in numeric_cols])
-        if OPERATOR not in descriptive_cols:
-            raise RuntimeError(f"column {OPERATOR=} not in dataframe")
-        if PART not in descriptive_cols:
-            raise RuntimeError(f"column {PART=} not in dataframe")
-
-        if self.TIMESTAMP in df.columns:
-            df.sort_values(by=self.TIMESTAMP, ascending=True, inplace=True)
-            df.reset_index(inplace=True)
-
-        if cfg["list_of_foms"]:
-            numeric_cols_ = numeric_cols.intersection(set(cfg["list_of_foms"]))
-            if not numeric_cols_:
-                self.log.error("list_of_foms is specified, but nothing found!")
-                [self.log.error(f"  NOT found -> {x}") for x in cfg["list_of_foms"]]
-            else:
-                numeric_cols = numeric_cols_
-
-        if cfg["list_of_excluded_foms"]:
-            numeric_cols = numeric_cols.difference(set(cfg["list_of_excluded_foms"]))
+        df, foms = self.prepare_data(dfdata)
+        dflimits = make_limits_table(dfheaders, foms, self.cfg_grrlimits)
 
         datastore = []
-        fixed_cols = [PART, OPERATOR]
-        n = len(numeric_cols)
-        for i, fom in enumerate(numeric_cols, 1):
+        fixed_cols = [self.PART, self.OPERATOR, self.REP]
+        n = len(foms)
+        for i, fom in enumerate(foms, 1):
             self.log.debug(f"  [{i}/{n}] processing {fom} to ParamData ...")
-            cols = fixed_cols + [fom]
-            dffom = df[cols]
-            cols_ = list(dffom.columns)
-            cols_[-1] = VALUE
-            dffom.columns = cols_
-            dffom = dataframe_count_reps(
-                dffom,
-                PART=PART,
-                OPERATOR=OPERATOR,
-                REP=REP,
+            t0 = time.perf_counter()
+            # columns of df, shared by every FOM instead of copied
+            dffom = pd.DataFrame(
+                {col: df[col] for col in fixed_cols} | {self.VALUE: df[fom]},
+                copy=False,
             )
             datastore.append(
                 ParamData(
                     name=fom,
                     dfdata=dffom,
-                    dslimits=dfheaders.loc[:, fom],  # type: ignore
-                    grrlimits=self.cfg_grrlimits,
+                    dslimits=dflimits.loc[fom],
                 )
             )
+            # per FOM, recorded without a log line
+            utils.METRICS.record("parse_fom", time.perf_counter() - t0, len(dffom))
         return datastore
 
     def __str__(self):
         return f"{self.__class__.__name__}(\n  file_info={self.file_info},\n  x{len(self.datastore)} params)"
 
 
+class LongFormatParser(DataParser):
+    """Parses all FOMs into a single LongDataStore,
+    instead of one ParamData object per FOM"""
+
+    def __init__(self, cfg: Mapping, filepaths: list[Path | str] = []) -> None:
+        super().__init__(cfg, filepaths)
+        with utils.stage("parse_data", rows=len(self.dfdata), log=self.log):
+            self.datastore = self.parse_data(self.dfdata, self.dfheaders)
+        print(f"{self.__class__.__name__}() done")
+
+    def parse_data(
+        self, dfdata: pd.DataFrame, dfheaders: pd.DataFrame
+    ) -> LongDataStore:
+        df, foms = self.prepare_data(dfdata)
+        self.log.debug(f"  processing {len(foms)} foms to LongDataStore ...")
+        return LongDataStore.from_wide(
+            df,
+            foms=foms,
+            dflimits=make_limits_table(dfheaders, foms, self.cfg_grrlimits),
+            PART=self.PART,
+            OPERATOR=self.OPERATOR,
+            REP=self.REP,
+            VALUE=self.VALUE,
+        )
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(\n  file_info={self.file_info},\n  {self.datastore})"
+
+
+class StreamingParser(DataParser):
+    """Reads the datalogs in chunks of input_settings.chunksize rows,
+    keeping only running aggregates per (fom, OPERATOR, PART)
+
+    Peak memory is bounded by the number of groups and the chunksize instead
+    of the file sizes. dfdata stays empty, the datastore is an AggregateStore.
+    """
+
+    def __init__(self, cfg: Mapping, filepaths: list[Path | str] = []) -> None:
+        # the data is streamed, not loaded by DataParser
+        super().__init__(cfg, filepaths=[])
+        self.chunksize = int(cfg["input_settings"].get("chunksize", 100_000))
+        self.aggregator: Optional[engine.PartAggregator] = None
+        self.datastore: Optional[AggregateStore] = None
+        if filepaths:
+            self.stream_files(filepaths)
+            self.datastore = self.parse_data(self.dfdata, self.dfheaders)
+        print(f"{self.__class__.__name__}() done")
+
+    def stream_files(self, filepaths: list[Path | str]) -> None:
+        """IO: Streams the datalogs one after the other into self.aggregator"""
+        dflist_headers = []
+        n = len(filepaths)
+        for i, fp in enumerate(filepaths, 1):
+            t0 = time.perf_counter()
+            dfheaders, chunks = read_datalog_chunks(
+                fp, self.cfg["input_settings"], self.chunksize
+            )
+            dflist_headers.append(dfheaders)
+            nrows = 0
+            for dfchunk in chunks:
+                self.update(dfchunk, dfheaders)
+                nrows += len(dfchunk)
+            name = Path(fp).name
+            self.file_timings[name] = time.perf_counter() - t0
+            self.log.info(
+                f"  [{i}/{n}] {name} streamed in {self.file_timings[name]:.2f}s, {nrows} rows"
+            )
+        self.file_info = Path(filepaths[0]).name if n == 1 else "multiple_files"
+        self.dfheaders = merge_headers(dflist_headers)
+
+    def update(
+        self, dfchunk: pd.DataFrame, dfheaders: Optional[pd.DataFrame] = None
+    ) -> pd.DataFrame:
+        """Merges a chunk of rows into the running aggregates
+
+        :param dfheaders: headers of the datalog, see select_foms()
+        :return: aggregates of the chunk, see engine.PartAggregator.update()
+        :rtype: pd.DataFrame
+        """
+        if self.aggregator is None:
+            # FOMs are fixed by the first chunk and the headers
+            foms = self.select_foms(dfchunk, dfheaders)
+            self.aggregator = engine.PartAggregator(foms, self.PART, self.OPERATOR)
+        foms = self.aggregator.foms
+        bad_cols = [
+            c
+            for c in dfchunk.columns.intersection(foms)
+            if not pd.api.types.is_numeric_dtype(dfchunk[c])
+        ]
+        if bad_cols:
+            dfchunk = dfchunk.assign(
+                **{c: pd.to_numeric(dfchunk[c], errors="coerce") for c in bad_cols}
+            )
+        return self.aggregator.update(dfchunk)
+
+    def parse_data(
+        self, dfdata: pd.DataFrame, dfheaders: pd.DataFrame
+    ) -> AggregateStore:
+        if not dfdata.empty:
+            self.update(dfdata, dfheaders)
+        if self.aggregator is None:
+            raise RuntimeError("no data to parse")
+        foms = self.aggregator.foms
+        return AggregateStore(
+            self.aggregator.result(),
+            make_limits_table(dfheaders, foms, self.cfg_grrlimits),
+            PART=self.PART,
+            OPERATOR=self.OPERATOR,
+            reps=self.aggregator.reps,
+        )
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(\n  file_info={self.file_info},\n  {self.datastore})"
+
+
+PARSERS: dict[str, type[DataParser]] = {
+    "paramdata": StandardParser,
+    "long": LongFormatParser,
+    "streaming": StreamingParser,
+}
+
+
+def make_parser(cfg: Mapping, filepaths: list[Path | str] = []) -> DataParser:
+    """Returns the parser selected by input_settings.datastore"""
+    datastore = cfg["input_settings"].get("datastore", "paramdata")
+    if datastore not in PARSERS:
+        raise utils.ConfigError(f"unknown datastore {datastore=}")
+    return PARSERS[datastore](cfg=cfg, filepaths=filepaths)
+
+
+@dataclass
+class GaiaData:
+    fom: str
+    operator: str
+    df: pd.DataFrame
+    df_condensed: pd.DataFrame = field(default_factory=lambda: pd.DataFrame())
+    grr_passed: bool = False  # True: pass, False: fail or error
+    grr_limits: float = float("inf")
+
+    def __str__(self) -> str:
+        parts_failed = len(self.df) - self.df["grr_part_passed"].sum()
+        return f"{self.__class__.__name__}(fom={self.fom}, passed={self.grr_passed}, operator={self.operator}, {parts_failed=}, df.shape={self.df.shape})"
+
+
+class GaiaDataMaker:
+    @utils.timer(name="grr_compute")
+    def __init__(
+        self,
+        cfg: Mapping,
+        dataparam_list: list[ParamData] | LongDataStore | AggregateStore,
+        dflimits: pd.DataFrame,
+        lazy: bool = False,
+    ) -> None:
+        self.log = utils.setup_logger(APP_NAME)
+        VARS = cfg["input_settings"]["variable_names"]
+        self.OPERATOR = VARS["OPERATOR"]
+        self.PART = VARS["PART"]
+        self.USL = "usl"
+        self.LSL = "lsl"
+        self.UNITS = "units"
+        self.REP = "rep"
+        self.VALUE = "value"
+        self.dflimits = dflimits
+        self.is_pseudo_golden = True
+        self.golden_operator = ""
+        self.gaiadata_store = []
+        self.baseline = GoldenBaseline(cfg)
+        self.dfgolden_baseline: Optional[pd.DataFrame] = None
+        self.compact_dtypes = cfg["grr_settings"].get("compact_dtypes", False)
+        self.df_anova: Optional[pd.DataFrame] = None
+        if cfg["grr_settings"].get("anova", {}).get("enabled", False):
+            if isinstance(dataparam_list, LongDataStore):
+                self.df_anova = self.compute_anova(
+                    dataparam_list, cfg["grr_settings"]["anova"]
+                )
+            else:
+                self.log.warning("anova requires datastore=long, ignored")
+        grr_engine = cfg["grr_settings"].get("grr_engine", "batched")
+        n = len(dataparam_list)
+        if isinstance(dataparam_list, LongDataStore) and grr_engine == "batched":
+            dataparam_list = dataparam_list.aggregate()
+        if isinstance(dataparam_list, AggregateStore):
+            # No GaiaData objects, gaiadata_store stays empty
+            self.datastore = dataparam_list
+            if lazy:
+                # computed per FOM on demand, see compute_fom()
+                self.dfs, self.df_summary = pd.DataFrame(), pd.DataFrame()
+                return
+            self.dfs, self.df_summary = self.compact(
+                *self.compute_grr_batched(dataparam_list)
+            )
+            return
+
+        if lazy:
+            self.log.warning("lazy mode requires grr_engine=batched, ignored")
+        if self.baseline.mode != "off":
+            self.log.warning(f"per_pair grr_engine ignores {self.baseline}")
+        if isinstance(dataparam_list, LongDataStore):
+            for i, fom_data in enumerate(dataparam_list.iter_foms(), 1):
+                self.log.debug(f"  [{i}/{n}] breaking down into operators")
+                self.breakdown_fom(*fom_data)
+        else:
+            for i, dataparam in enumerate(dataparam_list, 1):
+                self.log.debug(f"  [{i}/{n}] breaking down into operators")
+                self.breakdown_to_sockets(dataparam)
+        n = len(self.gaiadata_store)
+        for i, data in enumerate(self.gaiadata_store, 1):
+            self.log.debug(f"  [{i}/{n}] computing grr_status")
+            self.compute_grr_status(data)
+
+        # Special df that contains nested dataframes
+        df = pd.DataFrame(self.gaiadata_store)
+        self.df_summary = df[["fom", "operator", "grr_passed", "grr_limits"]]
+        with utils.stage("compile_dfs", log=self.log) as m:
+            self.dfs = self.compile_dfs(self.gaiadata_store)
+            m["rows"] = len(self.dfs)
+        self.dfs, self.df_summary = self.compact(self.dfs, self.df_summary)
+
+    def __str__(self):
+        number_of_datatables = len(self.df_summary)
+        return f"{self.__class__.__name__}(datastore: n={number_of_datatables})"
+
+    def compute_grr_batched(
+        self,
+        datastore: AggregateStore,
+        pairs: Optional[pd.DataFrame] = None,
+    ) -> tuple[pd.DataFrame, pd.DataFrame]:
+        # All FOM x operator pairs at once from the aggregates, see engine.py
+        # pairs: pd.DataFrame(columns=[fom, OPERATOR]), only compute these pairs
+        self.log.debug(f"  computing grr for {len(datastore)} foms (batched)")
+        dfagg = datastore.dfagg
+        if pairs is not None:
+            # golden stats need every operator of the FOMs
+            dfagg = dfagg[dfagg["fom"].isin(pairs["fom"].unique())]
+        if self.baseline.mode == "use":
+            self.golden_operator = ""
+            self.is_pseudo_golden = False
+            if self.dfgolden_baseline is None:
+                # loaded once, compute_fom() calls this for every FOM
+                self.dfgolden_baseline = self.baseline.load()
+                missing = set(datastore.foms).difference(self.dfgolden_baseline["fom"])
+                if missing:
+                    self.log.warning(f"{len(missing)} foms not in golden baseline")
+            dfgolden = self.dfgolden_baseline
+        else:
+            self.golden_operator = engine.find_golden_operator(datastore.operators)
+            self.is_pseudo_golden = not self.golden_operator
+            dfgolden = engine.golden_stats(
+                dfagg, self.golden_operator, PART=self.PART, OPERATOR=self.OPERATOR
+            )
+            if self.baseline.mode == "save" and pairs is None:
+                if self.is_pseudo_golden:
+                    self.log.warning("no golden operator, golden baseline not saved")
+                else:
+                    self.baseline.save(dfgolden)
+        if pairs is not None:
+            dfagg = pd.merge(left=dfagg, right=pairs, on=["fom", self.OPERATOR])
+        return engine.compute_grr(
+            dfagg,
+            dfgolden,
+            datastore.dflimits,
+            PART=self.PART,
+            OPERATOR=self.OPERATOR,
+        )
+
+    def compute_anova(
+        self, datastore: LongDataStore, cfg_anova: Mapping
+    ) -> pd.DataFrame:
+        """ANOVA Gage R&R of every FOM, see engine.compute_anova()
+
+        :return: one row per FOM, anova_passed if grr_pct <= max_grr_pct
+            and ndc >= min_ndc
+        :rtype: pd.DataFrame
+        """
+        with utils.stage("anova", rows=len(datastore.df), log=self.log):
+            df = engine.compute_anova(
+                datastore.df,
+                PART=self.PART,
+                OPERATOR=self.OPERATOR,
+                VALUE=datastore.VALUE,
+                dflimits=datastore.dflimits,
+            )
+        df["anova_passed"] = (df["grr_pct"] <= cfg_anova.get("max_grr_pct", 30)) & (
+            df["ndc"] >= cfg_anova.get("min_ndc", 5)
+        )
+        return df
+
+    def compute_fom(self, fom: str) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """GR&R of every operator of one FOM, for lazy mode
+
+        :return: (dfs, df_summary) of the FOM
+        :rtype: tuple[pd.DataFrame, pd.DataFrame]
+        """
+        dfagg = self.datastore.dfagg
+        pairs = dfagg.loc[dfagg["fom"] == fom, ["fom", self.OPERATOR]]
+        return self.compact(
+            *self.compute_grr_batched(self.datastore, pairs.drop_duplicates())
+        )
+
+    def compact(
+        self, dfs: pd.DataFrame, df_summary: pd.DataFrame
+    ) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """Compact dtypes of the results if grr_settings.compact_dtypes,
+        see engine.compact_results()
+
+        :return: (dfs, df_summary)
+        :rtype: tuple[pd.DataFrame, pd.DataFrame]
+        """
+        if not self.compact_dtypes:
+            return dfs, df_summary
+        before = engine.bytes_per_row(dfs)
+        dfs = engine.compact_results(dfs, PART=self.PART)
+        df_summary = engine.compact_results(df_summary)
+        after = engine.bytes_per_row(dfs)
+        self.log.info(
+            f"compact dtypes, dfs {before:.1f} -> {after:.1f} bytes/row, {len(dfs)} rows"
+        )
+        return dfs, df_summary
+
+    def update(
+        self, datastore: AggregateStore, dftouched: pd.DataFrame
+    ) -> pd.DataFrame:
+        """Recomputes the FOM x operator pairs touched by new data,
+        in place of their current results in dfs and df_summary
+
+        :param dftouched: aggregates of the new rows, see PartAggregator.update()
+        :type dftouched: pd.DataFrame(columns=[fom, OPERATOR, PART, ...])
+        :return: the recomputed pairs
+        :rtype: pd.DataFrame(columns=[fom, OPERATOR])
+        """
+        OPERATOR = self.OPERATOR
+        golden_operator = engine.find_golden_operator(datastore.operators)
+        if self.baseline.mode != "use" and golden_operator != self.golden_operator:
+            self.log.info(f"golden operator is now {golden_operator!r}, recomputing")
+            self.dfs, self.df_summary = self.compact(
+                *self.compute_grr_batched(datastore)
+            )
+            return datastore.dfagg[["fom", OPERATOR]].drop_duplicates()
+
+        pairs = dftouched[["fom", OPERATOR]].drop_duplicates()
+        if self.baseline.mode != "use":
+            # new golden data moves the reference of every operator of the FOM
+            if self.is_pseudo_golden:
+                golden_foms = pairs["fom"]
+            else:
+                golden_foms = pairs.loc[pairs[OPERATOR] == golden_operator, "fom"]
+            dfagg = datastore.dfagg
+            pairs = pd.concat(
+                [
+                    pairs,
+                    dfagg.loc[dfagg["fom"].isin(golden_foms), ["fom", OPERATOR]],
+                ],
+                ignore_index=True,
+            ).drop_duplicates()
+        dfs, df_summary = self.compute_grr_batched(datastore, pairs)
+        # categories of the new pairs differ, concat falls back to object
+        self.dfs, self.df_summary = self.compact(
+            engine.replace_pairs(self.dfs, dfs),
+            engine.replace_pairs(self.df_summary, df_summary),
+        )
+        return pairs
+
+    def transform_data(
+        self, dfin: pd.DataFrame, operator: str, is_golden: bool = False
+    ) -> pd.DataFrame:
+        if not operator and is_golden:
+            # Pseudo-golden mode. Take average of everything
+            df = dfin
+        else:
+            df = dfin[dfin[self.OPERATOR] == operator]
+
+        # outname = f"output-{self.data.name}-{self.OPERATOR}.csv"
+        # df.to_csv(outname)
+        dfp = pd.pivot_table(
+            data=df,
+            index=self.PART,
+            values=self.VALUE,
+            aggfunc=["mean", "count", "min", "max"],
+            observed=True,
+        ).reset_index()
+        dfp.columns = dfp.columns.map("_".join).str.strip("_")
+        if is_golden:
+            dfp.set_index(self.PART, inplace=True)
+            dfp.columns = dfp.columns.map(lambda x: f"golden_{x}")
+            dfp.reset_index(inplace=True)
+        # return PlotData(operator=operator, df=dfp)
+        return dfp
+
+    def breakdown_to_sockets(self, paramdata: ParamData) -> None:
+        self.breakdown_fom(paramdata.name, paramdata.dfdata, paramdata.limits)
+
+    def breakdown_fom(self, fom: str, dfdata: pd.DataFrame, limits: pd.Series) -> None:
+        operators = dfdata[self.OPERATOR].unique()
+        is_golden_socket = [
+            True if ("_gold" in op.lower()) else False for op in operators
+        ]
+        match golden_operator_count := sum(is_golden_socket):
+            case 0:
+                self.is_pseudo_golden = True
+                self.golden_operator = ""
+            case 1:
+                self.is_pseudo_golden = False
+                self.golden_operator = operators[is_golden_socket.index(True)]
+            case _:
+                raise RuntimeError(
+                    f"more than 1 golden operator, found ({golden_operator_count=})"
+                )
+
+        # pseudo-golden mode (no golden operator): pooled over all operators
+        dfgolden = self.transform_data(dfdata, self.golden_operator, is_golden=True)
+
+        for operator in operators:
+            dftarget = self.transform_data(dfdata, operator, is_golden=False)
+            df = pd.merge(left=dfgolden, right=dftarget, on=self.PART, how="outer")
+            df = self.compute_grr_pct(df, limits=limits, fom=fom)
+            self.gaiadata_store.append(
+                GaiaData(
+                    fom=fom,
+                    operator=operator,
+                    df=df,
+                    grr_limits=limits["grr_limit"],
+                )
+            )
+
+    def compute_grr_pct(
+        self, dfin: pd.DataFrame, limits: pd.Series, fom: str
+    ) -> pd.DataFrame:
+        df = dfin
+        df["grr_limits"] = limits["grr_limit"]
+        df["grr_mean_offset"] = df["mean_value"] - df["golden_mean_value"]
+        df["grr_pos_offset"] = abs(df["max_value"] - df["golden_mean_value"])
+        df["grr_neg_offset"] = abs(df["min_value"] - df["golden_mean_value"])
+        df["grr_high_pct"] = df["grr_pos_offset"] / df["grr_limits"] * 100
+        df["grr_low_pct"] = df["grr_neg_offset"] / df["grr_limits"] * 100
+        return df
+
+    def compute_grr_status(self, gaiadata: GaiaData) -> GaiaData:
+        # computes grr status and updates GaiaData object in place
+        gaiadata.df["grr_part_passed"] = (gaiadata.df["grr_high_pct"] < 100) & (
+            gaiadata.df["grr_low_pct"] < 100
+        )
+        df = gaiadata.df[
+            [
+                "SerialNumber",
+                "mean_value",
+                "golden_mean_value",
+                "grr_mean_offset",
+                "grr_limits",
+                "grr_pos_offset",
+                "grr_neg_offset",
+                "grr_high_pct",
+                "grr_low_pct",
+                "grr_part_passed",
+            ]
+        ]
+
+        gaiadata.df_condensed = df
+        gaiadata.grr_passed = df["grr_part_passed"].all()
+
+        return gaiadata
+
+    def compile_dfs(self, datalist: list[GaiaData]) -> pd.DataFrame:
+        # compile a huge dataframe to send to plotly
+        # a single concat, the keys are then added to the compiled frame
+        df = pd.concat([data.df_condensed for data in datalist], ignore_index=True)
+        lengths = [len(data.df_condensed) for data in datalist]
+        foms = np.array([data.fom for data in datalist], dtype=object)
+        operators = np.array([data.operator for data in datalist], dtype=object)
+        df["fom"] = np.repeat(foms, lengths)
+        df["operator"] = np.repeat(operators, lengths)
+        return df
+
+    def pretty_print(self, dfin: pd.DataFrame, name: str) -> None:
+        df = dfin[
+            [
+                self.PART,
+                "mean_value",
+                "golden_mean_value",
+                "grr_mean_offset",
+                "grr_high_pct",
+                "grr_low_pct",
+            ]
+        ]
+        print(f"{name=}\n{df}")
+
+
 def main():
     # Not working now
     cfg = Config().cfg
@@ -0,0 +1,135 @@
+# resultstore.py is part of MODEL in the design framework
+# Compiled GR&R results as Arrow IPC files, shared memory-mapped by processes
+
+# global libraries
+import os
+import importlib.util
+from pathlib import Path
+from typing import Mapping, Optional
+
+import pandas as pd
+
+# local libraries
+import utils
+
+APP_NAME = "grrd"
+TABLES = ("dfs", "summary", "anova")
+VERSION_KEY = b"grrd.version"  # schema metadata of the dfs table
+
+
+def to_arrow(df: pd.DataFrame):
+    """pd.DataFrame -> pa.Table, keeping NaN as NaN (not null) in float
+    columns, so that they can be read back without a copy"""
+    import pyarrow as pa
+
+    df = df.astype({c: "category" for c in df.columns if df[c].dtype == object})
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for i, col in enumerate(df.columns):
+        if pd.api.types.is_float_dtype(df[col].dtype):
+            values = pa.array(df[col].to_numpy(), from_pandas=False)
+            table = table.set_column(i, col, values)
+    return table
+
+
+class ResultStore:
+    """Writes the results (dfs, df_summary) once as Arrow IPC (Feather v2)
+    files, uncompressed, and opens them memory-mapped
+
+    Float columns are then read without a copy: their data stays in the
+    page cache, shared by every process that opens the same file, instead
+    of being rebuilt in each heap. Keys are read as categoricals.
+    """
+
+    def __init__(self, cfg: Mapping, directory: Optional[Path | str] = None) -> None:
+        """
+        :param directory: defaults to server.result_store.directory
+        """
+        self.log = utils.setup_logger(APP_NAME)
+        cfg_store = cfg.get("server", {}).get("result_store", {})
+        self.enabled = bool(cfg_store.get("enabled", False))
+        if directory is None:
+            directory = cfg_store.get("directory", "~/tmp/grrd/results")
+        self.directory = Path(os.path.expanduser(directory))
+        self.name = str(cfg["general"]["recipe_name"])
+        if self.enabled and importlib.util.find_spec("pyarrow") is None:
+            raise utils.ConfigError("result_store requires pyarrow")
+
+    def __str__(self) -> str:
+        return f"{self.__class__.__name__}(enabled={self.enabled}, directory={self.directory})"
+
+    def get_paths(self, name: str = "") -> dict[str, Path]:
+        name = name or self.name
+        return {t: self.directory / f"{name}.{t}.arrow" for t in TABLES}
+
+    def exists(self, name: str = "") -> bool:
+        paths = self.get_paths(name)
+        return paths["dfs"].is_file() and paths["summary"].is_file()
+
+    def write(
+        self,
+        dfs: pd.DataFrame,
+        df_summary: pd.DataFrame,
+        name: str = "",
+        df_anova: Optional[pd.DataFrame] = None,
+        version: Optional[int] = None,
+    ) -> dict[str, Path]:
+        """IO: Writes the results, atomically replacing previous files
+
+        The dfs file is replaced last, a reader that sees it changed reads
+        the other tables of the same write (see watcher.ResultFollower).
+
+        :param version: dataset version, read back by read_version()
+        """
+        import pyarrow.feather as feather
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        paths = self.get_paths(name)
+        tables = {"summary": df_summary, "dfs": dfs}
+        if df_anova is not None:
+            tables = {"anova": df_anova, **tables}
+        else:
+            paths["anova"].unlink(missing_ok=True)
+        for t, df in tables.items():
+            table = to_arrow(df)
+            if t == "dfs" and version is not None:
+                metadata = {**(table.schema.metadata or {}), VERSION_KEY: str(version)}
+                table = table.replace_schema_metadata(metadata)
+            feather.write_feather(
+                table, paths[t].with_suffix(".tmp"), compression="uncompressed"
+            )
+        for t in tables:
+            os.replace(paths[t].with_suffix(".tmp"), paths[t])
+        self.log.info(f"results written to {paths['dfs']} ({len(dfs)} rows)")
+        return paths
+
+    def open_table(self, t: str = "dfs", name: str = ""):
+        """IO: Returns the memory-mapped pa.Table, columns are zero-copy"""
+        import pyarrow as pa
+
+        source = pa.memory_map(str(self.get_paths(name)[t]), "r")
+        return pa.ipc.open_file(source).read_all()
+
+    def read(
+        self, name: str = "", columns: Optional[list[str]] = None
+    ) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """IO: Returns (dfs, df_summary), float columns of dfs are views
+        of the memory-mapped file"""
+        table = self.open_table("dfs", name)
+        if columns is not None:
+            table = table.select(columns)
+        # split_blocks: no consolidation into 2D blocks, i.e. no copy
+        dfs = table.to_pandas(split_blocks=True)
+        df_summary = self.open_table("summary", name).to_pandas()
+        return dfs, df_summary
+
+    def read_anova(self, name: str = "") -> Optional[pd.DataFrame]:
+        """IO: Returns the df_anova written with the results, if any"""
+        if not self.get_paths(name)["anova"].is_file():
+            return None
+        return self.open_table("anova", name).to_pandas()
+
+    def read_version(self, name: str = "") -> Optional[int]:
+        """IO: Returns the version written with the results, if any"""
+        metadata = self.open_table("dfs", name).schema.metadata or {}
+        version = metadata.get(VERSION_KEY)
+        return int(version) if version is not None else None
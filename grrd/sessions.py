@@ -0,0 +1,394 @@
+# sessions.py is part of CONTROLLER in the design framework
+# Datasets uploaded to a running dashboard, each parsed under its own ID and
+# held in a memory-bounded LRU, cold datasets spilled to disk
+
+# global libraries
+import os
+import re
+import copy
+import json
+import time
+import shutil
+import hashlib
+import threading
+import importlib.util
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Mapping, Optional
+
+# local libraries
+import utils
+import models
+from resultstore import ResultStore
+
+APP_NAME = "grrd"
+MANIFEST = "manifest.json"
+# sha1 prefix of the uploaded files, see SessionRegistry.save_upload()
+DATASET_ID_PATTERN = re.compile(r"[0-9a-f]{16}")
+
+
+@dataclass
+class Session:
+    dataset_id: str
+    name: str
+    dataset: models.Dataset
+    nbytes: int
+    pinned: bool = False  # never evicted, e.g. the targetdir dataset
+    spilled: bool = False  # results already on disk, see ResultStore
+
+
+@dataclass
+class Upload:
+    """Progress of an upload parsed in the background"""
+
+    name: str
+    stage: str = "queued"
+    error: str = ""
+    done: bool = False
+    start: float = field(default_factory=time.perf_counter)
+    end: float = 0.0
+
+    @property
+    def elapsed_s(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+
+def get_nbytes(dataset: models.Dataset) -> int:
+    """Bytes of the results of a dataset, memory-mapped columns included"""
+    snapshot = dataset.snapshot
+    tables = [snapshot.dfs, snapshot.df_summary, snapshot.df_anova]
+    return int(sum(df.memory_usage(deep=True).sum() for df in tables if df is not None))
+
+
+def is_grrconfig(filename: str) -> bool:
+    return "grrconfig" in filename.lower()
+
+
+def is_dataset_id(dataset_id: str) -> bool:
+    return isinstance(dataset_id, str) and bool(
+        DATASET_ID_PATTERN.fullmatch(dataset_id)
+    )
+
+
+def name_upload(filenames: list[str]) -> str:
+    datalogs = [Path(fn).stem for fn in filenames if not is_grrconfig(fn)]
+    return datalogs[0] if len(datalogs) == 1 else f"{len(datalogs)} datalogs"
+
+
+class SessionRegistry:
+    """Datasets served side by side by one dashboard
+
+    Each upload (datalogs and grrConfig files) is saved under
+    directory/<dataset_id>, the ID being a hash of the files, and parsed into
+    its own models.Dataset. At most max_datasets datasets, and max_size_mb of
+    results, are held in memory. Beyond that the least recently selected one
+    is evicted: its results are spilled as Arrow files (see ResultStore) and
+    read back memory-mapped when it is selected again, or parsed again from
+    its files without pyarrow. A dataset unknown to this process (e.g.
+    uploaded to another gunicorn worker) is loaded the same way.
+
+    Uploads are parsed in a background thread, see add() and progress().
+    """
+
+    def __init__(self, cfg: Mapping) -> None:
+        self.log = utils.setup_logger(APP_NAME)
+        self.cfg = cfg
+        cfg_sessions = cfg.get("dashboard", {}).get("sessions", {})
+        self.enabled = bool(cfg_sessions.get("enabled", False))
+        self.directory = Path(
+            os.path.expanduser(cfg_sessions.get("directory", "~/tmp/grrd/sessions"))
+        )
+        self.max_datasets = max(int(cfg_sessions.get("max_datasets", 4)), 1)
+        self.max_size = int(float(cfg_sessions.get("max_size_mb", 1024)) * 1024**2)
+        self.max_disk_size = int(float(cfg_sessions.get("max_disk_mb", 8192)) * 1024**2)
+        self.spill = importlib.util.find_spec("pyarrow") is not None
+        if self.enabled and not self.spill:
+            self.log.warning(
+                "sessions spill requires pyarrow, evicted datasets are parsed again"
+            )
+        self.sessions: OrderedDict[str, Session] = OrderedDict()
+        self.lock = threading.Lock()
+        self.loading: dict[str, threading.Lock] = {}
+        self.uploads: dict[str, Upload] = {}
+        self.size = 0
+        self.hits = 0
+        self.loads = 0
+        self.spills = 0
+        self.evictions = 0
+
+    def __str__(self) -> str:
+        return f"{self.__class__.__name__}(sessions={len(self.sessions)}, size={self.size}, directory={self.directory})"
+
+    def __contains__(self, dataset_id: str) -> bool:
+        if dataset_id in self.sessions:
+            return True
+        return (
+            is_dataset_id(dataset_id) and self.get_manifest_path(dataset_id).is_file()
+        )
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "loads": self.loads,
+            "spills": self.spills,
+            "evictions": self.evictions,
+            "sessions": len(self.sessions),
+            "size_bytes": self.size,
+            "max_size_bytes": self.max_size,
+        }
+
+    def get_directory(self, dataset_id: str) -> Path:
+        """Directory of an upload, dataset_id (e.g. sent by a client) is
+        checked before any path is built from it
+
+        :raises KeyError: not an ID made by save_upload()
+        """
+        if not is_dataset_id(dataset_id):
+            raise KeyError(f"invalid {dataset_id=}")
+        return self.directory / dataset_id
+
+    def get_manifest_path(self, dataset_id: str) -> Path:
+        return self.get_directory(dataset_id) / MANIFEST
+
+    def get_store(self, dataset_id: str) -> ResultStore:
+        return ResultStore(self.cfg, directory=self.get_directory(dataset_id))
+
+    def options(self) -> list[dict[str, str]]:
+        """Dropdown options of every dataset, in memory or on disk, most
+        recently uploaded first"""
+        options = {s.dataset_id: s.name for s in self.sessions.values() if s.pinned}
+        manifests = {}
+        for fp in self.directory.glob(f"*/{MANIFEST}"):
+            if not is_dataset_id(fp.parent.name):
+                continue
+            try:
+                manifests[fp.parent.name] = json.loads(fp.read_text())
+            except Exception as e:
+                self.log.warning(f"unreadable {fp}, {e=}")
+        for dataset_id in sorted(
+            manifests, key=lambda k: manifests[k]["time"], reverse=True
+        ):
+            name = manifests[dataset_id]["name"]
+            options.setdefault(dataset_id, f"{name} ({dataset_id[:8]})")
+        return [{"label": label, "value": k} for k, label in options.items()]
+
+    def add_dataset(
+        self,
+        dataset_id: str,
+        name: str,
+        dataset: models.Dataset,
+        pinned: bool = False,
+        spilled: bool = False,
+    ) -> None:
+        """Holds dataset in memory, then evicts the least recently used
+        datasets over the limits, pinned datasets are never evicted"""
+        session = Session(
+            dataset_id, name, dataset, get_nbytes(dataset), pinned, spilled
+        )
+        evicted = []
+        with self.lock:
+            if dataset_id in self.sessions:
+                self.size -= self.sessions.pop(dataset_id).nbytes
+            self.sessions[dataset_id] = session
+            self.size += session.nbytes
+            for key in list(self.sessions):
+                if (
+                    len(self.sessions) <= self.max_datasets
+                    and self.size <= self.max_size
+                ):
+                    break
+                if key == dataset_id or self.sessions[key].pinned:
+                    continue
+                evicted.append(self.sessions.pop(key))
+                self.size -= evicted[-1].nbytes
+                self.evictions += 1
+        for s in evicted:
+            self.spill_session(s)
+        self.log.debug(f"session {dataset_id} held ({session.nbytes} bytes), {self}")
+
+    def spill_session(self, session: Session) -> None:
+        """IO: Writes the results of an evicted session, once"""
+        if session.spilled or session.pinned or not self.spill:
+            return
+        snapshot = session.dataset.snapshot
+        try:
+            self.get_store(session.dataset_id).write(
+                snapshot.dfs, snapshot.df_summary, "results", snapshot.df_anova
+            )
+        except Exception as e:
+            self.log.warning(f"unable to spill session {session.dataset_id}, {e=}")
+            return
+        self.spills += 1
+        self.log.info(f"session {session.dataset_id} evicted, spilled to disk")
+
+    def save_upload(self, files: Mapping[str, bytes], name: str = "") -> str:
+        """IO: Saves the uploaded files under their dataset ID
+
+        :param files: {filename: content}, datalogs and grrConfig files
+        :param name: label of the dataset, defaults to the datalog name
+        :raises RuntimeError: no datalog or no grrConfig
+        :return: dataset_id, the same for the same files
+        """
+        files = {Path(filename).name: content for filename, content in files.items()}
+        name = name or name_upload(list(files))
+        if not any(is_grrconfig(fn) for fn in files):
+            raise RuntimeError("no grrConfig file uploaded")
+        if all(is_grrconfig(fn) for fn in files):
+            raise RuntimeError("no datalog uploaded")
+        h = hashlib.sha1()
+        for filename in sorted(files):
+            h.update(filename.encode("utf-8"))
+            h.update(hashlib.sha1(files[filename]).digest())
+        dataset_id = h.hexdigest()[:16]
+
+        directory = self.get_directory(dataset_id)
+        if self.get_manifest_path(dataset_id).is_file():
+            return dataset_id
+        directory.mkdir(parents=True, exist_ok=True)
+        for filename, content in files.items():
+            (directory / filename).write_bytes(content)
+        manifest = {"name": name, "files": sorted(files), "time": utils.get_time()}
+        # written last, a directory without manifest is an incomplete upload
+        self.get_manifest_path(dataset_id).write_text(json.dumps(manifest, indent=2))
+        self.prune(keep=dataset_id)
+        return dataset_id
+
+    def set_stage(self, dataset_id: str, stage: str) -> None:
+        upload = self.uploads.get(dataset_id)
+        if upload is not None:
+            upload.stage = stage
+
+    def parse(self, dataset_id: str) -> models.Dataset:
+        """Parses the files of a dataset and computes its GR&R results"""
+        directory = self.get_directory(dataset_id)
+        cfg = copy.deepcopy(self.cfg)
+        cfg["general"]["grr_config_csv_filepath"] = [
+            str(fp) for fp in sorted(directory.glob("*.csv")) if is_grrconfig(fp.name)
+        ]
+        # no process pool forked from a serving (threaded) process
+        cfg["input_settings"]["max_workers"] = 1
+        with utils.stage("session_parse"):
+            self.set_stage(dataset_id, "parsing datalogs")
+            data = models.make_parser(
+                cfg=cfg, filepaths=models.list_datalogs(directory)
+            )
+            self.set_stage(dataset_id, "computing GR&R")
+            plot_data = models.GaiaDataMaker(
+                cfg=cfg,
+                dataparam_list=data.datastore,
+                dflimits=data.cfg_grrlimits,
+            )
+        return models.Dataset(
+            plot_data.dfs, plot_data.df_summary, df_anova=plot_data.df_anova
+        )
+
+    def load(self, dataset_id: str) -> models.Dataset:
+        """IO: Reads the spilled results of a dataset, else parses its files
+
+        :raises KeyError: unknown dataset_id
+        """
+        manifest_path = self.get_manifest_path(dataset_id)
+        if not manifest_path.is_file():
+            raise KeyError(f"unknown {dataset_id=}")
+        name = json.loads(manifest_path.read_text())["name"]
+        manifest_path.touch()  # mtime is the LRU clock of prune()
+        store = self.get_store(dataset_id)
+        spilled = self.spill and store.exists("results")
+        if spilled:
+            dfs, df_summary = store.read("results")
+            dataset = models.Dataset(
+                dfs, df_summary, df_anova=store.read_anova("results")
+            )
+        else:
+            dataset = self.parse(dataset_id)
+        self.loads += 1
+        self.add_dataset(dataset_id, name, dataset, spilled=spilled)
+        return dataset
+
+    def add(self, files: Mapping[str, bytes], name: str = "") -> str:
+        """IO: Saves an upload, see save_upload(), then parses it in a
+        background thread, see progress()
+
+        :return: dataset_id
+        """
+        dataset_id = self.save_upload(files, name)
+        with self.lock:
+            upload = self.uploads.get(dataset_id)
+            if upload is not None and not upload.error:
+                return dataset_id  # the same files, already being parsed
+            self.uploads[dataset_id] = Upload(name or name_upload(list(files)))
+        threading.Thread(
+            target=self.parse_upload,
+            args=(dataset_id,),
+            name=f"upload-{dataset_id}",
+            daemon=True,
+        ).start()
+        return dataset_id
+
+    def parse_upload(self, dataset_id: str) -> None:
+        upload = self.uploads[dataset_id]
+        try:
+            self.get(dataset_id)
+        except Exception as e:
+            self.log.error(f"upload {dataset_id} failed, {e!r}")
+            upload.error = str(e)
+        upload.end = time.perf_counter()
+        upload.done = True
+
+    def progress(self, dataset_id: str) -> Optional[Upload]:
+        """Progress of an upload, forgotten once reported done
+
+        :return: None for an upload unknown to this process, e.g. added by
+            another gunicorn worker, loaded when selected
+        """
+        with self.lock:
+            upload = self.uploads.get(dataset_id)
+            if upload is not None and upload.done:
+                self.uploads.pop(dataset_id)
+        return upload
+
+    def get(self, dataset_id: str) -> models.Dataset:
+        """The dataset of dataset_id, loaded on a miss
+
+        :raises KeyError: unknown dataset_id
+        """
+        with self.lock:
+            session = self.sessions.get(dataset_id)
+            if session is not None:
+                self.sessions.move_to_end(dataset_id)
+                self.hits += 1
+                return session.dataset
+            if not is_dataset_id(dataset_id):
+                raise KeyError(f"invalid {dataset_id=}")
+            loading = self.loading.setdefault(dataset_id, threading.Lock())
+        # one load per dataset, concurrent requests wait for it
+        try:
+            with loading:
+                session = self.sessions.get(dataset_id)
+                dataset = session.dataset if session else self.load(dataset_id)
+        finally:
+            with self.lock:
+                self.loading.pop(dataset_id, None)
+        return dataset
+
+    def prune(self, keep: str = "") -> None:
+        """IO: Deletes the least recently used uploads over max_disk_mb,
+        datasets held in memory and keep are kept"""
+        entries = {}
+        for fp in self.directory.glob(f"*/{MANIFEST}"):
+            files = [f for f in fp.parent.iterdir() if f.is_file()]
+            entries[fp.parent] = (
+                fp.stat().st_mtime,
+                sum(f.stat().st_size for f in files),
+            )
+        total = sum(size for _, size in entries.values())
+        for directory in sorted(entries, key=lambda d: entries[d][0]):
+            if total <= self.max_disk_size:
+                break
+            if directory.name in self.sessions or directory.name == keep:
+                continue
+            total -= entries[directory][1]
+            shutil.rmtree(directory, ignore_errors=True)
+            self.log.debug(f"session {directory.name} deleted from disk")
@@ -0,0 +1,122 @@
+# specs.py is part of MODEL in the design framework
+# Registry of the grrConfig specs of every FOM, each file parsed once per process
+
+# global libraries
+import json
+import threading
+from pathlib import Path
+from typing import Mapping, Optional
+
+import pandas as pd
+
+# local libraries
+import utils
+
+APP_NAME = "grrd"
+SPEC_COLUMNS = ["grr_limit", "usl", "lsl", "units"]
+# optional columns of a grrConfig file, names in reading_format.grr_config_csv
+OPTIONAL_COLUMNS = {"USL": "usl", "LSL": "lsl", "UNITS": "units"}
+
+# {(filepath, reading_format as JSON): ((st_mtime_ns, st_size), specs table)}
+_cache: dict[tuple[Path, str], tuple[tuple[int, int], pd.DataFrame]] = {}
+_cache_lock = threading.Lock()
+
+
+def get_spec_filepaths(cfg: Mapping) -> list[Path]:
+    """general.grr_config_csv_filepath, a filepath or a list of filepaths"""
+    filepaths = cfg["general"]["grr_config_csv_filepath"]
+    if isinstance(filepaths, (str, Path)):
+        filepaths = [filepaths]
+    return [Path(fp) for fp in filepaths]
+
+
+def read_specs(filepath: Path | str, reading_format: Mapping) -> pd.DataFrame:
+    """IO: Parses a grrConfig file
+
+    :param reading_format: [input_settings.reading_format.grr_config_csv]
+    :return: specs table, columns missing from the file are NaN
+    :rtype: pd.DataFrame(index=fom, columns=SPEC_COLUMNS)
+    """
+    df = pd.read_csv(filepath, skiprows=reading_format["skip_rows"])
+    mapper = {reading_format["FOM"]: "fom", reading_format["GRR_LIMIT"]: "grr_limit"}
+    for key, col in OPTIONAL_COLUMNS.items():
+        if key in reading_format:
+            mapper[reading_format[key]] = col
+    df = df.rename(columns=mapper).reindex(columns=["fom"] + SPEC_COLUMNS)
+    for col in ["grr_limit", "usl", "lsl"]:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df.set_index("fom")
+
+
+def load_specs(filepath: Path | str, reading_format: Mapping) -> pd.DataFrame:
+    """read_specs() through the process-wide cache, the file is parsed again
+    only when its mtime or size changes. The table is shared, not to be
+    modified in place."""
+    filepath = Path(filepath).resolve()
+    # every setting of the reading format changes the table, e.g. skip_rows
+    key = (filepath, json.dumps(reading_format, sort_keys=True, default=str))
+    st = filepath.stat()
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    df = read_specs(filepath, reading_format)
+    with _cache_lock:
+        _cache[key] = (stamp, df)
+    return df
+
+
+class SpecRegistry:
+    """Specs of every FOM, from one or several recipe grrConfig files
+
+    Each file is parsed once per process (see load_specs()). The FOMs of all
+    files are held in a single table, one aligned column per spec, so that
+    the limits of any number of FOMs resolve in one join (see lookup()).
+    The first file wins where a FOM is in several files.
+    """
+
+    def __init__(
+        self, cfg: Mapping, filepaths: Optional[list[Path | str]] = None
+    ) -> None:
+        """
+        :param filepaths: grrConfig files, defaults to get_spec_filepaths(cfg)
+        :raises RuntimeError: a file is missing
+        """
+        self.log = utils.setup_logger(APP_NAME)
+        reading_format = cfg["input_settings"]["reading_format"]["grr_config_csv"]
+        if filepaths is None:
+            self.filepaths = get_spec_filepaths(cfg)
+        else:
+            self.filepaths = [Path(fp) for fp in filepaths]
+        for fp in self.filepaths:
+            if not fp.is_file():
+                raise RuntimeError(f"missing grr_config {fp=}")
+
+        with utils.stage("spec_parse", log=self.log) as m:
+            tables = [load_specs(fp, reading_format) for fp in self.filepaths]
+            df = pd.concat(tables) if len(tables) > 1 else tables[0]
+            duplicated = df.index.duplicated()
+            if duplicated.any():
+                self.log.warning(f"{duplicated.sum()} foms specified twice, first kept")
+                df = df[~duplicated]
+            m["rows"] = len(df)
+        self.df = df
+        self.log.debug(f"grrspecs loaded from {[fp.name for fp in self.filepaths]}")
+
+    def __str__(self) -> str:
+        return f"{self.__class__.__name__}(files={len(self.filepaths)}, foms={len(self.df)})"
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    @property
+    def foms(self) -> list[str]:
+        return list(self.df.index)
+
+    def lookup(self, foms: list[str]) -> pd.DataFrame:
+        """Specs of foms, in their order, NaN where a FOM has no spec
+
+        :rtype: pd.DataFrame(index=fom, columns=SPEC_COLUMNS)
+        """
+        return self.df.reindex(pd.Index(foms, name="fom"))
@@ -1,10 +1,15 @@
 import logging
 import os
+import json
 import time
 import platform
-
+import threading
+import functools
+import importlib.util
+from contextlib import contextmanager
 from logging.handlers import RotatingFileHandler
 from pathlib import Path
+from typing import Callable, Iterator, Mapping, Optional
 
 
 APP_NAME = "grrd"
@@ -25,6 +30,20 @@ def get_time(datetimestrformat: str = "%Y%m%d_%H%M%S"):
     return time.strftime(datetimestrformat, time.localtime(time.time()))
 
 
+def get_csv_engine(input_settings: Mapping) -> str:
+    """Returns the pandas CSV engine selected in [input_settings],
+    falling back to the C engine if pyarrow is not installed"""
+    csv_engine = input_settings.get("csv_engine", "c")
+    if csv_engine not in ("c", "pyarrow", "python"):
+        raise ConfigError(f"unknown {csv_engine=}")
+    if csv_engine == "pyarrow" and importlib.util.find_spec("pyarrow") is None:
+        setup_logger(APP_NAME).warning(
+            "csv_engine=pyarrow but pyarrow is not installed, using c engine"
+        )
+        csv_engine = "c"
+    return csv_engine
+
+
 def setup_logger(name: str = "", default_level: str = "INFO", log_fp_str: str = ""):
     """Set up logger
 
@@ -75,6 +94,110 @@ def setup_logger(name: str = "", default_level: str = "INFO", log_fp_str: str =
     return logger
 
 
+def get_rss() -> int:
+    """Returns the resident memory of the process in bytes, or its peak
+    where the current value is not available"""
+    try:
+        with open("/proc/self/statm", mode="rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if platform.system() == "Darwin" else maxrss * 1024
+
+
+class StageMetrics:
+    """Thread-safe registry of the wall time, rows and memory delta of
+    each pipeline stage, per process"""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.stages: dict[str, dict[str, float]] = {}
+
+    def record(
+        self, name: str, seconds: float, rows: int = 0, rss_delta: int = 0
+    ) -> None:
+        with self.lock:
+            m = self.stages.setdefault(
+                name,
+                {
+                    "count": 0,
+                    "total_s": 0.0,
+                    "last_s": 0.0,
+                    "max_s": 0.0,
+                    "rows": 0,
+                    "last_rss_delta_mb": 0.0,
+                },
+            )
+            m["count"] += 1
+            m["total_s"] += seconds
+            m["last_s"] = seconds
+            m["max_s"] = max(m["max_s"], seconds)
+            m["rows"] += rows
+            m["last_rss_delta_mb"] = rss_delta / 1024**2
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            stages = {name: dict(m) for name, m in self.stages.items()}
+        return {"pid": os.getpid(), "rss_mb": get_rss() / 1024**2, "stages": stages}
+
+    def reset(self) -> None:
+        with self.lock:
+            self.stages.clear()
+
+
+METRICS = StageMetrics()
+
+
+@contextmanager
+def stage(
+    name: str, rows: int = 0, log: Optional[logging.Logger] = None
+) -> Iterator[dict]:
+    """Records a stage in METRICS and logs it as one JSON line
+
+    The rows can be set once known, e.g.
+        with stage("read_data") as m:
+            m["rows"] = len(df)
+    """
+    m = {"rows": rows}
+    rss0 = get_rss()
+    t0 = time.perf_counter()
+    try:
+        yield m
+    finally:
+        seconds = time.perf_counter() - t0
+        rss_delta = get_rss() - rss0
+        METRICS.record(name, seconds, rows=m["rows"], rss_delta=rss_delta)
+        (log or logging.getLogger(APP_NAME)).info(
+            json.dumps(
+                {
+                    "stage": name,
+                    "seconds": round(seconds, 4),
+                    "rows": m["rows"],
+                    "rss_delta_mb": round(rss_delta / 1024**2, 2),
+                }
+            )
+        )
+
+
+def timer(func: Optional[Callable] = None, *, name: str = "") -> Callable:
+    """Decorator recording every call of func as a stage, @timer or
+    @timer(name="...")"""
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name or func.__qualname__):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
 if __name__ == "__main__":
     log = setup_logger(APP_NAME)
     pass
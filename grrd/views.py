@@ -2,199 +2,57 @@
 # Responsible for generating different analysis views
 
 # global libraries
-from typing import Mapping
-from dataclasses import dataclass, field
+import base64
+import json
+import logging
+from typing import Mapping, Optional
 
 import numpy as np
 import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
-from dash import Dash, dcc, html, Input, Output, dash_table
+from dash import Dash, ctx, dcc, html, no_update, Input, Output, State, dash_table
+from dash.exceptions import PreventUpdate
+from plotly.io.json import to_json_plotly
 
 # local libraries
 import utils
 import models
+from cache import RenderCache
+from models import GaiaData, GaiaDataMaker  # noqa: F401, moved to models
 from config import Config
+from sessions import SessionRegistry
 
 APP_NAME = "grrd"
 PART = "SerialNumber"  # CRITICAL to be fixed! make this a variable instead..
-log = utils.setup_logger(APP_NAME)
-
-
-@dataclass
-class GaiaData:
-    fom: str
-    operator: str
-    df: pd.DataFrame
-    df_condensed: pd.DataFrame = field(default_factory=lambda: pd.DataFrame())
-    grr_passed: bool = False  # True: pass, False: fail or error
-    grr_limits: float = float("inf")
-
-    def __str__(self) -> str:
-        parts_failed = len(self.df) - self.df["grr_part_passed"].sum()
-        return f"{self.__class__.__name__}(fom={self.fom}, passed={self.grr_passed}, operator={self.operator}, {parts_failed=}, df.shape={self.df.shape})"
-
-
-class GaiaDataMaker:
-    def __init__(
-        self,
-        cfg: Mapping,
-        dataparam_list: list[models.ParamData],
-        dflimits: pd.DataFrame,
-    ) -> None:
-        self.log = utils.setup_logger(APP_NAME)
-        VARS = cfg["input_settings"]["variable_names"]
-        self.OPERATOR = VARS["OPERATOR"]
-        self.PART = VARS["PART"]
-        self.USL = "usl"
-        self.LSL = "lsl"
-        self.UNITS = "units"
-        self.REP = "rep"
-        self.VALUE = "value"
-        self.dflimits = dflimits
-        self.is_pseudo_golden = True
-        self.gaiadata_store = []
-        n = len(dataparam_list)
-        for i, dataparam in enumerate(dataparam_list, 1):
-            self.log.debug(f"  [{i}/{n}] breaking down into operators")
-            self.breakdown_to_sockets(dataparam)
-        n = len(self.gaiadata_store)
-        for i, data in enumerate(self.gaiadata_store, 1):
-            self.log.debug(f"  [{i}/{n}] computing grr_status")
-            self.compute_grr_status(data)
-
-        # Special df that contains nested dataframes
-        df = pd.DataFrame(self.gaiadata_store)
-        self.df_summary = df[["fom", "operator", "grr_passed", "grr_limits"]]
-        self.dfs = self.compile_dfs(self.gaiadata_store)
-
-    def __str__(self):
-        number_of_datatables = len(self.gaiadata_store)
-        return f"{self.__class__.__name__}(datastore: n={number_of_datatables})"
-
-    def transform_data(
-        self, dfin: pd.DataFrame, operator: str, is_golden: bool = False
-    ) -> pd.DataFrame:
-        if not operator and is_golden:
-            # Pseudo-golden mode. Take average of everything
-            df = dfin
-        else:
-            df = dfin[dfin[self.OPERATOR] == operator]
-
-        # outname = f"output-{self.data.name}-{self.OPERATOR}.csv"
-        # df.to_csv(outname)
-        dfp = pd.pivot_table(
-            data=df,
-            index=self.PART,
-            values=self.VALUE,
-            aggfunc=["mean", "count", "min", "max"],
-        ).reset_index()
-        dfp.columns = dfp.columns.map("_".join).str.strip("_")
-        if is_golden:
-            dfp.set_index(self.PART, inplace=True)
-            dfp.columns = dfp.columns.map(lambda x: f"golden_{x}")
-            dfp.reset_index(inplace=True)
-        # return PlotData(operator=operator, df=dfp)
-        return dfp
-
-    def breakdown_to_sockets(self, paramdata: models.ParamData) -> None:
-        operators = paramdata.dfdata[self.OPERATOR].unique()
-        is_golden_socket = [
-            True if ("_gold" in op.lower()) else False for op in operators
-        ]
-        match golden_operator_count := sum(is_golden_socket):
-            case 0:
-                self.is_pseudo_golden = True
-                self.golden_operator = ""
-            case 1:
-                self.is_pseudo_golden = False
-                self.golden_operator = operators[is_golden_socket.index(True)]
-            case _:
-                raise RuntimeError(
-                    f"more than 1 golden operator, found ({golden_operator_count=})"
-                )
-
-        if self.is_pseudo_golden:
-            dfgolden = self.transform_data(
-                paramdata.dfdata, self.golden_operator, is_golden=False
-            )
-        else:
-            dfgolden = self.transform_data(
-                paramdata.dfdata, self.golden_operator, is_golden=True
-            )
-
-        for operator in operators:
-            dftarget = self.transform_data(paramdata.dfdata, operator, is_golden=False)
-            df = pd.merge(left=dfgolden, right=dftarget, on=self.PART, how="outer")
-            df = self.compute_grr_pct(df, limits=paramdata.limits, fom=paramdata.name)
-            self.gaiadata_store.append(
-                GaiaData(
-                    fom=paramdata.name,
-                    operator=operator,
-                    df=df,
-                    grr_limits=paramdata.limits["grr_limit"],
-                )
-            )
-
-    def compute_grr_pct(
-        self, dfin: pd.DataFrame, limits: pd.Series, fom: str
-    ) -> pd.DataFrame:
-        df = dfin
-        df["grr_limits"] = limits["grr_limit"]
-        df["grr_mean_offset"] = df["mean_value"] - df["golden_mean_value"]
-        df["grr_pos_offset"] = abs(df["max_value"] - df["golden_mean_value"])
-        df["grr_neg_offset"] = abs(df["min_value"] - df["golden_mean_value"])
-        df["grr_high_pct"] = df["grr_pos_offset"] / df["grr_limits"] * 100
-        df["grr_low_pct"] = df["grr_neg_offset"] / df["grr_limits"] * 100
-        return df
-
-    def compute_grr_status(self, gaiadata: GaiaData) -> GaiaData:
-        # computes grr status and updates GaiaData object in place
-        gaiadata.df["grr_part_passed"] = (gaiadata.df["grr_high_pct"] < 100) & (
-            gaiadata.df["grr_low_pct"] < 100
-        )
-        df = gaiadata.df[
-            [
-                "SerialNumber",
-                "mean_value",
-                "golden_mean_value",
-                "grr_mean_offset",
-                "grr_limits",
-                "grr_pos_offset",
-                "grr_neg_offset",
-                "grr_high_pct",
-                "grr_low_pct",
-                "grr_part_passed",
-            ]
-        ]
-
-        gaiadata.df_condensed = df
-        gaiadata.grr_passed = df["grr_part_passed"].all()
-
-        return gaiadata
-
-    def compile_dfs(self, datalist: list[GaiaData]) -> pd.DataFrame:
-        # compile a huge dataframe to send to plotly
-        dflist = []
-        for data in datalist:
-            df = data.df_condensed
-            df["fom"] = data.fom
-            df["operator"] = data.operator
-            dflist.append(df)
-        return pd.concat(dflist)
-
-    def pretty_print(self, dfin: pd.DataFrame, name: str) -> None:
-        df = dfin[
-            [
-                self.PART,
-                "mean_value",
-                "golden_mean_value",
-                "grr_mean_offset",
-                "grr_high_pct",
-                "grr_low_pct",
-            ]
-        ]
-        print(f"{name=}\n{df}")
+TABLE_COLUMNS = [
+    PART,
+    "grr_part_passed",
+    "mean_value",
+    "grr_mean_offset",
+    "grr_high_pct",
+    "grr_low_pct",
+    "grr_pos_offset",
+    "grr_neg_offset",
+]
+# DataTable filter_query syntax, longest symbols first
+FILTER_OPERATORS = {
+    ">=": "ge",
+    "<=": "le",
+    "!=": "ne",
+    "<": "lt",
+    ">": "gt",
+    "=": "eq",
+    "ge ": "ge",
+    "le ": "le",
+    "lt ": "lt",
+    "gt ": "gt",
+    "ne ": "ne",
+    "eq ": "eq",
+    "contains ": "contains",
+    "datestartswith ": "datestartswith",
+}
+# handlers are set up by utils.setup_logger() at startup, not at import
+log = logging.getLogger(APP_NAME)
 
 
 def plot_overlay(
@@ -266,8 +124,251 @@ def plot_overlay(
     return xmin, xmax
 
 
-def run_plotly(df: pd.DataFrame, port: str = "8501") -> None:
+def render_anova(anova: Optional[pd.Series]) -> str:
+    """Markdown of the ANOVA Gage R&R of a FOM, see engine.compute_anova()"""
+    if anova is None:
+        return ""
+    anova_status = "PASS" if anova["anova_passed"] else "FAIL"
+    return f"""
+    ### ANOVA Gage R&R (all operators)
+    - anova_status = {anova_status}
+    - %GRR = {anova["grr_pct"]:.2f}%, ndc = {anova["ndc"]:.0f}
+    - %EV = {anova["ev_pct"]:.2f}%, %AV = {anova["av_pct"]:.2f}%
+    - %PV = {anova["pv_pct"]:.2f}%
+    """
+
+
+def get_anova(df_anova: Optional[pd.DataFrame], fom: str) -> Optional[pd.Series]:
+    if df_anova is None:
+        return None
+    rows = df_anova[df_anova["fom"] == fom]
+    return rows.iloc[0] if len(rows) else None
+
+
+def render_results(
+    dfmasked: pd.DataFrame, anova: Optional[pd.Series] = None
+) -> html.Div:
+    """Results markdown of one (fom, operator) slice, the rows of its
+    DataTable are served page by page (see render_table_page)"""
+    grr_status = "error"
+
+    grr_limits = "error"
+    try:
+        grr_limits = dfmasked.loc[dfmasked.index[0], "grr_limits"]
+        grr_limits = f"{grr_limits:.4g}"
+    except Exception as e:
+        log.error(e)
+
+    grr_score = "error"
+    try:
+        grr_score = max(dfmasked["grr_low_pct"].max(), dfmasked["grr_high_pct"].max())
+        if grr_score <= 100:
+            grr_status = "PASS"
+        else:
+            grr_status = "FAIL"
+        grr_score = f"{grr_score:.2f}%"
+    except Exception as e:
+        log.error(e)
+
+    foms = ";".join(dfmasked["fom"].unique())
+    operators = ";".join(dfmasked["operator"].unique())
+    markdown_text = f"""
+    ### GRR Results
+    - fom = {foms}
+    - operator = {operators}
+    - grr_status = {grr_status}
+    - grr_limits = {grr_limits}
+    - grr_score = {grr_score}
+    """ + render_anova(anova)
+
+    return html.Div(
+        [dcc.Markdown(markdown_text)],
+        style={
+            "margin": "10px",
+        },
+    )
+
+
+def split_filter_part(filter_part: str) -> tuple[str, str, object]:
+    """Parses one clause of a DataTable filter_query, e.g. {col} > 50
+
+    :return: (column, operator, value), operator is "" if not parsed
+    :rtype: tuple[str, str, object]
+    """
+    for operator in FILTER_OPERATORS:
+        if operator not in filter_part:
+            continue
+        name, value = filter_part.split(operator, 1)
+        name = name[name.find("{") + 1 : name.rfind("}")]
+        value = value.strip()
+        operator = FILTER_OPERATORS[operator]
+        if len(value) > 1 and value[0] == value[-1] and value[0] in "'\"`":
+            return name, operator, value[1:-1]
+        if operator in ("contains", "datestartswith"):
+            return name, operator, value
+        try:
+            return name, operator, float(value)
+        except ValueError:
+            return name, operator, value
+    return "", "", None
+
+
+def filter_table(df: pd.DataFrame, filter_query: str) -> pd.DataFrame:
+    """Applies a DataTable filter_query (custom filter_action)"""
+    for filter_part in (filter_query or "").split(" && "):
+        col, operator, value = split_filter_part(filter_part)
+        if col not in df.columns:
+            continue
+        if pd.api.types.is_bool_dtype(df[col]) and isinstance(value, str):
+            value = value.lower() == "true"
+        if operator in ("lt", "le", "gt", "ge") and not (
+            pd.api.types.is_numeric_dtype(df[col]) and isinstance(value, float)
+        ):
+            # e.g. {SerialNumber} > 5, text and categories are not ordered
+            continue
+        match operator:
+            case "eq":
+                df = df[df[col] == value]
+            case "ne":
+                df = df[df[col] != value]
+            case "lt":
+                df = df[df[col] < value]
+            case "le":
+                df = df[df[col] <= value]
+            case "gt":
+                df = df[df[col] > value]
+            case "ge":
+                df = df[df[col] >= value]
+            case "contains" | "datestartswith":
+                df = df[df[col].astype(str).str.contains(str(value), regex=False)]
+    return df
+
+
+def render_table_page(
+    dfmasked: pd.DataFrame,
+    page_current: int,
+    page_size: int,
+    sort_by: Optional[list[dict]] = None,
+    filter_query: str = "",
+) -> tuple[list[dict], int]:
+    """One page of the DataTable of a (fom, operator) slice, after filtering
+    and sorting (custom page/sort/filter_action)
+
+    :return: (records of the page, page_count)
+    :rtype: tuple[list[dict], int]
+    """
+    df = dfmasked[TABLE_COLUMNS].dropna()
+    df = filter_table(df, filter_query)
+    if sort_by:
+        df = df.sort_values(
+            by=[col["column_id"] for col in sort_by],
+            ascending=[col["direction"] == "asc" for col in sort_by],
+            kind="stable",
+        )
+    page_count = max(1, -(-len(df) // page_size))
+    start = page_current * page_size
+    page = df.iloc[start : start + page_size]
+    # float32 (grr_settings.compact_dtypes) as its shortest repr, not float64 digits
+    float32_columns = [c for c in page.columns if page[c].dtype == "float32"]
+    if float32_columns:
+        page = page.astype({c: str for c in float32_columns}).astype(
+            {c: "float64" for c in float32_columns}
+        )
+    return page.to_dict("records"), page_count
+
+
+def render_scatterplot(dfmasked: pd.DataFrame, webgl_min_parts: int = 0) -> go.Figure:
+    """Golden vs operator scatterplot of one (fom, operator) slice
+
+    :param webgl_min_parts: from this number of parts, all parts are drawn
+        as a single Scattergl trace instead of one trace per part, 0 to disable
+    :type webgl_min_parts: int
+    """
+    fig = go.Figure()
+
+    # Add traces
+    parts = dfmasked[PART].unique()
+    if webgl_min_parts > 0 and len(parts) >= webgl_min_parts:
+        fig.add_trace(
+            go.Scattergl(
+                x=dfmasked["golden_mean_value"],
+                y=dfmasked["mean_value"],
+                mode="markers",
+                name=f"{len(parts)} parts",
+                text=dfmasked[PART],
+                hovertemplate="%{text}<br>golden=%{x}<br>mean=%{y}<extra></extra>",
+                error_y=dict(
+                    type="data",
+                    symmetric=False,
+                    array=dfmasked["grr_pos_offset"],
+                    arrayminus=dfmasked["grr_neg_offset"],
+                ),
+            )
+        )
+    else:
+        for part in parts:
+            df_ = dfmasked[dfmasked[PART] == part]
+            fig.add_trace(
+                go.Scatter(
+                    x=df_["golden_mean_value"],
+                    y=df_["mean_value"],
+                    mode="markers",
+                    name=f"{part}",
+                    error_y=dict(
+                        type="data",
+                        symmetric=False,
+                        array=df_["grr_pos_offset"],
+                        arrayminus=df_["grr_neg_offset"],
+                    ),
+                )
+            )
+    xmin, xmax = plot_overlay(fig, dfmasked)
+
+    fig.update_xaxes(range=[xmin, xmax])
+    fig.update_yaxes(range=[xmin, xmax])
+    fig.update_layout(width=800, height=500)
+
+    # dfmasked.to_csv(f"output-{utils.get_time()}.csv")
+    return fig
+
+
+def decode_upload(contents: str) -> bytes:
+    """Content of a dcc.Upload file, sent as a base64 data URL"""
+    return base64.b64decode(contents.split(",", 1)[1])
+
+
+def make_render_cache(cfg: Optional[Mapping] = None) -> RenderCache:
+    cfg_cache = (cfg or {}).get("dashboard", {}).get("render_cache", {})
+    return RenderCache(
+        max_entries=cfg_cache.get("max_entries", 256),
+        max_size_mb=cfg_cache.get("max_size_mb", 64),
+    )
+
+
+def create_app(
+    df: pd.DataFrame | models.Dataset,
+    refresh_interval_s: float = 0,
+    cfg: Optional[Mapping] = None,
+    sessions: Optional[SessionRegistry] = None,
+    dataset_id: str = "",
+) -> Dash:
+    """Builds the dashboard, app.server is the WSGI app (see wsgi.py)
+
+    :param sessions: datasets uploaded from the dashboard, selected in a
+        dropdown, dataset_id being the initial selection (see sessions.py)
+    """
     # app = Dash(APP_NAME)
+    # refresh_interval_s > 0: polls dataset for swapped results (watcher.py)
+    if isinstance(df, models.Dataset):
+        dataset = df
+    else:
+        dataset = models.Dataset(df, pd.DataFrame())
+    index = dataset.snapshot.index
+    render_cache = make_render_cache(cfg)
+    cfg_dashboard = (cfg or {}).get("dashboard", {})
+    webgl_min_parts = int(cfg_dashboard.get("webgl_min_parts", 0))
+    page_size = int(cfg_dashboard.get("page_size", 50))
+    max_upload_mb = float(cfg_dashboard.get("sessions", {}).get("max_upload_mb", 256))
     external_stylesheets = ["https://codepen.io/chriddyp/pen/bWLwgP.css"]
     app = Dash(
         APP_NAME,
@@ -275,127 +376,295 @@ def run_plotly(df: pd.DataFrame, port: str = "8501") -> None:
         routes_pathname_prefix="/grrd/",
         requests_pathname_prefix="/grrd/",
     )
-    operators = list(df["operator"].unique())
-    foms = list(df["fom"].unique())
+
+    def get_snapshot(dataset_id: Optional[str]) -> models.DatasetSnapshot:
+        if sessions is None or not dataset_id:
+            return dataset.snapshot
+        try:
+            return sessions.get(dataset_id).snapshot
+        except KeyError:
+            # e.g. deleted from disk by SessionRegistry.prune()
+            log.warning(f"unknown {dataset_id=}")
+            raise PreventUpdate
+
+    def make_dataset_selector() -> html.Div:
+        if sessions is None:
+            return html.Div(
+                dcc.Dropdown(id="dataset-dropdown", value=dataset_id),
+                style={"display": "none"},
+            )
+        return html.Div(
+            [
+                html.P("Dataset"),
+                # options are listed on page load, see upload_dataset
+                dcc.Dropdown(id="dataset-dropdown", value=dataset_id, clearable=False),
+                dcc.Upload(
+                    id="dataset-upload",
+                    children=html.Div("Drop or select datalogs and a grrConfig"),
+                    multiple=True,
+                    max_size=int(max_upload_mb * 1024**2),
+                    style={
+                        "borderWidth": "1px",
+                        "borderStyle": "dashed",
+                        "borderRadius": "5px",
+                        "textAlign": "center",
+                        "padding": "10px",
+                        "margin": "10px 0",
+                    },
+                ),
+                html.Div(id="upload-status"),
+                dcc.Store(id="upload-pending"),
+                dcc.Interval(id="upload-interval", interval=1000, disabled=True),
+            ]
+        )
+
+    operators = index.operators
+    foms = index.foms
     app.layout = html.Div(
         [
             html.H4("GR&R Dashboard App"),
+            make_dataset_selector(),
             dcc.Graph(id="scatter-plot"),
             html.P("Filter by FOM"),
-            dcc.Dropdown(id="foms-dropdown", options=foms, value=foms[0]),
+            dcc.Dropdown(
+                id="foms-dropdown", options=foms, value=foms[0] if foms else None
+            ),
             html.P("Filter by operator"),
-            dcc.Dropdown(id="operator-dropdown", options=operators, value=operators[0]),
+            dcc.Dropdown(
+                id="operator-dropdown",
+                options=operators,
+                value=operators[0] if operators else None,
+            ),
             html.P("Datatable:"),
             html.Div(id="datatable"),
+            dcc.RadioItems(
+                id="table-view",
+                options={"parts": "By part", "failing": "Failing parts first"},
+                value="parts",
+                inline=True,
+            ),
+            dash_table.DataTable(
+                id="results-table",
+                columns=[{"name": i, "id": i} for i in TABLE_COLUMNS],
+                page_current=0,
+                page_size=page_size,
+                page_action="custom",
+                sort_action="custom",
+                sort_mode="multi",
+                sort_by=[],
+                filter_action="custom",
+                filter_query="",
+            ),
+            dcc.Store(id="dataset-version", data=dataset.version),
+            dcc.Interval(
+                id="refresh-interval",
+                interval=max(refresh_interval_s, 1) * 1000,
+                disabled=refresh_interval_s <= 0,
+            ),
         ]
     )
 
+    def invalidate(version: int, dataset_id: Optional[str]) -> None:
+        # with sessions, only the entries of the selected dataset, e.g. the
+        # targetdir dataset swapped by the watcher
+        render_cache.invalidate(version, dataset_id if sessions is not None else None)
+
+    def render_cached(
+        name: str, dataset_id: Optional[str], fom: str, operator: str, render
+    ) -> object:
+        if fom is None or operator is None:
+            # e.g. a watched targetdir without rows yet
+            raise PreventUpdate
+        # figures and tables are shared by all users until the dataset changes
+        snapshot = get_snapshot(dataset_id)
+        invalidate(snapshot.version, dataset_id)
+        key = (snapshot.version, dataset_id, name, fom, operator)
+        payload = render_cache.get(key)
+        if payload is None:
+            # serialized once: its length sizes the entry, and the decoded
+            # JSON is cheaper for Dash to encode again than live components
+            serialized = to_json_plotly(render(snapshot.index.get(fom, operator)))
+            payload = json.loads(serialized)
+            render_cache.put(key, payload, nbytes=len(serialized))
+        return payload
+
+    @app.server.route("/grrd/cache-stats")
+    def cache_stats():
+        return render_cache.stats
+
+    @app.server.route("/grrd/metrics")
+    def metrics():
+        # per process, i.e. per worker when served by gunicorn
+        index = dataset.snapshot.index
+        return {
+            **utils.METRICS.snapshot(),
+            "dataset_version": dataset.version,
+            "render_cache": render_cache.stats,
+            **({"lazy_index": index.stats} if hasattr(index, "stats") else {}),
+            **({"sessions": sessions.stats} if sessions is not None else {}),
+        }
+
+    @app.callback(
+        Output("dataset-version", "data"),
+        Output("foms-dropdown", "options"),
+        Output("foms-dropdown", "value"),
+        Output("operator-dropdown", "options"),
+        Output("operator-dropdown", "value"),
+        Input("refresh-interval", "n_intervals"),
+        Input("dataset-dropdown", "value"),
+        State("dataset-version", "data"),
+        State("foms-dropdown", "value"),
+        State("operator-dropdown", "value"),
+        prevent_initial_call=True,
+    )
+    def refresh_dataset(_, dataset_id, version, fom, operator):
+        # the dropdowns are scoped to the selected dataset, the selection is
+        # kept where the dataset has it
+        snapshot = get_snapshot(dataset_id)
+        if snapshot.version == version and ctx.triggered_id != "dataset-dropdown":
+            raise PreventUpdate
+        invalidate(snapshot.version, dataset_id)
+        foms, operators = snapshot.index.foms, snapshot.index.operators
+        if fom not in foms:
+            fom = foms[0] if foms else None
+        if operator not in operators:
+            operator = operators[0] if operators else None
+        return snapshot.version, foms, fom, operators, operator
+
+    if sessions is not None:
+        # uploads are sent base64 encoded, a third larger than the files
+        app.server.config["MAX_CONTENT_LENGTH"] = int(max_upload_mb * 1024**2 * 4 / 3)
+
+        @app.callback(
+            Output("dataset-dropdown", "options"),
+            Output("upload-pending", "data"),
+            Input("dataset-upload", "contents"),
+            State("dataset-upload", "filename"),
+        )
+        @utils.timer(name="callback.upload_dataset")
+        def upload_dataset(contents, filenames):
+            if not contents:
+                # page load, the datasets uploaded so far by anyone
+                return sessions.options(), no_update
+            try:
+                files = {fn: decode_upload(c) for fn, c in zip(filenames, contents)}
+                new_dataset_id = sessions.add(files)
+            except Exception as e:
+                log.error(f"upload of {filenames} failed, {e!r}")
+                return no_update, {"error": str(e)}
+            # parsed in the background, see upload_progress
+            return sessions.options(), {"dataset_id": new_dataset_id}
+
+        @app.callback(
+            Output("dataset-dropdown", "value"),
+            Output("upload-status", "children"),
+            Output("upload-interval", "disabled"),
+            Input("upload-pending", "data"),
+            Input("upload-interval", "n_intervals"),
+            prevent_initial_call=True,
+        )
+        def upload_progress(pending, _):
+            if not pending:
+                raise PreventUpdate
+            if "error" in pending:
+                return no_update, f"Upload failed: {pending['error']}", True
+            upload = sessions.progress(pending["dataset_id"])
+            if upload is None:
+                return pending["dataset_id"], no_update, True
+            if not upload.done:
+                message = f"{upload.name}: {upload.stage} ({upload.elapsed_s:.0f}s)"
+                return no_update, message, False
+            if upload.error:
+                return no_update, f"Upload failed: {upload.error}", True
+            message = f"{upload.name} loaded in {upload.elapsed_s:.1f}s"
+            return pending["dataset_id"], message, True
+
     @app.callback(
         Output("datatable", "children"),
         Input("operator-dropdown", "value"),
         Input("foms-dropdown", "value"),
+        Input("dataset-version", "data"),
+        State("dataset-dropdown", "value"),
     )
-    def update_datatable(operator, fom):
-
-        dfmasked = df[(df["operator"] == operator) & (df["fom"] == fom)]
-        dftable = dfmasked[
-            [
-                PART,
-                "grr_part_passed",
-                "mean_value",
-                "grr_mean_offset",
-                "grr_high_pct",
-                "grr_low_pct",
-                "grr_pos_offset",
-                "grr_neg_offset",
-            ]
-        ].dropna()
-
-        grr_status = "error"
-
-        grr_limits = "error"
-        try:
-            grr_limits = dfmasked.loc[dfmasked.index[0], "grr_limits"]
-            grr_limits = f"{grr_limits:.4g}"
-        except Exception as e:
-            log.error(e)
+    @utils.timer(name="callback.update_datatable")
+    def update_datatable(operator, fom, _, dataset_id):
+        anova = get_anova(get_snapshot(dataset_id).df_anova, fom)
+        return render_cached(
+            "results", dataset_id, fom, operator, lambda df: render_results(df, anova)
+        )
 
-        grr_score = "error"
-        try:
-            grr_score = max(
-                dfmasked["grr_low_pct"].max(), dfmasked["grr_high_pct"].max()
-            )
-            if grr_score <= 100:
-                grr_status = "PASS"
-            else:
-                grr_status = "FAIL"
-            grr_score = f"{grr_score:.2f}%"
-        except Exception as e:
-            log.error(e)
-
-        foms = ";".join(dfmasked["fom"].unique())
-        operators = ";".join(dfmasked["operator"].unique())
-        markdown_text = f"""
-        ### GRR Results
-        - fom = {foms}
-        - operator = {operators}
-        - grr_status = {grr_status}
-        - grr_limits = {grr_limits}
-        - grr_score = {grr_score}
-        """
+    @app.callback(
+        Output("results-table", "page_current"),
+        Input("operator-dropdown", "value"),
+        Input("foms-dropdown", "value"),
+        Input("table-view", "value"),
+        Input("results-table", "filter_query"),
+    )
+    def reset_table_page(*_):
+        return 0
 
-        return html.Div(
-            [
-                html.Div(
-                    [dcc.Markdown(markdown_text)],
-                    style={
-                        "margin": "10px",
-                    },
-                ),
-                dash_table.DataTable(
-                    dftable.to_dict("records"),
-                    [{"name": i, "id": i} for i in dftable.columns],
-                ),
-            ]
+    @app.callback(
+        Output("results-table", "data"),
+        Output("results-table", "page_count"),
+        Input("operator-dropdown", "value"),
+        Input("foms-dropdown", "value"),
+        Input("dataset-version", "data"),
+        Input("table-view", "value"),
+        Input("results-table", "page_current"),
+        Input("results-table", "page_size"),
+        Input("results-table", "sort_by"),
+        Input("results-table", "filter_query"),
+        State("dataset-dropdown", "value"),
+    )
+    @utils.timer(name="callback.update_table_page")
+    def update_table_page(
+        operator,
+        fom,
+        _,
+        view,
+        page_current,
+        page_size,
+        sort_by,
+        filter_query,
+        dataset_id,
+    ):
+        if fom is None or operator is None:
+            raise PreventUpdate
+        dfmasked = get_snapshot(dataset_id).index.get(
+            fom, operator, failing_first=view == "failing"
+        )
+        return render_table_page(
+            dfmasked, page_current or 0, page_size, sort_by, filter_query
         )
 
     @app.callback(
         Output("scatter-plot", "figure"),
         Input("operator-dropdown", "value"),
         Input("foms-dropdown", "value"),
+        Input("dataset-version", "data"),
+        State("dataset-dropdown", "value"),
     )
-    def update_scatterplot(operator, fom):
-
-        dfmasked = df[(df["operator"] == operator) & (df["fom"] == fom)]
-        fig = go.Figure()
-
-        # Add traces
-        parts = dfmasked[PART].unique()
-        for part in parts:
-            df_ = dfmasked[dfmasked[PART] == part]
-            fig.add_trace(
-                go.Scatter(
-                    x=df_["golden_mean_value"],
-                    y=df_["mean_value"],
-                    mode="markers",
-                    name=f"{part}",
-                    error_y=dict(
-                        type="data",
-                        symmetric=False,
-                        array=df_["grr_pos_offset"],
-                        arrayminus=df_["grr_neg_offset"],
-                    ),
-                )
-            )
-        xmin, xmax = plot_overlay(fig, dfmasked)
+    @utils.timer(name="callback.update_scatterplot")
+    def update_scatterplot(operator, fom, _, dataset_id):
+        return render_cached(
+            "scatterplot",
+            dataset_id,
+            fom,
+            operator,
+            lambda df: render_scatterplot(df, webgl_min_parts=webgl_min_parts),
+        )
 
-        fig.update_xaxes(range=[xmin, xmax])
-        fig.update_yaxes(range=[xmin, xmax])
-        fig.update_layout(width=800, height=500)
+    return app
 
-        # dfmasked.to_csv(f"output-{utils.get_time()}.csv")
-        return fig
 
+def run_plotly(
+    df: pd.DataFrame | models.Dataset,
+    port: str = "8501",
+    refresh_interval_s: float = 0,
+    cfg: Optional[Mapping] = None,
+) -> None:
+    """Serves the dashboard with the Flask development server"""
+    app = create_app(df, refresh_interval_s=refresh_interval_s, cfg=cfg)
     app.run(debug=True, host="0.0.0.0", port=port)
 
 
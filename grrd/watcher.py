@@ -0,0 +1,288 @@
+# watcher.py is part of CONTROLLER in the design framework
+# Watches targetdir and updates the GR&R results of a running dashboard
+
+# global libraries
+import os
+import hashlib
+import threading
+import importlib.util
+from pathlib import Path
+from typing import Mapping, Optional
+
+import pandas as pd
+
+# local libraries
+import utils
+import models
+from models import GaiaDataMaker
+from resultstore import ResultStore
+
+APP_NAME = "grrd"
+# bytes of a datalog already read, hashed to detect a replaced file
+DIGEST_BYTES = 64 * 1024
+
+
+def get_digest(filepath: Path, nbytes: int) -> str:
+    """IO: sha1 of the first nbytes of filepath"""
+    with open(filepath, mode="rb") as f:
+        return hashlib.sha1(f.read(nbytes)).hexdigest()
+
+
+class TargetDirWatcher:
+    """Incremental append mode
+
+    Polls directory for new or appended datalogs and parses only the new
+    rows. They are merged into the running aggregates of a StreamingParser,
+    only the affected FOM x operator pairs are recomputed, then the results
+    are swapped into the Dataset served by the dashboard.
+
+    The watcher runs in a single process. Processes forked from it (e.g.
+    gunicorn workers) do not poll: once forked, each update is also
+    written to store, and every child follows it with a ResultFollower.
+    A fork waits for the running poll, so no lock is held across it.
+    """
+
+    def __init__(
+        self, cfg: Mapping, directory: Path | str, store: Optional[ResultStore] = None
+    ) -> None:
+        self.log = utils.setup_logger(APP_NAME)
+        self.cfg = cfg
+        self.directory = Path(directory)
+        self.interval_s = float(cfg.get("watcher", {}).get("interval_s", 5))
+        self.parser = models.StreamingParser(cfg=cfg)
+        self.offsets: dict[Path, int] = {}
+        self.sizes: dict[Path, int] = {}
+        self.columns: dict[Path, list[str]] = {}
+        self.headers: dict[Path, pd.DataFrame] = {}
+        # (st_ino, nbytes, digest of the first nbytes) of every file read
+        self.stamps: dict[Path, tuple[int, int, str]] = {}
+        self.maker: Optional[GaiaDataMaker] = None
+        self.dataset: Optional[models.Dataset] = None
+        self.thread: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+        self.store = store
+        self.poll_lock = threading.RLock()
+        self.forked = False
+
+    def __str__(self) -> str:
+        return f"{self.__class__.__name__}(directory={self.directory}, files={len(self.offsets)})"
+
+    def reset(self) -> None:
+        """Drops all aggregates, every file is parsed again on the next poll"""
+        self.parser = models.StreamingParser(cfg=self.cfg)
+        self.offsets.clear()
+        self.sizes.clear()
+        self.columns.clear()
+        self.headers.clear()
+        self.stamps.clear()
+        self.maker = None
+
+    def is_replaced(self, fp: Path) -> bool:
+        """IO: fp was truncated, or replaced by another file of any size,
+        since it was read"""
+        if fp not in self.stamps:
+            return False
+        st = fp.stat()
+        ino, nbytes, digest = self.stamps[fp]
+        if st.st_size < self.sizes.get(fp, 0) or st.st_ino != ino:
+            return True
+        return get_digest(fp, nbytes) != digest
+
+    def poll(self) -> bool:
+        """IO: Parses the rows added since the last poll
+
+        :return: True if the results were updated
+        :rtype: bool
+        """
+        datalogs = models.list_datalogs(self.directory)
+        if any(self.is_replaced(fp) for fp in datalogs):
+            self.log.warning("a datalog was truncated or replaced, reloading all")
+            self.reset()
+
+        dflist_touched = []
+        rows = 0
+        for fp in datalogs:
+            size = fp.stat().st_size
+            offset = self.offsets.get(fp, 0)
+            # unchanged since the last poll, a trailing row without newline
+            # is complete (e.g. the last row of a file)
+            final = size == self.sizes.get(fp)
+            if final and offset >= size:
+                continue
+            dfdata, dfheaders, offset = models.read_datalog_tail(
+                fp,
+                self.cfg["input_settings"],
+                offset=offset,
+                columns=self.columns.get(fp),
+                final=final,
+            )
+            if dfheaders is not None:
+                self.headers[fp] = dfheaders
+                self.columns[fp] = list(dfheaders.columns)
+            self.offsets[fp] = offset
+            self.sizes[fp] = size
+            nbytes = min(offset, DIGEST_BYTES)
+            self.stamps[fp] = (fp.stat().st_ino, nbytes, get_digest(fp, nbytes))
+            if dfdata is not None and not dfdata.empty:
+                self.log.info(f"{fp.name}: {len(dfdata)} new rows")
+                dflist_touched.append(self.parser.update(dfdata, self.headers[fp]))
+                rows += len(dfdata)
+
+        if not dflist_touched:
+            return False
+        with utils.stage("watcher_update", rows=rows, log=self.log):
+            self.apply(dflist_touched)
+        return True
+
+    def apply(self, dflist_touched: list[pd.DataFrame]) -> None:
+        """Recomputes the touched pairs and swaps the results into dataset"""
+        self.parser.dfheaders = models.merge_headers(list(self.headers.values()))
+        datastore = self.parser.parse_data(pd.DataFrame(), self.parser.dfheaders)
+
+        if self.maker is None:
+            self.maker = GaiaDataMaker(
+                cfg=self.cfg,
+                dataparam_list=datastore,
+                dflimits=self.parser.cfg_grrlimits,
+            )
+        else:
+            pairs = self.maker.update(datastore, pd.concat(dflist_touched))
+            self.log.info(f"{len(pairs)} fom x operator pairs recomputed")
+        if self.dataset is None:
+            self.dataset = models.Dataset(
+                self.maker.dfs, self.maker.df_summary, df_anova=self.maker.df_anova
+            )
+        else:
+            version = self.dataset.swap(
+                self.maker.dfs, self.maker.df_summary, df_anova=self.maker.df_anova
+            )
+            self.log.info(f"dataset updated to {version=}")
+        if self.forked and self.store is not None:
+            # the same version in every forked process, see ResultFollower
+            self.store.write(
+                self.maker.dfs,
+                self.maker.df_summary,
+                df_anova=self.maker.df_anova,
+                version=self.dataset.version,
+            )
+
+    def run(self) -> None:
+        while not self.stop_event.wait(self.interval_s):
+            try:
+                with self.poll_lock:
+                    self.poll()
+            except Exception as e:
+                # keep serving the last good results
+                self.log.error(f"watcher poll failed, {e=}")
+
+    def start(self) -> None:
+        """Polls in a daemon thread, after a first blocking poll"""
+        if self.dataset is None:
+            self.poll()
+        if self.dataset is None:
+            # no rows yet, served empty until the first rows are parsed
+            self.log.warning(f"no datalog rows in {self.directory} yet")
+            self.dataset = models.Dataset(
+                pd.DataFrame(columns=["fom", "operator"]), pd.DataFrame()
+            )
+        self.thread = threading.Thread(
+            target=self.run, name="grrd-watcher", daemon=True
+        )
+        self.thread.start()
+        os.register_at_fork(
+            before=self.poll_lock.acquire,
+            after_in_parent=self.after_fork_in_parent,
+            after_in_child=self.after_fork_in_child,
+        )
+        self.log.info(f"watching {self.directory} every {self.interval_s}s")
+
+    def after_fork_in_parent(self) -> None:
+        self.poll_lock.release()
+        self.forked = True
+
+    def after_fork_in_child(self) -> None:
+        """The watcher thread is not forked, the child follows the store"""
+        self.poll_lock.release()
+        self.thread = None
+        if self.stop_event.is_set():
+            return
+        self.stop_event.set()
+        if self.store is None or self.dataset is None:
+            self.log.warning("no result store, this process is not refreshed")
+            return
+        ResultFollower(self.dataset, self.store, self.interval_s).start()
+
+    def stop(self) -> None:
+        self.stop_event.set()
+
+
+class ResultFollower:
+    """Swaps the results written to a ResultStore by a TargetDirWatcher of
+    another process into dataset, as memory-mapped tables shared by every
+    follower, with the version of the watcher"""
+
+    def __init__(
+        self, dataset: models.Dataset, store: ResultStore, interval_s: float = 5
+    ) -> None:
+        self.log = utils.setup_logger(APP_NAME)
+        self.dataset = dataset
+        self.store = store
+        self.interval_s = interval_s
+        self.stamp = self.get_stamp()
+        self.stop_event = threading.Event()
+
+    def __str__(self) -> str:
+        return f"{self.__class__.__name__}(store={self.store}, version={self.dataset.version})"
+
+    def get_stamp(self) -> Optional[tuple[int, int]]:
+        try:
+            st = self.store.get_paths()["dfs"].stat()
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns)
+
+    def poll(self) -> bool:
+        """IO: Reads the results if they were written since the last poll
+
+        :return: True if the results were updated
+        :rtype: bool
+        """
+        stamp = self.get_stamp()
+        if stamp is None or stamp == self.stamp:
+            return False
+        self.stamp = stamp
+        version = self.store.read_version()
+        if version is not None and version <= self.dataset.version:
+            return False
+        dfs, df_summary = self.store.read()
+        self.dataset.swap(
+            dfs, df_summary, df_anova=self.store.read_anova(), version=version
+        )
+        self.log.info(f"dataset followed to {version=}")
+        return True
+
+    def run(self) -> None:
+        while not self.stop_event.wait(self.interval_s):
+            try:
+                self.poll()
+            except Exception as e:
+                self.log.error(f"result follower poll failed, {e=}")
+
+    def start(self) -> None:
+        threading.Thread(target=self.run, name="grrd-follower", daemon=True).start()
+
+    def stop(self) -> None:
+        self.stop_event.set()
+
+
+def make_store(cfg: Mapping) -> Optional[ResultStore]:
+    """ResultStore of the results published to forked processes, None
+    without pyarrow"""
+    if importlib.util.find_spec("pyarrow") is None:
+        utils.setup_logger(APP_NAME).warning(
+            "watcher requires pyarrow to refresh forked workers"
+        )
+        return None
+    store = ResultStore(cfg)
+    store.name = f"{store.name}-watcher"
+    return store
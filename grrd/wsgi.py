@@ -0,0 +1,16 @@
+# wsgi.py is part of CONTROLLER in the design framework
+# WSGI entry point for production servers, e.g. from the grrd directory
+#   gunicorn --preload --workers 4 --bind 0.0.0.0:8501 wsgi:server
+#   waitress-serve --threads 8 --port 8501 wsgi:server
+# The results are loaded once at import, with --preload before the workers
+# fork, so they are shared copy-on-write. The watcher runs in the process
+# that imports this module, the workers forked from it follow its results.
+# With a lazy precompute, prefer `python main.py` with server.mode =
+# "gunicorn", which starts it in every worker.
+
+# local libraries
+import main
+
+cfg, app, background = main.build_app()
+main.start_background(background)
+server = app.server
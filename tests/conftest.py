@@ -0,0 +1,42 @@
+# conftest.py is part of the tests
+# The modules of grrd/ and benchmarks/ are imported flat, as by main.py
+
+# global libraries
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "grrd"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+# local libraries
+import generate  # noqa: E402
+import models  # noqa: E402
+from run import make_cfg  # noqa: E402
+
+
+@pytest.fixture
+def lot(tmp_path: Path) -> tuple[Path, Path]:
+    """(datalog, grrConfig) of a small synthetic lot"""
+    datalog = generate.generate_datalog(
+        tmp_path / "datalog.csv", parts=15, operators=3, reps=3, foms=4, seed=3
+    )
+    grrconfig = generate.generate_grrconfig(tmp_path / "grrConfig.csv", foms=4, seed=3)
+    return datalog, grrconfig
+
+
+@pytest.fixture
+def cfg(lot: tuple[Path, Path]) -> dict:
+    """Config of lot, long datastore and batched engine"""
+    return make_cfg(lot[1], datastore="long", grr_engine="batched")
+
+
+@pytest.fixture
+def grr(cfg: dict, lot: tuple[Path, Path]) -> models.GaiaDataMaker:
+    """GR&R results of lot"""
+    data = models.make_parser(cfg=cfg, filepaths=[lot[0]])
+    return models.GaiaDataMaker(
+        cfg=cfg, dataparam_list=data.datastore, dflimits=data.cfg_grrlimits
+    )
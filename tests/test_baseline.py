@@ -0,0 +1,74 @@
+# test_baseline.py is part of the tests
+
+# global libraries
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+# local libraries
+import utils
+import baseline
+import generate
+import models
+
+KEYS = ["fom", "operator", "SerialNumber"]
+
+
+@pytest.fixture
+def baseline_cfg(cfg: dict, tmp_path: Path) -> dict:
+    cfg["grr_settings"]["baseline"]["directory"] = str(tmp_path / "baselines")
+    return cfg
+
+
+def compute(cfg: dict, datalog: Path, mode: str) -> models.GaiaDataMaker:
+    cfg["grr_settings"]["baseline"]["mode"] = mode
+    data = models.make_parser(cfg=cfg, filepaths=[datalog])
+    return models.GaiaDataMaker(
+        cfg=cfg, dataparam_list=data.datastore, dflimits=data.cfg_grrlimits
+    )
+
+
+def normalize(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.astype({c: str for c in KEYS})
+    return df.sort_values(KEYS).reset_index(drop=True)
+
+
+def test_use_matches_save(baseline_cfg, lot):
+    datalog, _ = lot
+    saved = compute(baseline_cfg, datalog, "save")
+    assert saved.baseline.exists()
+    used = compute(baseline_cfg, datalog, "use")
+    pd.testing.assert_frame_equal(normalize(used.dfs), normalize(saved.dfs))
+
+
+def test_use_without_golden_operator(baseline_cfg, lot, tmp_path):
+    datalog, _ = lot
+    saved = compute(baseline_cfg, datalog, "save")
+    # a new lot, the golden operator is not measured again
+    lines = datalog.read_text(encoding="utf-8").splitlines(keepends=True)
+    new_datalog = tmp_path / "new.csv"
+    new_datalog.write_text(
+        "".join(line for line in lines if generate.GOLDEN_OPERATOR not in line),
+        encoding="utf-8",
+    )
+    used = compute(baseline_cfg, new_datalog, "use")
+
+    expected = saved.dfs[saved.dfs["operator"] != generate.GOLDEN_OPERATOR]
+    pd.testing.assert_frame_equal(
+        normalize(used.dfs[list(expected.columns)]),
+        normalize(expected),
+        check_dtype=False,
+        check_categorical=False,
+    )
+
+
+def test_use_without_baseline(baseline_cfg, lot):
+    with pytest.raises(RuntimeError, match="missing golden baseline"):
+        compute(baseline_cfg, lot[0], "use")
+
+
+def test_invalid_mode(baseline_cfg):
+    baseline_cfg["grr_settings"]["baseline"]["mode"] = "load"
+    with pytest.raises(utils.ConfigError):
+        baseline.GoldenBaseline(baseline_cfg)
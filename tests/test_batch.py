@@ -0,0 +1,52 @@
+# test_batch.py is part of the tests
+
+# global libraries
+import sys
+from pathlib import Path
+
+import pytest
+
+# local libraries
+import batch
+
+
+def run_main(monkeypatch, *args) -> int:
+    monkeypatch.setattr(sys, "argv", ["batch.py", *map(str, args)])
+    return batch.main()
+
+
+@pytest.fixture
+def tight_grrconfig(lot: tuple[Path, Path], tmp_path: Path) -> Path:
+    """grrConfig of lot, GR&R limits no part can pass"""
+    lines = lot[1].read_text(encoding="utf-8").splitlines(keepends=True)
+    for i in range(3, len(lines)):
+        fields = lines[i].split(",")
+        fields[2] = "1e-09"
+        lines[i] = ",".join(fields)
+    filepath = tmp_path / "tight" / "grrConfig.csv"
+    filepath.parent.mkdir()
+    filepath.write_text("".join(lines), encoding="utf-8")
+    return filepath
+
+
+def test_passed(monkeypatch, lot, tmp_path):
+    outdir = tmp_path / "out"
+    assert run_main(monkeypatch, lot[0], "--outdir", outdir) == batch.EXIT_PASSED
+    assert (outdir / "datalog.summary.csv").is_file()
+    assert (outdir / "datalog.results.csv").is_file()
+
+
+def test_failed(monkeypatch, lot, tight_grrconfig, tmp_path):
+    args = ["--outdir", tmp_path / "out", "--grrconfig", tight_grrconfig]
+    assert run_main(monkeypatch, lot[0], *args) == batch.EXIT_FAILED
+
+
+@pytest.mark.parametrize("order", ["error_first", "error_last"])
+def test_error(monkeypatch, lot, tight_grrconfig, tmp_path, order):
+    missing = tmp_path / "missing.csv"
+    paths = [missing, lot[0]] if order == "error_first" else [lot[0], missing]
+    args = ["--outdir", tmp_path / "out", "--grrconfig", tight_grrconfig]
+    # a lot not processed wins over a failed GR&R
+    assert run_main(monkeypatch, *paths, *args) == batch.EXIT_ERROR
+    # the other lots are still exported
+    assert (tmp_path / "out" / "datalog.results.csv").is_file()
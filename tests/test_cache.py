@@ -0,0 +1,146 @@
+# test_cache.py is part of the tests
+
+# global libraries
+import os
+import copy
+import shutil
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+# local libraries
+import models
+from cache import ParseCache, RenderCache
+
+pytest.importorskip("pyarrow")
+
+
+@pytest.fixture
+def input_settings(cfg: dict, tmp_path: Path) -> dict:
+    settings = copy.deepcopy(cfg["input_settings"])
+    settings["cache"].update(
+        enabled=True, directory=str(tmp_path / "cache"), hash="stat"
+    )
+    return settings
+
+
+def test_key_follows_path_size_and_mtime(input_settings, lot):
+    datalog, _ = lot
+    cache = ParseCache(input_settings)
+    key = cache.make_key(datalog)
+    assert cache.make_key(datalog) == key
+
+    copied = shutil.copy2(datalog, datalog.with_name("copy.csv"))
+    assert cache.make_key(copied) != key
+    st = datalog.stat()
+    os.utime(datalog, ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+    assert cache.make_key(datalog) != key
+
+
+def test_miss_then_hit(input_settings, lot):
+    datalog, _ = lot
+    cache = ParseCache(input_settings)
+    key = cache.make_key(datalog)
+    assert cache.load(key) is None
+
+    dfdata, dfheaders = models.read_datalog_cached(datalog, input_settings)
+    cached = cache.load(key)
+    assert cached is not None
+    pd.testing.assert_frame_equal(cached[0], dfdata)
+    pd.testing.assert_frame_equal(cached[1], dfheaders)
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        lambda s: s.update(csv_engine="python"),
+        lambda s: s["reading_format"]["headers"].update(nrows=2),
+        lambda s: s["variable_names"].update(PART="Serial"),
+    ],
+    ids=["csv_engine", "reading_format", "variable_names"],
+)
+def test_key_follows_settings(input_settings, lot, change):
+    datalog, _ = lot
+    key = ParseCache(input_settings).make_key(datalog)
+    change(input_settings)
+    assert ParseCache(input_settings).make_key(datalog) != key
+
+
+def test_evicts_least_recently_used(input_settings):
+    cache = ParseCache(input_settings)
+    df = pd.DataFrame({"value": range(10_000)}, dtype="float64")
+    for i, key in enumerate(["a", "b", "c"]):
+        cache.save(key, df, df.head())
+        for fp in cache.get_paths(key).values():
+            os.utime(fp, ns=(i * 10**9, i * 10**9))
+    entry_size = sum(fp.stat().st_size for fp in cache.get_paths("c").values())
+
+    cache.max_size = 2 * entry_size
+    cache.load("a")  # a is now the most recently used
+    cache.evict()
+    assert cache.load("b") is None
+    assert cache.load("a") is not None and cache.load("c") is not None
+
+
+def test_evict_skips_files_removed_by_another_process(input_settings, monkeypatch):
+    cache = ParseCache(input_settings)
+    df = pd.DataFrame({"value": [1.0, 2.0]})
+    cache.save("a", df, df)
+    glob = Path.glob
+    gone = cache.directory / "gone.data.parquet"
+    monkeypatch.setattr(
+        Path, "glob", lambda self, pattern: [*glob(self, pattern), gone]
+    )
+    cache.max_size = 0
+    cache.evict()
+    monkeypatch.undo()
+    assert not any(cache.directory.glob("*.parquet"))
+
+
+def test_render_cache_evicts_by_entries():
+    cache = RenderCache(max_entries=2, max_size_mb=1)
+    cache.put((1, None, "a"), "a", nbytes=10)
+    cache.put((1, None, "b"), "b", nbytes=10)
+    cache.get((1, None, "a"))  # a is now the most recently used
+    cache.put((1, None, "c"), "c", nbytes=10)
+    assert cache.get((1, None, "b")) is None
+    assert cache.get((1, None, "a")) == "a" and cache.get((1, None, "c")) == "c"
+    assert cache.stats["evictions"] == 1
+
+
+def test_render_cache_evicts_by_size():
+    cache = RenderCache(max_entries=10, max_size_mb=1)
+    half = 512 * 1024
+    cache.put((1, None, "a"), "a", nbytes=half)
+    cache.put((1, None, "b"), "b", nbytes=half)
+    cache.put((1, None, "c"), "c", nbytes=half)
+    assert cache.get((1, None, "a")) is None
+    assert cache.stats["size_bytes"] == 2 * half
+    # larger than the cache, not stored
+    cache.put((1, None, "d"), "d", nbytes=cache.max_size + 1)
+    assert cache.get((1, None, "d")) is None
+
+
+def test_render_cache_invalidate():
+    cache = RenderCache()
+    cache.put((1, None, "a"), "a", nbytes=10)
+    cache.put((2, None, "b"), "b", nbytes=10)
+    cache.invalidate(2)
+    assert cache.get((1, None, "a")) is None
+    assert cache.get((2, None, "b")) == "b"
+    assert cache.stats["size_bytes"] == 10
+
+
+def test_render_cache_invalidate_scope():
+    cache = RenderCache()
+    cache.put((1, "lot1", "a"), "a", nbytes=10)
+    cache.put((5, "lot2", "a"), "b", nbytes=10)
+    cache.invalidate(2, scope="lot1")
+    # the entries of another dataset are kept
+    assert cache.get((1, "lot1", "a")) is None
+    assert cache.get((5, "lot2", "a")) == "b"
+    # the entries of the current version are kept
+    cache.put((2, "lot1", "a"), "c", nbytes=10)
+    cache.invalidate(2, scope="lot1")
+    assert cache.get((2, "lot1", "a")) == "c"
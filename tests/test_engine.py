@@ -0,0 +1,233 @@
+# test_engine.py is part of the tests
+
+# global libraries
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# local libraries
+import engine
+import generate
+import models
+from run import make_cfg
+
+KEYS = ["fom", "operator", "SerialNumber"]
+
+
+def make_lot(directory: Path, pseudo_golden: bool) -> tuple[Path, Path]:
+    datalog = generate.generate_datalog(
+        directory / "datalog.csv", parts=15, operators=3, reps=3, foms=4, seed=3
+    )
+    if pseudo_golden:
+        # no operator tagged as golden, all operators are pooled
+        text = datalog.read_text(encoding="utf-8")
+        datalog.write_text(text.replace(generate.GOLDEN_OPERATOR, "OP00"))
+    grrconfig = generate.generate_grrconfig(directory / "grrConfig.csv", foms=4, seed=3)
+    return datalog, grrconfig
+
+
+def compute(
+    datalog: Path, grrconfig: Path, datastore: str, grr_engine: str, chunksize=None
+):
+    cfg = make_cfg(grrconfig, datastore=datastore, grr_engine=grr_engine)
+    if chunksize:
+        cfg["input_settings"]["chunksize"] = chunksize
+    data = models.make_parser(cfg=cfg, filepaths=[datalog])
+    maker = models.GaiaDataMaker(
+        cfg=cfg, dataparam_list=data.datastore, dflimits=data.cfg_grrlimits
+    )
+    return maker
+
+
+def normalize(df: pd.DataFrame, keys: list[str]) -> pd.DataFrame:
+    df = df.astype({c: str for c in keys if c in df.columns})
+    return df.sort_values(keys).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("pseudo_golden", [False, True], ids=["golden", "pseudo"])
+@pytest.mark.parametrize("datastore", ["paramdata", "long"])
+def test_batched_matches_per_pair(tmp_path, pseudo_golden, datastore):
+    datalog, grrconfig = make_lot(tmp_path, pseudo_golden)
+    per_pair = compute(datalog, grrconfig, datastore, "per_pair")
+    batched = compute(datalog, grrconfig, "long", "batched")
+    assert batched.is_pseudo_golden == per_pair.is_pseudo_golden == pseudo_golden
+
+    assert len(batched.dfs) == len(per_pair.dfs) > 0
+    pd.testing.assert_frame_equal(
+        normalize(batched.dfs[list(per_pair.dfs.columns)], KEYS),
+        normalize(per_pair.dfs, KEYS),
+        check_dtype=False,
+    )
+    pd.testing.assert_frame_equal(
+        normalize(batched.df_summary[list(per_pair.df_summary.columns)], KEYS[:2]),
+        normalize(per_pair.df_summary, KEYS[:2]),
+        check_dtype=False,
+    )
+
+
+def test_streaming_matches_long(tmp_path):
+    # chunks of 10 rows, the running aggregates are merged 14 times
+    datalog, grrconfig = make_lot(tmp_path, pseudo_golden=False)
+    long = compute(datalog, grrconfig, "long", "batched")
+    streaming = compute(datalog, grrconfig, "streaming", "batched", chunksize=10)
+    pd.testing.assert_frame_equal(
+        normalize(streaming.dfs, KEYS), normalize(long.dfs, KEYS), check_dtype=False
+    )
+
+
+def test_streaming_keeps_fom_not_numeric_in_first_chunk(tmp_path):
+    datalog, grrconfig = make_lot(tmp_path, pseudo_golden=False)
+    lines = datalog.read_text(encoding="utf-8").splitlines(keepends=True)
+    # data block starts on line 5, FOM0000_V is column 6
+    for i in range(5, 25):
+        fields = lines[i].split(",")
+        fields[6] = "bad"
+        lines[i] = ",".join(fields)
+    datalog.write_text("".join(lines), encoding="utf-8")
+    maker = compute(datalog, grrconfig, "streaming", "batched", chunksize=10)
+    assert "FOM0000_V" in set(maker.dfs["fom"])
+
+
+def make_long_table(seed: int = 0) -> pd.DataFrame:
+    """Long table of 2 FOMs, 6 parts x 3 operators x 3 reps, FOM_B with NaN
+    values and missing reps, i.e. unbalanced cells"""
+    rng = np.random.default_rng(seed)
+    index = pd.MultiIndex.from_product(
+        [
+            ["FOM_A", "FOM_B"],
+            [f"SN{i}" for i in range(6)],
+            ["OP1", "OP2", "OP3"],
+            [1, 2, 3],
+        ],
+        names=["fom", "SerialNumber", "operator", "rep"],
+    )
+    df = index.to_frame(index=False)
+    part_effect = df["SerialNumber"].str[2:].astype(int) * 0.5
+    operator_effect = df["operator"].map({"OP1": 0.0, "OP2": 0.1, "OP3": -0.05})
+    df["value"] = 100 + part_effect + operator_effect + rng.normal(0, 0.1, len(df))
+    is_b = (df["fom"] == "FOM_B").to_numpy()
+    df.loc[rng.choice(np.flatnonzero(is_b), 5, replace=False), "value"] = np.nan
+    dropped = rng.choice(np.flatnonzero(is_b & df["value"].notna().to_numpy()), 4)
+    return df.drop(index=dropped).sample(frac=1, random_state=seed)
+
+
+def reference_anova(df: pd.DataFrame) -> dict[str, float]:
+    """Sums of squares of one FOM as deviations from the group means"""
+    df = df.dropna(subset=["value"])
+    x = df["value"]
+    mean = x.mean()
+    cell = df.groupby(["SerialNumber", "operator"])["value"]
+
+    def ss_between(by: list[str]) -> float:
+        g = df.groupby(by)["value"]
+        return float((g.count() * (g.mean() - mean) ** 2).sum())
+
+    ss_part = ss_between(["SerialNumber"])
+    ss_operator = ss_between(["operator"])
+    ss_cells = ss_between(["SerialNumber", "operator"])
+    ss_repeatability = float(((x - cell.transform("mean")) ** 2).sum())
+    p, o, cells = df["SerialNumber"].nunique(), df["operator"].nunique(), cell.ngroups
+    reps = len(df) / cells
+    ms_part = ss_part / (p - 1)
+    ms_operator = ss_operator / (o - 1)
+    ss_interaction = ss_cells - ss_part - ss_operator
+    ms_interaction = ss_interaction / ((p - 1) * (o - 1))
+    ms_repeatability = ss_repeatability / (len(df) - cells)
+    var_interaction = max((ms_interaction - ms_repeatability) / reps, 0)
+    var_operator = max((ms_operator - ms_interaction) / (p * reps), 0)
+    var_part = max((ms_part - ms_interaction) / (o * reps), 0)
+    var_grr = ms_repeatability + var_operator + var_interaction
+    return {
+        "ss_part": ss_part,
+        "ss_operator": ss_operator,
+        "ss_interaction": ss_interaction,
+        "ss_repeatability": ss_repeatability,
+        "ss_total": float(((x - mean) ** 2).sum()),
+        "grr_pct": np.sqrt(var_grr / (var_grr + var_part)) * 100,
+        "ndc": np.floor(1.41 * np.sqrt(var_part / var_grr)),
+    }
+
+
+def test_compute_anova_matches_reference():
+    df = make_long_table()
+    dfanova = engine.compute_anova(
+        df, PART="SerialNumber", OPERATOR="operator"
+    ).set_index("fom")
+    assert dfanova.loc["FOM_A", "reps"] == 3
+    assert dfanova.loc["FOM_B", "reps"] < 3  # unbalanced
+    for fom, dffom in df.groupby("fom"):
+        expected = reference_anova(dffom)
+        result = dfanova.loc[fom, list(expected)].astype("float64").to_dict()
+        assert result == pytest.approx(expected, rel=1e-9, abs=1e-9), fom
+
+
+PAIRS = [("A", "OP1"), ("A", "OP2"), ("B", "OP1")]
+
+
+@pytest.mark.filterwarnings("error::FutureWarning")
+@pytest.mark.parametrize(
+    "new_pairs",
+    [PAIRS[:1], PAIRS, PAIRS[2:] + [("C", "OP1")]],
+    ids=["some", "all", "new"],
+)
+def test_replace_pairs(new_pairs):
+    # categorical keys, their categories differ, as for the watcher updates
+    df = pd.DataFrame(PAIRS, columns=["fom", "operator"]).assign(value=0.0)
+    fom_dtype = pd.CategoricalDtype(["A", "B", "Z"])  # Z without rows
+    df = df.astype({"fom": fom_dtype, "operator": "category"})
+    dfnew = pd.DataFrame(new_pairs, columns=["fom", "operator"]).assign(value=1.0)
+    dfnew = dfnew.astype({"fom": "category"})
+    result = engine.replace_pairs(df, dfnew)
+    pairs = list(zip(result["fom"], result["operator"]))
+    assert pairs == sorted(set(PAIRS) | set(new_pairs))
+    replaced = [pair in new_pairs for pair in pairs]
+    assert list(result["value"]) == [1.0 if r else 0.0 for r in replaced]
+
+
+@pytest.mark.parametrize("grr_engine", ["batched", "per_pair"])
+def test_compact_dtypes_keep_values(tmp_path, grr_engine):
+    datalog, grrconfig = make_lot(tmp_path, pseudo_golden=False)
+    cfg = make_cfg(grrconfig, datastore="paramdata", grr_engine=grr_engine)
+    data = models.make_parser(cfg=cfg, filepaths=[datalog])
+    expected = models.GaiaDataMaker(
+        cfg=cfg, dataparam_list=data.datastore, dflimits=data.cfg_grrlimits
+    )
+    cfg["grr_settings"]["compact_dtypes"] = True
+    data = models.make_parser(cfg=cfg, filepaths=[datalog])
+    result = models.GaiaDataMaker(
+        cfg=cfg, dataparam_list=data.datastore, dflimits=data.cfg_grrlimits
+    )
+
+    dfs = result.dfs
+    for col in KEYS:
+        assert isinstance(dfs[col].dtype, pd.CategoricalDtype), col
+    for col in engine.FLOAT32_COLUMNS:
+        assert dfs[col].dtype == "float32", col
+    for col in ["mean_value", "golden_mean_value", "grr_limits"]:
+        assert dfs[col].dtype == "float64", col
+    assert dfs["grr_part_passed"].dtype == bool
+    assert result.df_summary["grr_passed"].dtype == bool
+    assert engine.bytes_per_row(dfs) < engine.bytes_per_row(expected.dfs)
+
+    pd.testing.assert_frame_equal(
+        normalize(dfs, KEYS),
+        normalize(expected.dfs, KEYS),
+        check_dtype=False,
+        rtol=1e-6,
+    )
+
+
+def test_compact_results_keeps_missing_flags():
+    df = pd.DataFrame(
+        {
+            "fom": ["A", "B", "C"],
+            "grr_passed": [True, None, False],
+            "grr_limits": [1.0, 2.0, 3.0],
+        }
+    ).astype({"grr_passed": object})
+    result = engine.compact_results(df)
+    assert result["grr_passed"].dtype == "boolean"
+    assert result["grr_passed"].isna().tolist() == [False, True, False]
+    assert result["grr_limits"].dtype == "float64"
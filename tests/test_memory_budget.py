@@ -0,0 +1,22 @@
+# test_memory_budget.py is part of the tests
+# Peak traced memory of the ingest-to-results path, see benchmarks/memory_budget.py
+
+# global libraries
+import pytest
+
+# local libraries
+import generate
+from memory_budget import MAX_RATIO, measure_peak
+
+
+@pytest.mark.parametrize(
+    "datastore, grr_engine", [("long", "batched"), ("long", "per_pair")]
+)
+def test_peak_memory_within_budget(tmp_path, datastore, grr_engine):
+    datalog = generate.generate_datalog(
+        tmp_path / "datalog.csv", parts=500, operators=4, reps=3, foms=20, seed=0
+    )
+    grrconfig = generate.generate_grrconfig(tmp_path / "grrConfig.csv", foms=20)
+    peak = measure_peak(datalog, grrconfig, datastore, grr_engine)
+    ratio = peak / datalog.stat().st_size
+    assert ratio <= MAX_RATIO[grr_engine], f"peak x{ratio:.2f} of the file size"
@@ -0,0 +1,153 @@
+# test_models.py is part of the tests
+
+# global libraries
+import numpy as np
+import pandas as pd
+import pytest
+
+# local libraries
+import models
+
+PART, OPERATOR, REP = "SerialNumber", "TesterID", "rep"
+
+
+def make_wide_table(seed: int = 0) -> pd.DataFrame:
+    """Shuffled rows, (PART, OPERATOR) repeated, and NaN keys"""
+    rng = np.random.default_rng(seed)
+    n = 300
+    df = pd.DataFrame(
+        {
+            PART: rng.choice([f"SN{i}" for i in range(12)], n).astype(object),
+            OPERATOR: rng.choice(["A1_golden", "B1", "C1"], n).astype(object),
+            "FOM_A": rng.normal(size=n),
+            "FOM_B": rng.normal(size=n),
+        }
+    )
+    df.loc[rng.choice(n, 10, replace=False), PART] = np.nan
+    df.loc[rng.choice(n, 10, replace=False), OPERATOR] = np.nan
+    df["row"] = np.arange(n)
+    return df.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def test_dataframe_assign_reps_matches_count_reps():
+    df = make_wide_table()
+    expected = models.dataframe_count_reps(df, PART=PART, OPERATOR=OPERATOR, REP=REP)
+    result = models.dataframe_assign_reps(df, PART=PART, OPERATOR=OPERATOR, REP=REP)
+
+    # same rows and rep numbers, NaN keys dropped by both
+    pd.testing.assert_frame_equal(
+        result.sort_values("row").reset_index(drop=True),
+        expected.sort_values("row").reset_index(drop=True),
+    )
+    # rows in their original order, not grouped by (PART, OPERATOR)
+    valid = df[PART].notna() & df[OPERATOR].notna()
+    np.testing.assert_array_equal(result["row"], df.loc[valid, "row"])
+    assert isinstance(result.index, pd.RangeIndex)
+    # reps count up in order of appearance within each (PART, OPERATOR)
+    firsts = result.groupby([PART, OPERATOR], sort=False)[REP].first()
+    assert (firsts == 1).all()
+
+
+def test_dataframe_assign_reps_leaves_input_untouched():
+    df = make_wide_table(seed=1).dropna(subset=[PART, OPERATOR])
+    models.dataframe_assign_reps(df, PART=PART, OPERATOR=OPERATOR, REP=REP)
+    assert REP not in df.columns
+
+
+def test_result_index_get(grr):
+    dfs = grr.dfs.sample(frac=1, random_state=0)  # pairs not contiguous
+    index = models.ResultIndex(dfs)
+    assert len(index.bounds) == dfs.groupby(["fom", "operator"], observed=True).ngroups
+    for fom, operator in index.bounds:
+        expected = dfs[(dfs["fom"] == fom) & (dfs["operator"] == operator)]
+        pd.testing.assert_frame_equal(
+            index.get(fom, operator).sort_values(PART).reset_index(drop=True),
+            expected.sort_values(PART).reset_index(drop=True),
+        )
+    assert index.get("FOM_UNKNOWN", index.operators[0]).empty
+    assert ("FOM_UNKNOWN", index.operators[0]) not in index
+
+
+def test_result_index_keeps_contiguous_frame(grr):
+    dfs = grr.dfs.sort_values(["fom", "operator"], ignore_index=True)
+    assert models.ResultIndex(dfs).df is dfs
+
+
+def test_result_index_failing_first(grr):
+    dfs = grr.dfs.copy()
+    dfs["grr_part_passed"] = np.arange(len(dfs)) % 3 != 0
+    index = models.ResultIndex(dfs)
+    for fom, operator in index.bounds:
+        df = index.get(fom, operator, failing_first=True)
+        assert len(df) == len(index.get(fom, operator))
+        passed = df["grr_part_passed"].fillna(False).to_numpy(dtype=bool)
+        # failed parts first
+        assert (np.diff(passed.astype(int)) >= 0).all()
+        # then by descending GR&R %, within the failed and the passed parts
+        score = np.fmax(df["grr_high_pct"], df["grr_low_pct"]).to_numpy()
+        for block in (score[~passed], score[passed]):
+            block = block[~np.isnan(block)]
+            assert (np.diff(block) <= 0).all()
+
+
+@pytest.fixture
+def lazy_grr(cfg, lot) -> models.GaiaDataMaker:
+    data = models.make_parser(cfg=cfg, filepaths=[lot[0]])
+    return models.GaiaDataMaker(
+        cfg=cfg, dataparam_list=data.datastore, dflimits=data.cfg_grrlimits, lazy=True
+    )
+
+
+def make_lazy_index(grr: models.GaiaDataMaker, max_foms: int) -> models.LazyResultIndex:
+    return models.LazyResultIndex(
+        grr.compute_fom,
+        foms=grr.datastore.foms,
+        operators=grr.datastore.operators,
+        max_foms=max_foms,
+    )
+
+
+def test_lazy_result_index_matches_eager(lazy_grr, grr):
+    lazy = make_lazy_index(lazy_grr, max_foms=64)
+    eager = models.ResultIndex(grr.dfs)
+    for fom, operator in eager.bounds:
+        pd.testing.assert_frame_equal(
+            lazy.get(fom, operator).reset_index(drop=True),
+            eager.get(fom, operator).reset_index(drop=True),
+            check_categorical=False,
+        )
+    assert lazy.stats["computed"] == len(lazy.foms)
+
+
+def test_lazy_result_index_memoizes(lazy_grr):
+    lazy = make_lazy_index(lazy_grr, max_foms=64)
+    fom, operator = lazy.foms[0], lazy.operators[0]
+    df = lazy.get(fom, operator)
+    assert lazy.get(fom, operator, failing_first=True).shape == df.shape
+    assert (fom, operator) in lazy
+    assert lazy.stats["computed"] == 1
+
+
+def test_lazy_result_index_evicts_and_recomputes(lazy_grr):
+    lazy = make_lazy_index(lazy_grr, max_foms=2)
+    first, second, third = lazy.foms[:3]
+    operator = lazy.operators[0]
+    expected = lazy.get(first, operator)
+    lazy.get(second, operator)
+    lazy.get(first, operator)  # first is now the most recently used
+    lazy.get(third, operator)
+    assert list(lazy.results) == [first, third]
+    assert lazy.stats == {"foms": 4, "cached": 2, "computed": 3, "evicted": 1}
+
+    # second was evicted, computed again
+    lazy.get(second, operator)
+    assert lazy.stats["computed"] == 4
+    assert list(lazy.results) == [third, second]
+    pd.testing.assert_frame_equal(lazy.get(first, operator), expected)
+    assert lazy.stats["computed"] == 5
+
+
+def test_lazy_result_index_unknown_fom(lazy_grr):
+    lazy = make_lazy_index(lazy_grr, max_foms=2)
+    df = lazy.get("FOM_UNKNOWN", lazy.operators[0])
+    assert df.empty and "grr_part_passed" in df.columns
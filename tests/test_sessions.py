@@ -0,0 +1,96 @@
+# test_sessions.py is part of the tests
+
+# global libraries
+import time
+import importlib.util
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+# local libraries
+import models
+import sessions
+
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+
+@pytest.fixture
+def registry(cfg: dict, tmp_path: Path) -> sessions.SessionRegistry:
+    cfg["dashboard"]["sessions"].update(
+        enabled=True, directory=str(tmp_path / "sessions"), max_datasets=1
+    )
+    return sessions.SessionRegistry(cfg)
+
+
+def make_upload(lot: tuple[Path, Path], rows: int = 0) -> dict[str, bytes]:
+    """Files of an upload, the datalog cut to its first rows if given"""
+    datalog, grrconfig = lot
+    lines = datalog.read_bytes().splitlines(keepends=True)
+    content = b"".join(lines[: 5 + rows]) if rows else b"".join(lines)
+    return {"grrConfig.csv": grrconfig.read_bytes(), "lot.csv": content}
+
+
+def wait_upload(registry: sessions.SessionRegistry, dataset_id: str) -> None:
+    deadline = time.monotonic() + 60
+    while (upload := registry.progress(dataset_id)) is not None and not upload.done:
+        assert time.monotonic() < deadline, "upload not parsed"
+        time.sleep(0.05)
+    assert upload is None or not upload.error, upload.error
+
+
+def test_upload(registry, lot):
+    dataset_id = registry.add(make_upload(lot))
+    assert sessions.is_dataset_id(dataset_id)
+    wait_upload(registry, dataset_id)
+
+    assert dataset_id in registry
+    assert len(registry.get(dataset_id).snapshot.dfs) > 0
+    assert registry.options() == [
+        {"label": f"lot ({dataset_id[:8]})", "value": dataset_id}
+    ]
+    # the same files, the same dataset
+    assert registry.add(make_upload(lot)) == dataset_id
+
+
+def test_eviction_spill_and_reload(registry, lot):
+    first = registry.add(make_upload(lot))
+    wait_upload(registry, first)
+    dfs = registry.get(first).snapshot.dfs
+    second = registry.add(make_upload(lot, rows=60))
+    wait_upload(registry, second)
+
+    # max_datasets=1, the least recently used dataset is evicted
+    assert list(registry.sessions) == [second]
+    assert registry.stats["evictions"] == 1
+    assert registry.get_store(first).exists("results") == HAS_PYARROW
+
+    loads = registry.stats["loads"]
+    reloaded = registry.get(first).snapshot.dfs
+    assert registry.stats["loads"] == loads + 1
+    assert list(registry.sessions) == [first]
+    pd.testing.assert_frame_equal(
+        reloaded.reset_index(drop=True), dfs.reset_index(drop=True), check_dtype=False
+    )
+
+
+def test_pinned_dataset_is_never_evicted(registry, lot):
+    dataset = models.Dataset(pd.DataFrame(columns=["fom", "operator"]), pd.DataFrame())
+    registry.add_dataset("targetdir", "targetdir", dataset, pinned=True)
+    dataset_id = registry.add(make_upload(lot))
+    wait_upload(registry, dataset_id)
+    assert registry.get("targetdir") is dataset
+    assert set(registry.sessions) == {"targetdir", dataset_id}
+
+
+@pytest.mark.parametrize(
+    "dataset_id", ["0123456789abcdef", "../../etc", "..", "ABCDEF0123456789", "", None]
+)
+def test_unknown_and_invalid_ids(registry, dataset_id):
+    with pytest.raises(KeyError):
+        registry.get(dataset_id)
+    assert dataset_id not in registry
+    assert registry.progress(dataset_id) is None
+    assert not registry.loading
+    # nothing is created outside, nor inside, the sessions directory
+    assert not registry.directory.exists() or not any(registry.directory.iterdir())
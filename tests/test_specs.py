@@ -0,0 +1,97 @@
+# test_specs.py is part of the tests
+
+# global libraries
+import os
+import copy
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+# local libraries
+import specs
+
+
+@pytest.fixture
+def reading_format(cfg: dict) -> dict:
+    return copy.deepcopy(cfg["input_settings"]["reading_format"]["grr_config_csv"])
+
+
+def rewrite(filepath: Path, old: str, new: str, mtime_ns: int) -> None:
+    """Replaces old by new in filepath, then sets its mtime"""
+    filepath.write_text(filepath.read_text(encoding="utf-8").replace(old, new, 1))
+    os.utime(filepath, ns=(mtime_ns, mtime_ns))
+
+
+def get_first_limit(filepath: Path) -> str:
+    return filepath.read_text(encoding="utf-8").splitlines()[3].split(",")[2]
+
+
+def test_load_specs_is_cached(lot, reading_format):
+    grrconfig = lot[1]
+    df = specs.load_specs(grrconfig, reading_format)
+    assert specs.load_specs(grrconfig, reading_format) is df
+    pd.testing.assert_frame_equal(df, specs.read_specs(grrconfig, reading_format))
+
+
+def test_load_specs_reparses_on_mtime(lot, reading_format):
+    grrconfig = lot[1]
+    df = specs.load_specs(grrconfig, reading_format)
+    st = grrconfig.stat()
+    # same size, newer mtime
+    limit = get_first_limit(grrconfig)
+    new_limit = "9" * len(limit)
+    rewrite(grrconfig, f",{limit},", f",{new_limit},", st.st_mtime_ns + 10**9)
+    assert grrconfig.stat().st_size == st.st_size
+
+    reparsed = specs.load_specs(grrconfig, reading_format)
+    assert reparsed is not df
+    assert reparsed["grr_limit"].iloc[0] == float(new_limit)
+
+
+def test_load_specs_reparses_on_size(lot, reading_format):
+    grrconfig = lot[1]
+    df = specs.load_specs(grrconfig, reading_format)
+    st = grrconfig.stat()
+    # same mtime, e.g. rewritten within its resolution
+    limit = get_first_limit(grrconfig)
+    rewrite(grrconfig, f",{limit},", ",1.5,", st.st_mtime_ns)
+    assert grrconfig.stat().st_mtime_ns == st.st_mtime_ns
+
+    reparsed = specs.load_specs(grrconfig, reading_format)
+    assert reparsed is not df
+    assert reparsed["grr_limit"].iloc[0] == 1.5
+
+
+def test_load_specs_keyed_on_reading_format(lot, reading_format):
+    grrconfig = lot[1]
+    df = specs.load_specs(grrconfig, reading_format)
+    # the upper limits read as GR&R limits
+    other_format = {k: v for k, v in reading_format.items() if k != "USL"}
+    other_format["GRR_LIMIT"] = reading_format["USL"]
+    other = specs.load_specs(grrconfig, other_format)
+    pd.testing.assert_series_equal(other["grr_limit"], df["usl"], check_names=False)
+    # both stay cached
+    assert specs.load_specs(grrconfig, reading_format) is df
+    assert specs.load_specs(grrconfig, other_format) is other
+
+
+def test_spec_registry_first_file_wins(cfg, lot, tmp_path):
+    grrconfig = lot[1]
+    override = tmp_path / "override.csv"
+    override.write_text(grrconfig.read_text(encoding="utf-8"))
+    limit = get_first_limit(override)
+    rewrite(override, f",{limit},", ",1.5,", override.stat().st_mtime_ns)
+
+    registry = specs.SpecRegistry(cfg, filepaths=[override, grrconfig])
+    df = specs.load_specs(
+        grrconfig, cfg["input_settings"]["reading_format"]["grr_config_csv"]
+    )
+    assert registry.foms == list(df.index)
+    assert registry.lookup(registry.foms[:1])["grr_limit"].iloc[0] == 1.5
+    assert registry.lookup(["FOM_UNKNOWN"])["grr_limit"].isna().all()
+
+
+def test_spec_registry_missing_file(cfg, tmp_path):
+    with pytest.raises(RuntimeError, match="missing grr_config"):
+        specs.SpecRegistry(cfg, filepaths=[tmp_path / "missing.csv"])
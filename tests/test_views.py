@@ -0,0 +1,74 @@
+# test_views.py is part of the tests
+
+# global libraries
+import pandas as pd
+import pytest
+
+# local libraries
+import views
+
+
+@pytest.fixture
+def dfmasked() -> pd.DataFrame:
+    """A (fom, operator) slice, text, bool, numeric and categorical columns"""
+    n = 10
+    df = pd.DataFrame(
+        {
+            views.PART: [f"SN{i}" for i in range(n)],
+            "grr_part_passed": [i % 3 != 0 for i in range(n)],
+            "mean_value": [float(i) for i in range(n)],
+            "grr_mean_offset": [0.1 * i for i in range(n)],
+            "grr_high_pct": [10.0 * i for i in range(n)],
+            "grr_low_pct": [-10.0 * i for i in range(n)],
+            "grr_pos_offset": [0.2 * i for i in range(n)],
+            "grr_neg_offset": [0.3 * i for i in range(n)],
+        }
+    )
+    return df.astype({views.PART: "category", "grr_high_pct": "float32"})
+
+
+@pytest.mark.parametrize(
+    "filter_query, expected",
+    [
+        ("{mean_value} > 6", ["SN7", "SN8", "SN9"]),
+        ("{mean_value} <= 1", ["SN0", "SN1"]),
+        ("{grr_high_pct} ge 80", ["SN8", "SN9"]),
+        ("{grr_part_passed} = false", ["SN0", "SN3", "SN6", "SN9"]),
+        ("{SerialNumber} = SN4", ["SN4"]),
+        ("{SerialNumber} contains 1", ["SN1"]),
+        ("{mean_value} > 6 && {grr_part_passed} = true", ["SN7", "SN8"]),
+    ],
+)
+def test_filter_table(dfmasked, filter_query, expected):
+    df = views.filter_table(dfmasked, filter_query)
+    assert list(df[views.PART].astype(str)) == expected
+
+
+@pytest.mark.parametrize(
+    "filter_query",
+    ["{SerialNumber} > 5", "{SerialNumber} lt SN3", "{mean_value} > abc"],
+)
+def test_filter_table_skips_unordered_comparisons(dfmasked, filter_query):
+    # text, categories and non-numeric values are not compared, not a 500
+    df = views.filter_table(dfmasked, filter_query)
+    assert len(df) == len(dfmasked)
+
+
+def test_filter_table_on_text_column(dfmasked):
+    df = dfmasked.astype({views.PART: str})
+    assert len(views.filter_table(df, "{SerialNumber} >= 5")) == len(df)
+    assert list(views.filter_table(df, "{SerialNumber} = SN2")[views.PART]) == ["SN2"]
+
+
+def test_render_table_page(dfmasked):
+    records, page_count = views.render_table_page(
+        dfmasked,
+        page_current=1,
+        page_size=3,
+        sort_by=[{"column_id": "mean_value", "direction": "desc"}],
+        filter_query="{SerialNumber} > 5 && {mean_value} < 8",
+    )
+    assert page_count == 3
+    assert [r[views.PART] for r in records] == ["SN4", "SN3", "SN2"]
+    # float32 as its shortest repr
+    assert records[0]["grr_high_pct"] == 40.0
@@ -0,0 +1,125 @@
+# test_watcher.py is part of the tests
+
+# global libraries
+import os
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+# local libraries
+import models
+import watcher
+
+KEYS = ["fom", "operator", "SerialNumber"]
+# lines of the header block of a datalog, then one line per row
+HEADER_LINES = 5
+
+
+@pytest.fixture
+def lines(lot: tuple[Path, Path]) -> list[str]:
+    return lot[0].read_text(encoding="utf-8").splitlines(keepends=True)
+
+
+@pytest.fixture
+def targetdir(tmp_path: Path) -> Path:
+    directory = tmp_path / "targetdir"
+    directory.mkdir()
+    return directory
+
+
+@pytest.fixture
+def target(cfg: dict, targetdir: Path) -> watcher.TargetDirWatcher:
+    return watcher.TargetDirWatcher(cfg, targetdir)
+
+
+def compute(cfg: dict, datalog: Path) -> pd.DataFrame:
+    """Results of datalog parsed at once"""
+    data = models.make_parser(cfg=cfg, filepaths=[datalog])
+    maker = models.GaiaDataMaker(
+        cfg=cfg, dataparam_list=data.datastore, dflimits=data.cfg_grrlimits
+    )
+    return maker.dfs
+
+
+def assert_results_equal(target: watcher.TargetDirWatcher, expected: pd.DataFrame):
+    def normalize(df: pd.DataFrame) -> pd.DataFrame:
+        df = df.astype({c: str for c in KEYS})
+        return df.sort_values(KEYS).reset_index(drop=True)
+
+    pd.testing.assert_frame_equal(
+        normalize(target.dataset.snapshot.dfs), normalize(expected), check_dtype=False
+    )
+
+
+def test_empty_directory(target):
+    target.start()
+    target.stop()
+    assert target.dataset is not None
+    assert target.dataset.snapshot.dfs.empty
+    assert target.dataset.snapshot.index.get("FOM0000_V", "A1_golden").empty
+
+
+def test_append(cfg, target, targetdir, lines, lot):
+    datalog = targetdir / "lot.csv"
+    datalog.write_text("".join(lines[: HEADER_LINES + 60]), encoding="utf-8")
+    assert target.poll()
+    assert target.dataset.version == 0
+    assert_results_equal(target, compute(cfg, datalog))
+
+    # no new rows
+    assert not target.poll()
+    # appended, the last row cut in the middle of the line
+    rest = "".join(lines[HEADER_LINES + 60 :])
+    with open(datalog, mode="a", encoding="utf-8") as f:
+        f.write(rest[:-10])
+    assert target.poll()
+    with open(datalog, mode="a", encoding="utf-8") as f:
+        f.write(rest[-10:])
+    assert target.poll()
+    assert target.dataset.version == 2
+    assert_results_equal(target, compute(cfg, lot[0]))
+
+
+def test_replaced_by_larger_file(cfg, target, targetdir, lines, lot):
+    datalog = targetdir / "lot.csv"
+    datalog.write_text("".join(lines[: HEADER_LINES + 60]), encoding="utf-8")
+    target.poll()
+    # another lot, renamed over the first one
+    replacement = targetdir / "replacement.tmp"
+    replacement.write_text(
+        "".join(lines[:HEADER_LINES] + lines[-70:]), encoding="utf-8"
+    )
+    assert replacement.stat().st_size > datalog.stat().st_size
+    os.replace(replacement, datalog)
+    assert target.poll()
+    assert target.dataset.version == 1
+    assert_results_equal(target, compute(cfg, datalog))
+
+
+def test_truncated(cfg, target, targetdir, lines):
+    datalog = targetdir / "lot.csv"
+    datalog.write_text("".join(lines), encoding="utf-8")
+    target.poll()
+    datalog.write_text("".join(lines[: HEADER_LINES + 60]), encoding="utf-8")
+    assert target.poll()
+    assert_results_equal(target, compute(cfg, datalog))
+
+
+def test_rewritten_in_place_same_size(cfg, target, targetdir, lines):
+    datalog = targetdir / "lot.csv"
+    datalog.write_text("".join(lines), encoding="utf-8")
+    target.poll()
+    # one value changed, same size and inode
+    i = HEADER_LINES + 10
+    fields = lines[i].split(",")
+    fields[6] = fields[6][:-1] + str((int(fields[6][-1]) + 1) % 10)
+    changed = lines[:i] + [",".join(fields)] + lines[i + 1 :]
+    st = datalog.stat()
+    with open(datalog, mode="r+", encoding="utf-8") as f:
+        f.write("".join(changed))
+    assert datalog.stat().st_size == st.st_size
+    assert target.is_replaced(datalog)
+
+    assert target.poll()
+    assert_results_equal(target, compute(cfg, datalog))